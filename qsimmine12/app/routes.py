@@ -36,6 +36,7 @@ from app.models import (
     UploadedFile,
     validate_schedule_type, PlannedIdle,
 )
+from app.sim_engine.core.planner.matrix_cache import invalidate_planning_cache
 from app.services.blasting_service import DeleteBlastingService, BulkDeleteBlastingService
 from app.services.date_time_service import StartEndTimeGenerateService
 from app.services.object_service import ObjectService
@@ -242,6 +243,7 @@ async def delete_object(data: DeleteObjectRequest, db: Session = Depends(get_db)
             raise HTTPException(status_code=400, detail='Couldn\'t find object by given id')
 
     db.commit()
+    invalidate_planning_cache()
     return {'success': True}
 
 
@@ -16,6 +16,7 @@ from app.forms import (
 )
 from app.services.blasting_service import CreateBlastingService
 from app.services.planned_idle_service import CreatePlannedIdleService
+from app.sim_engine.core.planner.matrix_cache import invalidate_planning_cache
 
 
 # region DAO
@@ -156,6 +157,9 @@ class GenericObjectService(BaseObjectService):
         self.db.commit()
         self.db.refresh(obj)
 
+        # Дорожная сеть, привязки и свойства оборудования могли измениться - записи матрицы планирования устарели
+        invalidate_planning_cache()
+
         return {"success": True, "id": obj.id}
 
 
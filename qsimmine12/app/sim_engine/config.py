@@ -4,12 +4,44 @@ SIM_CONFIG = {
     "lunch": True,
     "planned_idle": True,
     "blasting": True,
-    "mode": "manual",  # auto/manual
+    "mode": "manual",  # auto/manual/estimate
+    "estimate_method": "exact",  # exact/approximate - MVA для режима estimate
+    # Пропуск времени, пока техника стоит на обеде/плановом простое/ожидании взрывных работ.
+    # Телеметрия стоящей техники пишется только на границах периода
+    "fast_forward": False,
+    # Профилирование движка: события по типам процессов, глубина очереди, время поиска маршрутов,
+    # перепланирования и записи. Результат в result["meta"]["profile"]
+    "profile": False,
+    # Шаг симуляции в секундах: движение, погрузка/разгрузка, расход топлива, наработка на отказ и телеметрия
+    # считаются с этим шагом. Для стратегических расчётов парка допустимо 5-10 с
+    "time_step": 1,
+    # Длинный горизонт: прогон посменно (по shift_config) со сбросом сводки, рейсов, телеметрии и событий
+    # каждой смены в JSON Lines файл horizon_sink_path (None - временный файл). В памяти - только накопительные итоги
+    "horizon": False,
+    "horizon_sink_path": None,
 
     # Настройки солвера
-    "time_limit": 10,  # SolverType: CBC,HIGHS,CP
+    "time_limit": 10,  # SolverType: CBC,HIGHS,CP,TIME_INDEXED,PORTFOLIO (общий бюджет гонки)
     "msg": True,  # SolverType: GREEDY,CBC,HIGHS,CP
-    "workers": 16,  # SolverType: CBC,HIGHS,CP
+    "workers": 16,  # SolverType: CBC,HIGHS,CP,TIME_INDEXED,PORTFOLIO (делятся между участниками)
+    "time_bucket": 2,  # SolverType: TIME_INDEXED - длина интервала временной постановки (мин)
+    # Процессы построения матрицы планирования (1 - без пула; None - авто, не больше workers и числа ядер).
+    # Пул считает только маршруты между объектами при холодном построении, подъезды считаются последовательно
+    "matrix_workers": 1,
+    # Скользящий горизонт CBC/HIGHS/CP: план строится на окно rolling_horizon минут (None - до конца смены)
+    # и продлевается каждые rolling_horizon_step минут (None - половина окна) и при событиях перепланирования
+    "rolling_horizon": None,
+    "rolling_horizon_step": None,
+    # Тёплый старт CP: подсказки из предыдущего плана, а без него - из жадного расписания
+    # (CBC/HIGHS - без тёплого старта, см. Planner.WARM_START_SOLVERS)
+    "warm_start": True,
+    # Границы числа рейсов CBC/HIGHS/CP: вместимость экскаваторов (у CP - и пунктов разгрузки), а при заданном
+    # запасе trip_bound_margin (например, 1.5) - и ожидание в очередях (MVA), см. trip_bounds
+    "trip_bound_margin": None,
+    # Кэш планов CBC/HIGHS/CP по хэшу матрицы планирования и исключённых объектов, общий для процессов
+    # (бэкенд - переменные окружения PLAN_CACHE*, см. plan_cache). Выключен: матрица перепланирования включает
+    # положения самосвалов в середине смены, и такие записи почти не переиспользуются
+    "plan_cache": False,
 
     # Настройки расчёта достоверного результата
     "reliability_calc_enabled": False,
@@ -22,4 +54,6 @@ SIM_CONFIG = {
     "rel_delta_target": 0.01,
     "rel_consecutive": 2,
     "rel_boot_b": 5000,
+    "rel_variance_reduction": None,  # None/crn/antithetic - общие случайные числа или антитетические пары
+    "rel_base_seed": None,  # Базовое зерно серии прогонов для crn/antithetic (None - случайное)
 }
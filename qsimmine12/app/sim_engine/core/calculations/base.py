@@ -42,15 +42,15 @@ class BreakdownCalc:
 class FuelCalc:
 
     @staticmethod
-    def calculate_fuel_level_while_moving(fuel_lvl, sfc, density, p_engine):
+    def calculate_fuel_level_while_moving(fuel_lvl, sfc, density, p_engine, duration=1):
         fuel_rate = ((sfc / (1000 * density)) * p_engine) / 3600
-        fuel_lvl -= fuel_rate
+        fuel_lvl -= fuel_rate * duration
         return fuel_lvl
 
     @staticmethod
-    def calculate_fuel_level_while_idle(fuel_lvl, fuel_idle_lph):
+    def calculate_fuel_level_while_idle(fuel_lvl, fuel_idle_lph, duration=1):
         fuel_rate = fuel_idle_lph / 3600
-        fuel_lvl -= fuel_rate
+        fuel_lvl -= fuel_rate * duration
         return fuel_lvl
 
 
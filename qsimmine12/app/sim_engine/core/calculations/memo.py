@@ -0,0 +1,63 @@
+"""
+Кэш детерминированных расчётов оборудования.
+
+Результаты расчётов ShovelCalc, UnloadCalc и TruckCalc зависят только от свойств оборудования, поэтому
+кэшируются по неизменяемому снимку нужных полей свойств (кортежу значений). Снимок берётся при каждом вызове,
+так что изменение свойств объекта даёт новый ключ, а не устаревший результат.
+"""
+from typing import Any, Callable, Hashable, Iterable
+
+_CACHES: dict[str, "CalcCache"] = {}
+_MISSING = object()
+
+
+def props_snapshot(props: Any, fields: Iterable[str]) -> tuple:
+    """Неизменяемый снимок указанных полей свойств - ключ кэша"""
+    return tuple(getattr(props, name) for name in fields)
+
+
+class CalcCache:
+    """
+    Словарь результатов расчёта по хэшируемому ключу.
+    При переполнении вытесняется самая старая запись
+    """
+
+    def __init__(self, name: str, maxsize: int = 65536) -> None:
+        self.name = name
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: dict[Hashable, Any] = {}
+        _CACHES[name] = self
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        value = self._data.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = compute()
+        if len(self._data) >= self.maxsize:
+            del self._data[next(iter(self._data))]
+        self._data[key] = value
+        return value
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self) -> dict:
+        return {'size': len(self._data), 'hits': self.hits, 'misses': self.misses}
+
+
+def clear_calc_caches() -> None:
+    """Очищает все кэши расчётов (например, после изменения справочников коэффициентов)"""
+    for cache in _CACHES.values():
+        cache.clear()
+
+
+def calc_caches_info() -> dict[str, dict]:
+    """Размер и попадания по каждому кэшу расчётов"""
+    return {name: cache.info() for name, cache in _CACHES.items()}
@@ -2,12 +2,25 @@ from typing import Tuple, Generator
 
 import numpy as np
 
+from app.sim_engine.core.calculations.memo import CalcCache, props_snapshot
 from app.sim_engine.core.coefficients import koef_vlazhnosti
 from app.sim_engine.core.constants import koef_soprotivleniya, density_by_material
 from app.sim_engine.core.props import ShovelProperties, TruckProperties
 
+# Поля свойств экскаватора, от которых зависит цикл погрузки
+SHOVEL_CYCLE_FIELDS = (
+    'obem_kovsha_m3', 'skorost_podem_m_s', 'skorost_povorot_rad_s', 'skorost_vrezki_m_s',
+    'skorost_napolneniya_m_s', 'koef_zapolneniya', 'koef_gidravliki', 'koef_inertsii', 'koef_vozvrata',
+    'tip_porody', 'vlazhnost_percent',
+)
+
+# LoadSchedule - циклы погрузки самосвала: (время цикла в секундах, накопленный вес, накопленный объём)
+LoadSchedule = tuple[tuple[int, float, float], ...]
+
 
 class ShovelCalc:
+    _cycle_cache = CalcCache('shovel_cycle')
+    _schedule_cache = CalcCache('shovel_load_schedule')
 
     @classmethod
     def calculate_cycle(
@@ -19,8 +32,24 @@ class ShovelCalc:
     ) -> dict:
         """
         Расчёт времён всех стадий одного цикла работы Экскаватора
-        ждём самосвал, наполняем ковш, поворачиваемся, грузим и всё с самого начала
+        ждём самосвал, наполняем ковш, поворачиваемся, грузим и всё с самого начала.
+        Результат кэшируется по снимку свойств экскаватора и параметрам цикла
         """
+        params = (glubina_vrezki_m, dlina_drag_m, visota_podem_m, ugol_swing_rad, ugol_dump_rad, alpha_idle)
+        cycle = cls._cycle_cache.get_or_compute(
+            (props_snapshot(props, SHOVEL_CYCLE_FIELDS), params),
+            lambda: cls._calculate_cycle(props, *params),
+        )
+        return dict(cycle)
+
+    @classmethod
+    def _calculate_cycle(
+        cls,
+        props: ShovelProperties,
+        glubina_vrezki_m, dlina_drag_m,
+        visota_podem_m, ugol_swing_rad,
+        ugol_dump_rad, alpha_idle
+    ) -> dict:
         k = cls.get_koef(props)
         # ВРЕЗКА КОВША (Глубина * Коэф. сопротивления * Коэф. влажности) / Скорость * Коэф. температуры
         t1 = (glubina_vrezki_m * k['K_r'] * k['K_w']) / props.skorost_vrezki_m_s * k['K_T']
@@ -103,6 +132,32 @@ class ShovelCalc:
             weight += cycle_weight
             yield int(cycle["vsego_s"]), cycle_weight, cycle_volume
 
+    @classmethod
+    def calculate_load_schedule(
+            cls,
+            shovel_props: ShovelProperties,
+            truck_props: TruckProperties
+    ) -> LoadSchedule:
+        """
+        Расписание погрузки самосвала: по каждому ковшу время цикла и накопленные вес и объём.
+
+        Считается один раз на пару (снимок свойств экскаватора, грузоподъёмность самосвала) и
+        используется погрузкой в симуляции, планировщиком и жадным решателем
+        """
+        key = (props_snapshot(shovel_props, SHOVEL_CYCLE_FIELDS), truck_props.body_capacity)
+
+        def compute() -> LoadSchedule:
+            schedule = []
+            total_weight = 0
+            total_volume = 0
+            for time, weight, volume in cls._calculate_load_cycles_generator(shovel_props, truck_props):
+                total_weight += weight
+                total_volume += volume
+                schedule.append((time, total_weight, total_volume))
+            return tuple(schedule)
+
+        return cls._schedule_cache.get_or_compute(key, compute)
+
     @classmethod
     def calculate_load_cycles(
             cls,
@@ -112,9 +167,8 @@ class ShovelCalc:
         """
             Рассчитывает суммарные показатели полного цикла погрузки самосвала.
 
-            Агрегирует данные всех циклов погрузки, сгенерированных методом
-            `_calculate_load_cycles_generator`, и возвращает общие итоги по времени,
-            весу и объему за всю операцию погрузки одного самосвала.
+            Агрегирует данные всех циклов погрузки из расписания `calculate_load_schedule`
+            и возвращает общие итоги по времени, весу и объему за всю операцию погрузки одного самосвала.
 
             Parameters
             ----------
@@ -133,19 +187,17 @@ class ShovelCalc:
 
             Notes
             -----
-            - Метод использует генератор `_calculate_load_cycles_generator` для получения
-              последовательности циклов погрузки
+            - Метод использует кэшированное расписание `calculate_load_schedule`, построенное генератором
+              `_calculate_load_cycles_generator`
             - Суммирование прекращается при достижении максимальной грузоподъемности самосвала
             - Возвращаемые значения представляют полную загрузку одного самосвала
         """
-        total_weight = 0
-        total_volime = 0
-        total_time = 0
-        for time, weight, volume in cls._calculate_load_cycles_generator(shovel_props, truck_props):
-            total_time += time
-            total_volime += volume
-            total_weight += weight
-        return total_time, total_weight, total_volime
+        schedule = cls.calculate_load_schedule(shovel_props, truck_props)
+        if not schedule:
+            return 0, 0, 0
+        total_time = sum(time for time, _, _ in schedule)
+        _, total_weight, total_volume = schedule[-1]
+        return total_time, total_weight, total_volume
 
     @classmethod
     def calculate_load_cycles_cumulative_generator(
@@ -181,12 +233,7 @@ class ShovelCalc:
             - Полезен для анализа прогресса погрузки и построения графиков заполнения
             - ВРЕМЯ ВОЗВРАЩАЕТСЯ ДЛЯ ОТДЕЛЬНОГО ЦИКЛА, а вес и объем - кумулятивные
         """
-        total_weight = 0
-        total_volime = 0
-        for time, weight, volume in cls._calculate_load_cycles_generator(shovel_props, truck_props):
-            total_volime += volume
-            total_weight += weight
-            yield time, total_weight, total_volime
+        yield from cls.calculate_load_schedule(shovel_props, truck_props)
 
 
 
@@ -1,12 +1,43 @@
+import math
 from typing import Generator
 
 import numpy as np
 
 from roadnet.core import Edge
+from app.sim_engine.core.calculations.memo import CalcCache
 from app.sim_engine.core.geometry import Point, interpolate_position, haversine_km, RouteEdge
 
 
 class TruckCalc:
+    _time_motion_cache = CalcCache('truck_time_motion')
+
+    @staticmethod
+    def _motion_steps(
+            distance_km: float,
+            initial_speed: float,
+            speed_limit: float,
+            acceleration: float,
+            time_step_sec: int,
+    ) -> Generator[tuple[float, float, int], None, None]:
+        """
+        Шаги равноускоренного движения на заданное расстояние.
+        acceleration - прирост скорости (км/ч) за секунду, поэтому разгон не зависит от шага.
+        Последний шаг укорачивается до времени, реально нужного на остаток пути (с округлением вверх до секунды).
+
+        Возвращает (скорость, пройденная доля пути, длительность шага в секундах)
+        """
+        travelled_km = 0.0
+        speed = initial_speed
+
+        while travelled_km < distance_km:
+            speed = min(speed + acceleration * time_step_sec, speed_limit)
+            delta_km = speed * time_step_sec / 3600.0  # перевод в км
+            step_sec = time_step_sec
+            if travelled_km + delta_km > distance_km and time_step_sec > 1:
+                step_sec = max(1, math.ceil((distance_km - travelled_km) / delta_km * time_step_sec))
+            travelled_km = min(travelled_km + delta_km, distance_km)
+            yield speed, travelled_km / distance_km, step_sec
+
     @classmethod
     def calculate_segment_motion(
             cls,
@@ -16,21 +47,17 @@ class TruckCalc:
             speed_limit: float,
             acceleration: float,
             time_step_sec: int = 1
-    ) -> Generator[tuple[float, Point], None, None]:
+    ) -> Generator[tuple[float, Point, int], None, None]:
         """
         Расчет движения между двумя точками в маршруте
         """
         distance_km = haversine_km(p1, p2)
-        travelled_km = 0.0
-        speed = initial_speed
 
-        while travelled_km < distance_km:
-            speed = min(speed + acceleration, speed_limit)
-            delta_km = speed * time_step_sec / 3600.0  # перевод в км
-            travelled_km = min(travelled_km + delta_km, distance_km)
-            ratio = travelled_km / distance_km
+        for speed, ratio, step_sec in cls._motion_steps(
+                distance_km, initial_speed, speed_limit, acceleration, time_step_sec
+        ):
             new_position = interpolate_position(p1, p2, ratio)
-            yield speed, new_position
+            yield speed, new_position, step_sec
 
     @classmethod
     def calculate_motion(cls, route, props, forward):
@@ -45,8 +72,8 @@ class TruckCalc:
         current_speed = 0.0  # начальная скорость
 
         for i in range(len(points) - 1):
-            for speed, position in cls.calculate_segment_motion(points[i], points[i + 1], current_speed, speed_limit,
-                                                                 acceleration):
+            for speed, position, _ in cls.calculate_segment_motion(points[i], points[i + 1], current_speed,
+                                                                    speed_limit, acceleration):
                 yield speed, position
                 current_speed = speed  # <--- обновляем накопленную скорость
 
@@ -58,28 +85,24 @@ class TruckCalc:
             speed_limit: float,
             acceleration: float,
             time_step_sec: int = 1
-    ) -> Generator[tuple[float, Point], None, None]:
+    ) -> Generator[tuple[float, Point, int], None, None]:
         """
         Расчет движения по ребру графа
         """
         distance_km = edge.length / 1000
         # distance_km = haversine_km(edge.start, edge.stop)
 
-        travelled_km = 0.0
-        speed = initial_speed
-
-        while travelled_km < distance_km:
-            speed = min(speed + acceleration, speed_limit)
-            delta_km = speed * time_step_sec / 3600.0  # перевод в км
-            travelled_km = min(travelled_km + delta_km, distance_km)
-            ratio = travelled_km / distance_km
+        for speed, ratio, step_sec in cls._motion_steps(
+                distance_km, initial_speed, speed_limit, acceleration, time_step_sec
+        ):
             new_position = interpolate_position(edge.start, edge.stop, ratio)
-            yield speed, new_position
+            yield speed, new_position, step_sec
 
     @classmethod
-    def calculate_motion_by_edges(cls, route: RouteEdge, props, forward, is_loaded):
+    def calculate_motion_by_edges(cls, route: RouteEdge, props, forward, is_loaded, time_step_sec: int = 1):
         """
-        Расчет движения по списку ребер графа
+        Расчет движения по списку ребер графа.
+        Возвращает (скорость, позиция, ребро, длительность шага в секундах)
         """
 
         speed_limit = props.speed_empty_kmh if not is_loaded else props.speed_loaded_kmh
@@ -93,19 +116,45 @@ class TruckCalc:
             generator_path = route.move_along_edges_reversed_gen
 
         for edge in generator_path():
-            for speed, position in cls.calculate_edge_motion(
+            for speed, position, step_sec in cls.calculate_edge_motion(
                     edge,
                     current_speed,
                     speed_limit,
-                    acceleration
+                    acceleration,
+                    time_step_sec,
             ):
-                yield speed, position, edge
+                yield speed, position, edge, step_sec
                 current_speed = speed  # <--- обновляем накопленную скорость
 
     @classmethod
     def calculate_time_motion_by_edges(cls, route: RouteEdge, props, forward):
+        """
+        Время движения по маршруту (сек) с шагом 1 с.
+        Зависит только от длин рёбер и динамики самосвала, поэтому кэшируется по ним:
+        одинаковые маршруты для самосвалов одной модели считаются один раз
+        """
         is_loaded = forward
-        return sum([1 for _ in cls.calculate_motion_by_edges(route, props, forward, is_loaded)])
+        speed_limit = props.speed_empty_kmh if not is_loaded else props.speed_loaded_kmh
+        acceleration = props.acceleration_empty if not is_loaded else props.acceleration_loaded
+
+        edges = route.move_along_edges_gen() if forward else route.move_along_edges_reversed_gen()
+        lengths = tuple(edge.length for edge in edges)
+
+        return cls._time_motion_cache.get_or_compute(
+            (lengths, speed_limit, acceleration),
+            lambda: cls._time_motion_by_lengths(lengths, speed_limit, acceleration),
+        )
+
+    @classmethod
+    def _time_motion_by_lengths(cls, lengths: tuple[float, ...], speed_limit: float, acceleration: float) -> int:
+        """То же, что сумма шагов calculate_motion_by_edges, но без расчёта позиций"""
+        total_sec = 0
+        current_speed = 0.0
+        for length in lengths:
+            for speed, _, step_sec in cls._motion_steps(length / 1000, current_speed, speed_limit, acceleration, 1):
+                total_sec += step_sec
+                current_speed = speed
+        return total_sec
 
     # ---- Новые методы расчета из core_sim, пока нигде не работают----
     def time_empty(self) -> int:
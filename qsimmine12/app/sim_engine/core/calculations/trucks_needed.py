@@ -1,4 +1,5 @@
 import math
+from typing import Hashable, Iterator
 
 
 class TrucksNeededCalculator:
@@ -184,3 +185,148 @@ class TrucksNeededCalculator:
             Dur_lunch=shovels_lunches_duration,
         )
         return result.get('N_required', None)
+
+    # region Замкнутая сеть массового обслуживания (MVA)
+
+    @staticmethod
+    def _mva_stations(
+            demands: dict[Hashable, float],
+            servers: dict[Hashable, int],
+            think_time: float,
+    ) -> tuple[dict[Hashable, float], float]:
+        """
+        Приведение многоканальных станций к одноканальным (приближение Зейдмана):
+          станция с c каналами и требованием D = одноканальная с D/c + задержка D*(c-1)/c
+        Возвращает требования одноканальных станций и суммарную задержку (время без очередей)
+        """
+        queue_demands = {}
+        delay = think_time
+        for key, demand in demands.items():
+            c = max(1, servers.get(key, 1))
+            queue_demands[key] = demand / c
+            delay += demand * (c - 1) / c
+        return queue_demands, delay
+
+    @classmethod
+    def _mva_exact_iter(
+            cls,
+            demands: dict[Hashable, float],
+            servers: dict[Hashable, int],
+            think_time: float,
+    ) -> Iterator[dict]:
+        """
+        Точный MVA для замкнутой сети с одним классом заявок, по одному самосвалу за итерацию:
+          R_k(n) = D_k * (1 + Q_k(n-1))
+          X(n) = n / (Z + Σ R_k(n))
+          Q_k(n) = X(n) * R_k(n)
+        """
+        queue_demands, delay = cls._mva_stations(demands, servers, think_time)
+        Q = {key: 0.0 for key in queue_demands}
+
+        n = 0
+        while True:
+            n += 1
+            R = {key: D * (1 + Q[key]) for key, D in queue_demands.items()}
+            X = n / (delay + sum(R.values()))
+            Q = {key: X * R_k for key, R_k in R.items()}
+            yield cls._mva_result(n, X, R, Q, demands, servers, delay)
+
+    @classmethod
+    def _mva_approximate(
+            cls,
+            demands: dict[Hashable, float],
+            servers: dict[Hashable, int],
+            think_time: float,
+            population: int,
+            tolerance: float = 1e-6,
+            max_iterations: int = 1000,
+    ) -> dict:
+        """
+        Приближённый MVA Швейцера–Барда: Q_k(N-1) ≈ (N-1)/N * Q_k(N), решается итерациями до сходимости
+        """
+        queue_demands, delay = cls._mva_stations(demands, servers, think_time)
+        Q = {key: population / max(1, len(queue_demands)) for key in queue_demands}
+        R, X = {}, 0.0
+
+        for _ in range(max_iterations):
+            R = {key: D * (1 + (population - 1) / population * Q[key]) for key, D in queue_demands.items()}
+            X = population / (delay + sum(R.values()))
+            Q_new = {key: X * R_k for key, R_k in R.items()}
+            converged = all(abs(Q_new[key] - Q[key]) < tolerance for key in Q)
+            Q = Q_new
+            if converged:
+                break
+
+        return cls._mva_result(population, X, R, Q, demands, servers, delay)
+
+    @staticmethod
+    def _mva_result(n, X, R, Q, demands, servers, delay) -> dict:
+        return {
+            "population": n,
+            "throughput": X,
+            "cycle_time": n / X if X else float('inf'),
+            "residence": R,
+            "queue_length": Q,
+            "delay": delay,
+            "utilization": {key: X * demand / max(1, servers.get(key, 1)) for key, demand in demands.items()},
+        }
+
+    @classmethod
+    def mean_value_analysis(
+            cls,
+            demands: dict[Hashable, float],
+            servers: dict[Hashable, int],
+            think_time: float,
+            population: int,
+            exact: bool = True,
+    ) -> dict:
+        """
+            Решает замкнутую сеть: самосвалы по кругу проходят станции (экскаваторы, пункты разгрузки),
+            между станциями - движение без очередей (think_time).
+
+            demands - требование к станции за один рейс: доля рейсов через станцию * время обслуживания
+            servers - число каналов станции (одновременно обслуживаемых самосвалов)
+            think_time - время движения за рейс
+            population - количество самосвалов
+            exact - точный MVA (O(N*K)) или приближённый Швейцера–Барда (не зависит от N)
+
+            Результат: throughput - рейсов в единицу времени, cycle_time - время рейса,
+            utilization - загрузка станций, queue_length/residence - очередь и время пребывания на станциях
+        """
+        if population <= 0 or not demands:
+            return cls._mva_result(max(0, population), 0.0, {}, {}, demands, servers, think_time)
+
+        if not exact:
+            return cls._mva_approximate(demands, servers, think_time, population)
+
+        result = None
+        for result in cls._mva_exact_iter(demands, servers, think_time):
+            if result["population"] >= population:
+                break
+        return result
+
+    @classmethod
+    def trucks_needed_by_mva(
+            cls,
+            demands: dict[Hashable, float],
+            servers: dict[Hashable, int],
+            think_time: float,
+            target_keys: list[Hashable],
+            target_utilization: float,
+            max_population: int,
+    ) -> int | None:
+        """
+            Минимальное количество самосвалов, при котором средняя загрузка станций target_keys
+            (экскаваторов) достигает целевой. None - не достигается при max_population самосвалах
+        """
+        if not target_keys:
+            return None
+
+        for result in cls._mva_exact_iter(demands, servers, think_time):
+            utilization = sum(result["utilization"][key] for key in target_keys) / len(target_keys)
+            if utilization >= target_utilization:
+                return result["population"]
+            if result["population"] >= max_population:
+                return None
+
+    # endregion
@@ -1,14 +1,41 @@
+from app.sim_engine.core.calculations.memo import CalcCache, props_snapshot
 from app.sim_engine.core.constants import koef_soprotivleniya, unloading_speed, density_by_material
 from app.sim_engine.core.props import TruckProperties, UnlProperties
 
+# Поля свойств пункта разгрузки, от которых зависит время разгрузки
+UNLOAD_CALC_FIELDS = ('angle', 'material_type', 'type_unloading')
+
+
+def _copy_result(data: dict) -> dict:
+    return {**data, 'params': dict(data['params'])}
+
 
 class UnloadCalc:
+    _cache = CalcCache('unload')
+    _norm_cache = CalcCache('unload_by_norm')
 
     @classmethod
     def unload_calculation(
             cls,
             props: UnlProperties,
             truck_volume
+    ):
+        """
+        Время разгрузки самосвала с объёмом груза truck_volume.
+        Объём груза принимает немного значений (по расписаниям погрузки), поэтому результат
+        кэшируется по снимку свойств пункта разгрузки и объёму
+        """
+        data = cls._cache.get_or_compute(
+            (props_snapshot(props, UNLOAD_CALC_FIELDS), truck_volume),
+            lambda: cls._unload_calculation(props, truck_volume),
+        )
+        return _copy_result(data)
+
+    @classmethod
+    def _unload_calculation(
+            cls,
+            props: UnlProperties,
+            truck_volume
     ):
         """
         1. t_drive — подъезд (сек), фиксированно 30 сек
@@ -44,6 +71,15 @@ class UnloadCalc:
 
     @classmethod
     def unload_calculation_by_norm(cls, unload_props: UnlProperties, truck_props: TruckProperties):
+        """Время разгрузки полного кузова по нормативу, кэшируется по снимку свойств и грузоподъёмности самосвала"""
+        data = cls._norm_cache.get_or_compute(
+            (props_snapshot(unload_props, UNLOAD_CALC_FIELDS), truck_props.body_capacity),
+            lambda: cls._unload_calculation_by_norm(unload_props, truck_props),
+        )
+        return _copy_result(data)
+
+    @classmethod
+    def _unload_calculation_by_norm(cls, unload_props: UnlProperties, truck_props: TruckProperties):
         """
         1. t_drive — подъезд (сек), фиксированно 30 сек
         2. t_stop — остановка и установка (15 сек)
@@ -1,9 +1,14 @@
+import time
+from datetime import datetime, timedelta
+
 import simpy
 
 from app.sim_engine.core.planner.solvers.greedy import GreedySolver
 from app.sim_engine.core.props import SimData
 from app.sim_engine.core.simulations.entities import SimContext
 from app.sim_engine.core.simulations.utils.idle_area_service import IdleAreaService
+from app.sim_engine.core.simulations.utils.profiler import EngineProfiler, ProfiledWriter
+from app.sim_engine.core.simulations.utils.replanning import ReplanningStats
 from app.sim_engine.core.simulations.utils.statistic_service import StatisticService
 from app.sim_engine.core.simulations.utils.service_locator import ServiceLocator
 from app.sim_engine.core.simulations.utils.trip_service import TripService
@@ -17,8 +22,29 @@ class QSimEnvironment(simpy.Environment):
         self.sim_data = sim_data
         self.sim_context: SimContext = SimContext()
 
+        # Часы симуляции: начало в секундах эпохи, время кадров и событий - простое сложение чисел.
+        # datetime строится только по запросу now_dt и запоминается до следующего сдвига env.now
+        self._start_ts: float = sim_data.start_time.timestamp()
+        self._now_dt_at: float | None = None
+        self._now_dt: datetime | None = None
+        # Границы текущего часа в секундах симуляции для now_hour
+        self._hour_begin: float = 0.0
+        self._hour_end: float = -1.0
+        self._hour: int = sim_data.start_time.hour
+
+        # Счётчики прерываний самосвалов при перепланировании
+        self.replanning_stats = ReplanningStats()
+
         ServiceLocator.unbind_all()
 
+        # Профилирование подключается заменой step на экземпляре, при выключенной опции накладных расходов нет
+        self.profiler: EngineProfiler | None = None
+        if sim_conf["profile"]:
+            self.profiler = EngineProfiler()
+            self.step = self._profiled_step
+            writer = ProfiledWriter(writer, self.profiler)
+            ServiceLocator.bind('profiler', self.profiler)
+
         ServiceLocator.bind('sim_env', self)
         ServiceLocator.bind('writer', writer)
         ServiceLocator.bind('sim_conf', sim_conf)
@@ -29,3 +55,38 @@ class QSimEnvironment(simpy.Environment):
             'statistic_service',
             StatisticService()
         )
+
+    @property
+    def now_ts(self) -> float:
+        """Текущее время симуляции в секундах эпохи"""
+        return self._start_ts + self.now
+
+    @property
+    def now_dt(self) -> datetime:
+        """Текущее время симуляции (datetime в часовом поясе начала симуляции)"""
+        if self._now_dt_at != self.now:
+            self._now_dt = self.sim_data.start_time + timedelta(seconds=self.now)
+            self._now_dt_at = self.now
+        return self._now_dt
+
+    @property
+    def now_hour(self) -> int:
+        """Час текущего времени симуляции, пересчитывается только при переходе через границу часа"""
+        if not self._hour_begin <= self.now < self._hour_end:
+            now_dt = self.now_dt
+            self._hour = now_dt.hour
+            self._hour_begin = self.now - (now_dt.minute * 60 + now_dt.second + now_dt.microsecond / 1e6)
+            self._hour_end = self._hour_begin + 3600
+        return self._hour
+
+    def _profiled_step(self) -> None:
+        queue = self._queue
+        if not queue:
+            return super().step()
+
+        source = self.profiler.event_source(queue[0][3])
+        started = time.perf_counter()
+        try:
+            super().step()
+        finally:
+            self.profiler.register_event(source, time.perf_counter() - started, len(queue))
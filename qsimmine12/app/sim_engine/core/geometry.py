@@ -6,6 +6,7 @@ from typing import Tuple
 from roadnet.core import Edge, Vertex, RoadNetFactory
 
 from app.sim_engine.core.props import Route as SimRoute, SimData
+from app.sim_engine.core.simulations.utils.profiler import profiled_section
 from app.sim_engine.enums import ObjectType
 
 
@@ -156,6 +157,7 @@ def build_route_sim(route_dc: SimRoute) -> Route:
 
 # region Routes building
 
+@profiled_section("route_search")
 def build_route_by_road_net(
         shovel_id: int,
         unload_id: int,
@@ -190,17 +192,25 @@ def build_route_by_road_net(
     return Route(f"shov_{source[0]} - unl_{target[0]}", points)
 
 
+def build_road_net_graph(road_net: dict):
+    """Граф дорожной сети по GeoJSON. Для поиска многих маршрутов между объектами строится один раз"""
+    return RoadNetFactory().create_from_geojson(
+        geojson_data=road_net,
+        is_trustful=True,
+    )
+
+
+@profiled_section("route_search")
 def build_route_edges_by_road_net(
         from_object_id: int,
         from_object_type: ObjectType,
         to_object_id: int,
         to_object_type: ObjectType,
         road_net: dict,
+        graph_logic=None,
 ) -> RouteEdge:
-    graph_logic = RoadNetFactory().create_from_geojson(
-        geojson_data=road_net,
-        is_trustful=True,
-    )
+    if graph_logic is None:
+        graph_logic = build_road_net_graph(road_net)
 
     source = (from_object_id, from_object_type.key())
     target = (to_object_id, to_object_type.key())
@@ -213,6 +223,7 @@ def build_route_edges_by_road_net(
     return RouteEdge(result.edges)
 
 
+@profiled_section("route_search")
 def build_route_edges_by_road_net_from_position(
         lon: int | float,
         lat: int | float,
@@ -238,6 +249,7 @@ def build_route_edges_by_road_net_from_position(
     return RouteEdge(result.edges)
 
 
+@profiled_section("route_search")
 def build_route_edges_by_road_net_from_position_to_position(
         lon: float,
         lat: float,
@@ -268,6 +280,7 @@ def build_route_edges_by_road_net_from_position_to_position(
     return RouteEdge(result.edges)
 
 
+@profiled_section("route_search")
 def find_all_route_edges_by_road_net_from_position_to_position(
         lon: float,
         lat: float,
@@ -301,6 +314,7 @@ def find_all_route_edges_by_road_net_from_position_to_position(
     return result
 
 
+@profiled_section("route_search")
 def find_all_route_edges_by_road_net_from_position(
         lon: float,
         lat: float,
@@ -331,6 +345,7 @@ def find_all_route_edges_by_road_net_from_position(
     return result
 
 
+@profiled_section("route_search")
 def find_all_route_edges_by_road_net_from_object_to_object(
         from_object_id: int,
         from_object_type: ObjectType,
@@ -384,6 +399,7 @@ def find_nearest_point(point: Point, point_list: list[Point]):
 
 # region Build routes edges around blasting
 
+@profiled_section("route_search")
 def find_route_edges_around_restricted_zones_from_position_to_object(
         lon: float,
         lat: float,
@@ -417,6 +433,7 @@ def find_route_edges_around_restricted_zones_from_position_to_object(
     return chosen_route
 
 
+@profiled_section("route_search")
 def find_route_edges_around_restricted_zones_from_position_to_position(
         lon: float,
         lat: float,
@@ -22,6 +22,8 @@ class InputPlanningData:
 
     # верхняя граница числа рейсов для каждого самосвала
     Kmax_by_truck: Optional[Dict[int, int]] = None
+    # верхняя граница числа рейсов всего карьера (см. trip_bounds)
+    trip_cap: Optional[int] = None
 
     # Удобные множества ID
     @property
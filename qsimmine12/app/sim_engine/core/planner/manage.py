@@ -1,15 +1,20 @@
 import logging
 from collections import defaultdict
 
-from app.sim_engine.core.calculations.shovel import ShovelCalc
-from app.sim_engine.core.calculations.truck import TruckCalc
-from app.sim_engine.core.calculations.unload import UnloadCalc
-from app.sim_engine.core.geometry import build_route_edges_by_road_net_from_position, build_route_edges_by_road_net
+from pulp import HiGHS_CMD
+
 from app.sim_engine.core.planner.entities import InputPlanningData
+from app.sim_engine.core.planner.plan_cache import get_plan_cache, plan_key
+from app.sim_engine.core.planner.planning_matrix import get_planning_data
+from app.sim_engine.core.planner.rolling_horizon import HorizonWindow, apply_window
 from app.sim_engine.core.planner.solvers.cp import CPSolver
 from app.sim_engine.core.planner.solvers.milp import MILPSolver
+from app.sim_engine.core.planner.solvers.portfolio import PortfolioMember, PortfolioSolver
+from app.sim_engine.core.planner.solvers.time_indexed import TimeIndexedSolver
+from app.sim_engine.core.planner.trip_bounds import compute_trip_bounds
+from app.sim_engine.core.planner.warm_start import PreviousPlan
 from app.sim_engine.core.props import SimData, PlannedTrip
-from app.sim_engine.enums import ObjectType, SolverType
+from app.sim_engine.enums import SolverType
 
 logger = logging.getLogger(__name__)
 
@@ -18,170 +23,122 @@ class Planner:
     SOLVERS = {
         SolverType.CBC: MILPSolver,
         SolverType.HIGHS: MILPSolver,
-        SolverType.CP: CPSolver
+        SolverType.CP: CPSolver,
+        SolverType.TIME_INDEXED: TimeIndexedSolver,
+        SolverType.PORTFOLIO: PortfolioSolver,
     }
+    # Участники портфеля солверов (жадное расписание - всегда, см. PortfolioSolver)
+    PORTFOLIO = (SolverType.CP, SolverType.HIGHS)
+    # Солверы с тёплым стартом. MILP модель требует различных прибытий всех рейсов, а прибытие на первый рейс
+    # равно времени подъезда T_start: для самосвалов с общим начальным положением жадное расписание недопустимо,
+    # поэтому CBC/HiGHS стартуют без него
+    WARM_START_SOLVERS = (SolverType.CP,)
+    # Солверы, в моделях которых разгрузки не пересекаются: для них граница рейсов учитывает
+    # вместимость пунктов разгрузки (см. trip_bounds). Портфель решает одну матрицу и CP, и MILP
+    UNLOAD_CAPACITY_SOLVERS = (SolverType.CP,)
 
     def __init__(
             self,
             solver: SolverType = None,
             msg: bool = False,
             workers: int = 4,
-            time_limit: int = 60
+            time_limit: int = 60,
+            matrix_workers: int = 1,
+            warm_start: bool = True,
+            time_bucket: int = 2,
+            trip_bound_margin: float | None = None,
+            use_plan_cache: bool = False
     ):
         self.msg = msg
         self.workers = workers
+        self.matrix_workers = matrix_workers
+        self.warm_start = warm_start
+        self.time_bucket = time_bucket
+        self.trip_bound_margin = trip_bound_margin
+        self.use_plan_cache = use_plan_cache
         self.time_limit = time_limit
         self.solver = solver
+        # Победитель последнего запуска портфеля солверов
+        self.winner: str | None = None
+        # План последнего запуска взят из кэша планов
+        self.cache_hit = False
+
+    def _solver_settings(self, solver_type: SolverType, workers: int) -> dict:
+        """Настройки солвера - атрибуты класса солвера"""
+        settings = dict(
+            time_limit=self.time_limit,
+            msg_out=self.msg,
+            workers=workers,
+            warm_start=self.warm_start and solver_type in self.WARM_START_SOLVERS,
+        )
+        if solver_type in (SolverType.CBC, SolverType.HIGHS):
+            settings["solver_type"] = solver_type
+        elif solver_type == SolverType.TIME_INDEXED:
+            settings["time_bucket"] = self.time_bucket
+        return settings
+
+    def _portfolio_members(self) -> list[PortfolioMember]:
+        """Участники портфеля; HiGHS без исполняемого файла заменяется CBC. Потоки делятся между участниками"""
+        highs_available = HiGHS_CMD().available()
+        solver_types = [
+            SolverType.CBC if solver_type == SolverType.HIGHS and not highs_available else solver_type
+            for solver_type in self.PORTFOLIO
+        ]
+        workers = max(1, self.workers // len(solver_types))
+        return [
+            PortfolioMember(solver_type, self.SOLVERS[solver_type], self._solver_settings(solver_type, workers))
+            for solver_type in solver_types
+        ]
+
+    def _plan_settings(self) -> dict:
+        """Настройки, от которых зависит план, - часть ключа кэша планов"""
+        solver_type = self.solver or SolverType.CP
+        settings = {"solver": solver_type.key(), "time_limit": self.time_limit}
+        if solver_type == SolverType.TIME_INDEXED:
+            settings["time_bucket"] = self.time_bucket
+        return settings
 
     def _init_solver(self):
-        if self.solver:
-            solver = self.SOLVERS[self.solver]
-        else:
-            solver = self.SOLVERS[SolverType.CP]
+        solver_type = self.solver or SolverType.CP
+        solver = self.SOLVERS[solver_type]
 
-        if self.solver == SolverType.HIGHS:
-            solver.solver_type = SolverType.HIGHS
-        elif self.solver == SolverType.CBC:
-            solver.solver_type = SolverType.CBC
-
-        solver.time_limit = self.time_limit
-        solver.msg_out = self.msg
-        solver.workers = self.workers
+        for key, value in self._solver_settings(solver_type, self.workers).items():
+            setattr(solver, key, value)
+        if solver_type == SolverType.PORTFOLIO:
+            solver.members = self._portfolio_members()
 
         return solver
 
-    @staticmethod
-    def get_planning_data(simdata: SimData) -> InputPlanningData:
+    def get_planning_data(self, simdata: SimData) -> InputPlanningData:
         """
-        Метод набивающий матрицу данных
+        Метод набивающий матрицу данных (см. planning_matrix.get_planning_data)
         """
-        truck_count = len(simdata.trucks)
-        shovel_count = len(simdata.shovels)
-        unl_count = len(simdata.unloads)
-        shift_change_area = simdata.idle_areas.shift_change_areas[0]
-
-        planning_data = InputPlanningData(
-            N=truck_count,
-            M=shovel_count,
-            Z=unl_count,
-            D_work=int(simdata.duration / 60),
-
-            T_haul=dict(),
-            T_return=dict(),
-            T_load=dict(),
-            T_unload=dict(),
-            T_start=dict(),
-            T_end=dict(),
-            m_tons=dict(),
-
-            Kmax_by_truck=None
-        )
+        return get_planning_data(simdata, workers=self.matrix_workers)
 
-        # Идем по самосвалам
-        for truck in simdata.trucks.values():
-
-            # Идем по экскаваторам
-            for shovel in simdata.shovels.values():
-                time_load, weight, _ = ShovelCalc.calculate_load_cycles(shovel.properties, truck.properties)
-
-                planning_data.T_load[
-                    truck.id,
-                    shovel.id
-                ] = int(time_load / 60)
-
-                if truck.initial_edge_id and truck.initial_lat and truck.initial_lon:
-                    start_route = build_route_edges_by_road_net_from_position(
-                        lon=truck.initial_lon,
-                        lat=truck.initial_lat,
-                        edge_idx=truck.initial_edge_id,
-                        height=None,
-                        to_object_id=shovel.id,
-                        to_object_type=ObjectType.SHOVEL,
-                        road_net=simdata.road_net,
-                    )
-
-                else:
-                    start_route = build_route_edges_by_road_net(
-                        from_object_id=shift_change_area.id,
-                        from_object_type=ObjectType.IDLE_AREA,
-                        to_object_id=shovel.id,
-                        to_object_type=ObjectType.SHOVEL,
-                        road_net=simdata.road_net
-                    )
-
-                planning_data.T_start[
-                    truck.id,
-                    shovel.id
-                ] = int(TruckCalc.calculate_time_motion_by_edges(
-                    start_route,
-                    truck.properties,
-                    forward=True
-                ) / 60)
-
-                planning_data.m_tons[
-                    truck.id,
-                    shovel.id
-                ] = int(weight)
-
-                # Идем по пунктам разгрузки
-                for unload in simdata.unloads.values():
-                    route = build_route_edges_by_road_net(
-                        from_object_id=shovel.id,
-                        from_object_type=ObjectType.SHOVEL,
-                        to_object_id=unload.id,
-                        to_object_type=ObjectType.UNLOAD,
-                        road_net=simdata.road_net
-                    )
-                    planning_data.T_haul[
-                        truck.id,
-                        shovel.id,
-                        unload.id
-                    ] = int(TruckCalc.calculate_time_motion_by_edges(
-                        route,
-                        truck.properties,
-                        forward=True
-                    ) / 60)
-
-                    planning_data.T_return[
-                        truck.id,
-                        unload.id,
-                        shovel.id
-                    ] = int(TruckCalc.calculate_time_motion_by_edges(
-                        route,
-                        truck.properties,
-                        forward=False
-                    ) / 60)
-
-            # Идем по пунктам разгрузки
-            for unload in simdata.unloads.values():
-                planning_data.T_unload[
-                    truck.id,
-                    unload.id
-                ] = int(UnloadCalc.unload_calculation_by_norm(unload.properties, truck.properties)["t_total"] / 60)
-
-                end_route = build_route_edges_by_road_net(
-                    from_object_id=unload.id,
-                    from_object_type=ObjectType.UNLOAD,
-                    to_object_id=shift_change_area.id,
-                    to_object_type=ObjectType.IDLE_AREA,
-                    road_net=simdata.road_net
-                )
-
-                planning_data.T_end[
-                    truck.id,
-                    unload.id
-                ] = int(TruckCalc.calculate_time_motion_by_edges(
-                    end_route,
-                    truck.properties,
-                    forward=True
-                ) / 60)
+    def apply_trip_bounds(self, planning_data: InputPlanningData) -> dict:
+        """
+        Уточняет границы числа рейсов матрицы планирования (см. trip_bounds.compute_trip_bounds)
+        и возвращает отчёт о сокращении размера моделей
+        """
+        bounds = compute_trip_bounds(
+            planning_data,
+            margin=self.trip_bound_margin,
+            unload_capacity=(self.solver or SolverType.CP) in self.UNLOAD_CAPACITY_SOLVERS,
+        )
+        planning_data.Kmax_by_truck = bounds.per_truck
+        planning_data.trip_cap = bounds.global_cap
 
-        return planning_data
+        report = bounds.report(planning_data)
+        if self.msg:
+            logger.info('Trip bounds', report)
+        return report
 
     def run_with_exclude(
             self,
             sim_data: SimData,
             exclude_objects: dict[str, list[int]],
+            window: HorizonWindow | None = None,
+            previous_plan: PreviousPlan | None = None,
     ) -> dict:
 
         if self.msg:
@@ -205,7 +162,9 @@ class Planner:
         if not sim_data.shovels or not sim_data.unloads or not sim_data.trucks:
             return {}
 
-        result = self.run(simdata=sim_data)
+        result = self.run(
+            simdata=sim_data, window=window, previous_plan=previous_plan, exclude_objects=exclude_objects
+        )
         planned_trips = defaultdict(list)
 
         for trip in result["trips"]:
@@ -218,17 +177,47 @@ class Planner:
             planned_trips[planned_trip.truck_id].append(planned_trip)
         return planned_trips
 
-    def run(self, simdata: SimData):
+    def run(
+            self,
+            simdata: SimData,
+            window: HorizonWindow | None = None,
+            previous_plan: PreviousPlan | None = None,
+            exclude_objects: dict[str, list[int]] | None = None
+    ):
+        """
+        Планирование рейсов; window - окно скользящего горизонта (см. rolling_horizon),
+        previous_plan - предыдущий план для тёплого старта солвера (см. warm_start),
+        exclude_objects - исключённые объекты, входят в ключ кэша планов (см. plan_cache)
+        """
         if self.msg:
             logger.info(f"Planner run!")
 
         planning_data = self.get_planning_data(simdata)
+        if window is not None:
+            apply_window(planning_data, window)
+
+        trip_bounds = self.apply_trip_bounds(planning_data)
 
         if self.msg:
             logger.info(f"Planning data: {planning_data}")
 
-        solver = self._init_solver()
-        result = solver.run(planning_data)
+        cache = get_plan_cache() if self.use_plan_cache else None
+        key = plan_key(planning_data, exclude_objects, self._plan_settings()) if cache else None
+        result = cache.load(key) if cache else None
+        self.cache_hit = result is not None
+
+        if result is None:
+            solver = self._init_solver()
+            result = solver.run(planning_data, previous_plan=previous_plan)
+            self.winner = result.get("winner")
+            result["trip_bounds"] = trip_bounds
+            if cache:
+                cache.store(key, result)
+        else:
+            # план не решался - победителя портфеля нет
+            self.winner = None
+            if self.msg:
+                logger.info('Plan cache hit', cache.info())
 
         if self.msg:
             for trip in result["trips"]:
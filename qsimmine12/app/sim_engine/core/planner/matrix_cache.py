@@ -0,0 +1,292 @@
+"""
+Постоянный кэш составляющих матрицы планирования.
+
+Между запросами на симуляцию карьер обычно не меняется: пересчитывать маршруты и времена рейсов
+при каждом запуске незачем. Составляющие матрицы (времена погрузки и тоннаж, времена гружёного
+и порожнего хода, разгрузки, заезда на пересменку и подъезда от пересменки) хранятся на диске или в Redis.
+
+Ключ записи - отпечаток дорожной сети (GeoJSON вместе с привязками объектов к её вершинам и площадкой
+пересменки) и группы самосвалов с одинаковыми свойствами. Внутри записи значения лежат по id объектов
+и снимку их свойств, так что исключение объектов при перепланировании и правка свойств оборудования
+не требуют сброса кэша. При правке объектов в ObjectService кэш всё равно очищается, чтобы не копить
+записи по устаревшим отпечаткам.
+
+Записи хранятся в JSON (см. encode_entry): в них только числа и кортежи, а чтение pickle из общего
+каталога или Redis позволило бы любому, кто может туда писать, выполнить код в процессе симуляции.
+
+Бэкенд задаётся переменными окружения:
+    PLANNING_CACHE - disk (по умолчанию), redis или off;
+    PLANNING_CACHE_DIR - каталог для disk (по умолчанию cache/planning_matrix рядом с каталогом приложения,
+    доступен только владельцу процесса);
+    PLANNING_CACHE_TTL - время жизни записи, с (по умолчанию неделя; для disk устаревшие файлы удаляются при записи).
+Ошибки кэша не прерывают расчёт: запись просто считается отсутствующей.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any
+
+from app.sim_engine.core.props import SimData
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'qsim:planning_matrix:'
+DEFAULT_TTL = 7 * 24 * 3600
+# Каталог дисковых кэшей по умолчанию - рядом с каталогом приложения, а не в общем tmp
+CACHE_DIR = Path(__file__).resolve().parents[4] / 'cache'
+
+# Разделы записи кэша
+SECTIONS = ('load', 'haul', 'unload', 'end', 'start')
+
+
+def _digest(value: Any) -> str:
+    payload = json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _to_tuple(value: Any) -> Any:
+    """Списки после JSON обратно в кортежи (ключи и значения записей - кортежи)"""
+    if isinstance(value, list):
+        return tuple(_to_tuple(item) for item in value)
+    return value
+
+
+def encode_entry(entry: dict[str, dict]) -> bytes:
+    """Запись кэша в JSON: ключи значений (числа и кортежи) - их JSON-представление строкой"""
+    return json.dumps({
+        section: {json.dumps(key, separators=(',', ':')): value for key, value in values.items()}
+        for section, values in entry.items()
+    }, separators=(',', ':')).encode()
+
+
+def decode_entry(raw: bytes) -> dict[str, dict]:
+    return {
+        section: {_to_tuple(json.loads(key)): _to_tuple(value) for key, value in values.items()}
+        for section, values in json.loads(raw).items()
+    }
+
+
+def road_net_fingerprint(simdata: SimData) -> str:
+    """Отпечаток дорожной сети: GeoJSON с привязками объектов и площадка пересменки"""
+    return _digest([simdata.road_net, simdata.idle_areas.shift_change_areas[0].id])
+
+
+def group_fingerprint(snapshot: tuple) -> str:
+    """Отпечаток группы самосвалов по снимку свойств (см. planning_matrix.TRUCK_PLANNING_FIELDS)"""
+    return _digest(snapshot)[:32]
+
+
+class IMatrixCacheBackend(ABC):
+    @abstractmethod
+    def get(self, key: str) -> bytes | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, key: str, value: bytes) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class DiskMatrixCacheBackend(IMatrixCacheBackend):
+    """
+    Файл на запись в каталоге. Запись атомарная (через временный файл), чтобы параллельные процессы не читали обрывки.
+    Каталог создаётся с доступом только для владельца.
+    prefix - префикс ключей, которые очищает clear (бэкенд используется и кэшем планов, см. plan_cache);
+    max_age - время жизни записи, с (None - без ограничения): устаревшие записи не читаются и удаляются при записи
+    """
+
+    def __init__(self, directory: str | Path, prefix: str = KEY_PREFIX, max_age: int | None = None) -> None:
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.max_age = max_age
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f'{key.replace(":", "_")}.json'
+
+    def _entries(self):
+        return self.directory.glob(f'{self.prefix.replace(":", "_")}*.json')
+
+    def _expired(self, path: Path) -> bool:
+        return self.max_age is not None and time.time() - path.stat().st_mtime > self.max_age
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            if self._expired(path):
+                return None
+            return path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key: str, value: bytes) -> None:
+        self.directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(value)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        self.prune()
+
+    def prune(self) -> None:
+        """Удаляет устаревшие записи"""
+        if self.max_age is None:
+            return
+        for path in self._entries():
+            try:
+                if self._expired(path):
+                    path.unlink(missing_ok=True)
+            except FileNotFoundError:
+                # запись удалена параллельным процессом
+                pass
+
+    def clear(self) -> None:
+        if not self.directory.exists():
+            return
+        for path in self._entries():
+            path.unlink(missing_ok=True)
+
+
+class RedisMatrixCacheBackend(IMatrixCacheBackend):
+    """Записи в Redis с временем жизни. Клиент должен работать с bytes (decode_responses=False)"""
+
+    def __init__(self, client, ttl: int = DEFAULT_TTL, prefix: str = KEY_PREFIX) -> None:
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, ttl: int = DEFAULT_TTL, prefix: str = KEY_PREFIX) -> 'RedisMatrixCacheBackend':
+        import redis
+
+        return cls(redis.Redis.from_url(url), ttl=ttl, prefix=prefix)
+
+    def get(self, key: str) -> bytes | None:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes) -> None:
+        self.client.setex(key, self.ttl, value)
+
+    def clear(self) -> None:
+        pipe = self.client.pipeline()
+        for key in self.client.scan_iter(f'{self.prefix}*'):
+            pipe.delete(key)
+        pipe.execute()
+
+
+class PlanningMatrixCache:
+    """
+    Кэш составляющих матрицы планирования поверх бэкенда.
+    Запись - словарь разделов SECTIONS, каждый раздел - словарь значений по ключу объекта
+    """
+
+    def __init__(self, backend: IMatrixCacheBackend | None) -> None:
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    @staticmethod
+    def entry_key(road_hash: str, group_hash: str) -> str:
+        return f'{KEY_PREFIX}{road_hash}:{group_hash}'
+
+    def load(self, key: str) -> dict[str, dict]:
+        """Запись по ключу; пустая запись, если её нет или её не удалось прочитать"""
+        entry = {section: {} for section in SECTIONS}
+        if not self.enabled:
+            return entry
+
+        try:
+            raw = self.backend.get(key)
+            stored = decode_entry(raw) if raw is not None else None
+        except Exception as e:
+            logger.warning('Planning matrix cache read failed', {'key': key, 'error': repr(e)})
+            stored = None
+
+        if stored is None:
+            self.misses += 1
+            return entry
+
+        self.hits += 1
+        for section in SECTIONS:
+            entry[section].update(stored.get(section, {}))
+        return entry
+
+    def store(self, key: str, entry: dict[str, dict]) -> None:
+        if not self.enabled:
+            return
+        try:
+            self.backend.set(key, encode_entry(entry))
+        except Exception as e:
+            logger.warning('Planning matrix cache write failed', {'key': key, 'error': repr(e)})
+
+    def clear(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        if not self.enabled:
+            return
+        try:
+            self.backend.clear()
+        except Exception as e:
+            logger.warning('Planning matrix cache clear failed', {'error': repr(e)})
+
+    def info(self) -> dict:
+        return {
+            'backend': type(self.backend).__name__ if self.enabled else None,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+def backend_from_env() -> IMatrixCacheBackend | None:
+    kind = os.getenv('PLANNING_CACHE', 'disk').lower()
+    ttl = int(os.getenv('PLANNING_CACHE_TTL', DEFAULT_TTL))
+    if kind == 'off':
+        return None
+    if kind == 'redis':
+        return RedisMatrixCacheBackend.from_url(
+            os.getenv('REDIS_URL', 'redis://not_found_in_env'),
+            ttl=ttl,
+        )
+    if kind == 'disk':
+        return DiskMatrixCacheBackend(
+            os.getenv('PLANNING_CACHE_DIR') or CACHE_DIR / 'planning_matrix',
+            max_age=ttl,
+        )
+    raise ValueError(f'Неизвестный бэкенд кэша матрицы планирования: {kind}')
+
+
+_cache: PlanningMatrixCache | None = None
+
+
+def get_planning_cache() -> PlanningMatrixCache:
+    """Кэш процесса; при первом обращении бэкенд берётся из переменных окружения"""
+    global _cache
+    if _cache is None:
+        _cache = PlanningMatrixCache(backend_from_env())
+    return _cache
+
+
+def configure_planning_cache(backend: IMatrixCacheBackend | None) -> PlanningMatrixCache:
+    """Явно задаёт бэкенд кэша (None - кэш выключен)"""
+    global _cache
+    _cache = PlanningMatrixCache(backend)
+    return _cache
+
+
+def invalidate_planning_cache() -> None:
+    """Очищает кэш после правки объектов карьера или дорожной сети"""
+    get_planning_cache().clear()
@@ -0,0 +1,139 @@
+"""
+Кэш результатов планировщика с адресацией по содержимому.
+
+Одна и та же матрица планирования решается многократно: повторные запросы на симуляцию, прогоны
+достоверного результата с одинаковой картиной отказов (перепланирование в Quarry.rebuild_plan_*
+при тех же исключённых объектах и положениях самосвалов). Ключ записи - хэш канонического
+представления матрицы (после окна скользящего горизонта и границ числа рейсов), исключённых объектов
+и настроек солвера, влияющих на план. Поэтому сбрасывать кэш при правке карьера не нужно: изменённые
+данные дают другой ключ.
+
+Кэш включается настройкой SIM_CONFIG["plan_cache"] (по умолчанию выключен): при перепланировании в середине
+смены матрица включает текущие положения самосвалов, и почти каждая такая запись больше не запрашивается.
+
+Бэкенды - те же, что у кэша матрицы планирования (см. matrix_cache), и общие для процессов:
+    PLAN_CACHE - disk (по умолчанию), redis или off;
+    PLAN_CACHE_DIR - каталог для disk (по умолчанию cache/plans рядом с каталогом приложения, см. matrix_cache);
+    PLAN_CACHE_TTL - время жизни записи, с (по умолчанию неделя; для disk устаревшие файлы удаляются при записи).
+Записи хранятся в JSON. Сохраняются только планы с рейсами. Ошибки кэша не прерывают расчёт: запись считается
+отсутствующей.
+"""
+import json
+import logging
+import os
+from dataclasses import fields
+
+from app.sim_engine.core.planner.entities import InputPlanningData
+from app.sim_engine.core.planner.matrix_cache import CACHE_DIR, DEFAULT_TTL, DiskMatrixCacheBackend, \
+    IMatrixCacheBackend, RedisMatrixCacheBackend, _digest
+
+logger = logging.getLogger(__name__)
+
+PLAN_KEY_PREFIX = 'qsim:plan:'
+
+
+def canonical_planning_data(inst: InputPlanningData) -> dict:
+    """Каноническое представление матрицы: словари с ключами-кортежами - отсортированные списки пар"""
+    canonical = {}
+    for item in fields(inst):
+        value = getattr(inst, item.name)
+        canonical[item.name] = sorted(value.items()) if isinstance(value, dict) else value
+    return canonical
+
+
+def plan_key(inst: InputPlanningData, exclude_objects: dict[str, list[int]] | None, settings: dict) -> str:
+    exclusions = {key: sorted(ids) for key, ids in (exclude_objects or {}).items()}
+    return f'{PLAN_KEY_PREFIX}{_digest([canonical_planning_data(inst), exclusions, settings])}'
+
+
+class PlanCache:
+    """Кэш результатов Planner.run поверх бэкенда кэша матрицы планирования"""
+
+    def __init__(self, backend: IMatrixCacheBackend | None) -> None:
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def load(self, key: str) -> dict | None:
+        if not self.enabled:
+            return None
+
+        try:
+            raw = self.backend.get(key)
+            result = json.loads(raw) if raw is not None else None
+        except Exception as e:
+            logger.warning('Plan cache read failed', {'key': key, 'error': repr(e)})
+            result = None
+
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def store(self, key: str, result: dict) -> None:
+        if not self.enabled or not result.get("trips"):
+            return
+        try:
+            self.backend.set(key, json.dumps(result).encode())
+        except Exception as e:
+            logger.warning('Plan cache write failed', {'key': key, 'error': repr(e)})
+
+    def clear(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        if not self.enabled:
+            return
+        try:
+            self.backend.clear()
+        except Exception as e:
+            logger.warning('Plan cache clear failed', {'error': repr(e)})
+
+    def info(self) -> dict:
+        return {
+            'backend': type(self.backend).__name__ if self.enabled else None,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+def backend_from_env() -> IMatrixCacheBackend | None:
+    kind = os.getenv('PLAN_CACHE', 'disk').lower()
+    ttl = int(os.getenv('PLAN_CACHE_TTL', DEFAULT_TTL))
+    if kind == 'off':
+        return None
+    if kind == 'redis':
+        return RedisMatrixCacheBackend.from_url(
+            os.getenv('REDIS_URL', 'redis://not_found_in_env'),
+            ttl=ttl,
+            prefix=PLAN_KEY_PREFIX,
+        )
+    if kind == 'disk':
+        return DiskMatrixCacheBackend(
+            os.getenv('PLAN_CACHE_DIR') or CACHE_DIR / 'plans',
+            prefix=PLAN_KEY_PREFIX,
+            max_age=ttl,
+        )
+    raise ValueError(f'Неизвестный бэкенд кэша планов: {kind}')
+
+
+_cache: PlanCache | None = None
+
+
+def get_plan_cache() -> PlanCache:
+    """Кэш процесса; при первом обращении бэкенд берётся из переменных окружения"""
+    global _cache
+    if _cache is None:
+        _cache = PlanCache(backend_from_env())
+    return _cache
+
+
+def configure_plan_cache(backend: IMatrixCacheBackend | None) -> PlanCache:
+    """Явно задаёт бэкенд кэша (None - кэш выключен)"""
+    global _cache
+    _cache = PlanCache(backend)
+    return _cache
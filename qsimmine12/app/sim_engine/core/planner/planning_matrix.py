@@ -1,20 +1,254 @@
-from app.sim_engine.core.calculations.shovel import ShovelCalc
+import math
+import multiprocessing
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property
+from typing import Any, Callable
+
+from app.sim_engine.core.calculations.memo import props_snapshot
+from app.sim_engine.core.calculations.shovel import ShovelCalc, SHOVEL_CYCLE_FIELDS
 from app.sim_engine.core.calculations.truck import TruckCalc
-from app.sim_engine.core.calculations.unload import UnloadCalc
-from app.sim_engine.core.geometry import build_route_edges_by_road_net_from_position, build_route_edges_by_road_net
+from app.sim_engine.core.calculations.unload import UnloadCalc, UNLOAD_CALC_FIELDS
+from app.sim_engine.core.geometry import build_route_edges_by_road_net_from_position, build_route_edges_by_road_net, \
+    build_road_net_graph, RouteEdge
 from app.sim_engine.core.planner.entities import InputPlanningData
-from app.sim_engine.core.props import SimData
+from app.sim_engine.core.planner.matrix_cache import get_planning_cache, group_fingerprint, road_net_fingerprint
+from app.sim_engine.core.props import SimData, Truck, TruckProperties
 from app.sim_engine.enums import ObjectType
 
+# Поля свойств самосвала, от которых зависят времена и тоннаж в матрице планирования
+TRUCK_PLANNING_FIELDS = (
+    'body_capacity', 'speed_empty_kmh', 'speed_loaded_kmh', 'acceleration_empty', 'acceleration_loaded',
+)
+
+
+def start_position_key(truck: Truck) -> tuple | None:
+    """Ключ начального положения самосвала: ребро и координаты, None - площадка пересменки"""
+    if truck.initial_edge_id and truck.initial_lat and truck.initial_lon:
+        return truck.initial_edge_id, truck.initial_lat, truck.initial_lon
+    return None
+
+
+def build_start_route(simdata: SimData, truck: Truck, shovel_id: int) -> RouteEdge:
+    """Маршрут подъезда самосвала к экскаватору: от положения на ребре дороги, а без него - от площадки пересменки"""
+    if start_position_key(truck) is not None:
+        return build_route_edges_by_road_net_from_position(
+            lon=truck.initial_lon,
+            lat=truck.initial_lat,
+            edge_idx=truck.initial_edge_id,
+            height=None,
+            to_object_id=shovel_id,
+            to_object_type=ObjectType.SHOVEL,
+            road_net=simdata.road_net,
+        )
+
+    return build_route_edges_by_road_net(
+        from_object_id=simdata.idle_areas.shift_change_areas[0].id,
+        from_object_type=ObjectType.IDLE_AREA,
+        to_object_id=shovel_id,
+        to_object_type=ObjectType.SHOVEL,
+        road_net=simdata.road_net
+    )
+
+
+def calculate_start_time(simdata: SimData, truck: Truck, shovel_id: int) -> int:
+    """Время подъезда самосвала к экскаватору (мин)"""
+    return int(TruckCalc.calculate_time_motion_by_edges(
+        build_start_route(simdata, truck, shovel_id),
+        truck.properties,
+        forward=True
+    ) / 60)
+
+
+def matrix_workers(sim_conf: dict) -> int:
+    """
+    Число процессов построения матрицы: SIM_CONFIG["matrix_workers"] (по умолчанию 1 - без пула, None - авто),
+    но не больше SIM_CONFIG["workers"] и числа ядер
+    """
+    limit = max(1, min(sim_conf.get("workers") or 1, os.cpu_count() or 1))
+    workers = sim_conf.get("matrix_workers")
+    if workers is None:
+        return limit
+    return max(1, min(workers, limit))
+
+
+# Задача расчёта маршрута: (вид, ключ, группы самосвалов ((снимок свойств, свойства), ...)).
+# Виды: haul - (экскаватор, пункт разгрузки), end - пункт разгрузки, start - (начальное положение, экскаватор)
+RouteTask = tuple[str, tuple | int, tuple[tuple[tuple, TruckProperties], ...]]
+
+# Виды задач, которые считаются в пуле: маршруты между объектами по общему графу дорожной сети.
+# Подъезд (start) зависит от текущих положений самосвалов, не кэшируется и считается последовательно
+POOLED_TASK_KINDS = ('haul', 'end')
+
+# Меньше задач на процесс пул не окупается
+MIN_TASKS_PER_WORKER = 16
+CHUNKS_PER_WORKER = 4
+
+
+class _RouteTimes:
+    """
+    Времена движения групп самосвалов по маршрутам задач (мин).
+
+    Граф дорожной сети строится при первом маршруте между объектами и используется для всех остальных.
+    Подъезд от положения на ребре дороги ищется по своему графу, т.к. поиск от позиции
+    достраивает граф на месте
+    """
+
+    def __init__(self, road_net: dict, shift_change_area_id: int) -> None:
+        self.road_net = road_net
+        self.shift_change_area_id = shift_change_area_id
+
+    @cached_property
+    def graph(self):
+        return build_road_net_graph(self.road_net)
+
+    def route(self, kind: str, key) -> RouteEdge:
+        if kind == 'haul':
+            shovel_id, unload_id = key
+            return build_route_edges_by_road_net(
+                from_object_id=shovel_id,
+                from_object_type=ObjectType.SHOVEL,
+                to_object_id=unload_id,
+                to_object_type=ObjectType.UNLOAD,
+                road_net=self.road_net,
+                graph_logic=self.graph,
+            )
+        if kind == 'end':
+            return build_route_edges_by_road_net(
+                from_object_id=key,
+                from_object_type=ObjectType.UNLOAD,
+                to_object_id=self.shift_change_area_id,
+                to_object_type=ObjectType.IDLE_AREA,
+                road_net=self.road_net,
+                graph_logic=self.graph,
+            )
+
+        position, shovel_id = key
+        if position is None:
+            return build_route_edges_by_road_net(
+                from_object_id=self.shift_change_area_id,
+                from_object_type=ObjectType.IDLE_AREA,
+                to_object_id=shovel_id,
+                to_object_type=ObjectType.SHOVEL,
+                road_net=self.road_net,
+                graph_logic=self.graph,
+            )
+        edge_id, lat, lon = position
+        return build_route_edges_by_road_net_from_position(
+            lon=lon,
+            lat=lat,
+            edge_idx=edge_id,
+            height=None,
+            to_object_id=shovel_id,
+            to_object_type=ObjectType.SHOVEL,
+            road_net=self.road_net,
+        )
+
+    def __call__(self, task: RouteTask) -> list:
+        kind, key, groups = task
+        route = self.route(kind, key)
+
+        times = []
+        for _, props in groups:
+            time_forward = int(TruckCalc.calculate_time_motion_by_edges(route, props, forward=True) / 60)
+            if kind == 'haul':
+                time_back = int(TruckCalc.calculate_time_motion_by_edges(route, props, forward=False) / 60)
+                times.append((time_forward, time_back))
+            else:
+                times.append(time_forward)
+        return times
+
+
+_worker_route_times: _RouteTimes | None = None
+
+
+def _init_route_worker(road_net: dict, shift_change_area_id: int) -> None:
+    global _worker_route_times
+    _worker_route_times = _RouteTimes(road_net, shift_change_area_id)
+
+
+def _route_times_chunk(tasks: list[RouteTask]) -> list[list]:
+    return [_worker_route_times(task) for task in tasks]
 
-def get_planning_data(simdata: SimData) -> InputPlanningData:
+
+def compute_route_tasks(simdata: SimData, tasks: list[RouteTask], workers: int = 1) -> list[list]:
+    """
+    Времена по задачам в порядке задач. При workers > 1 маршруты между объектами (POOLED_TASK_KINDS,
+    их нет в кэше только при холодном построении) делятся на части и считаются в пуле процессов, каждый
+    процесс строит граф дорожной сети один раз. Процессы пула запускаются через spawn: fork в многопоточном
+    веб-воркере небезопасен. Подъезды и всё в демон-процессе (например, в пуле прогонов достоверного
+    результата, где дочерние процессы запрещены) считаются последовательно
+    """
+    if not tasks:
+        return []
+
+    shift_change_area_id = simdata.idle_areas.shift_change_areas[0].id
+    route_times = _RouteTimes(simdata.road_net, shift_change_area_id)
+
+    pooled = [idx for idx, (kind, _, _) in enumerate(tasks) if kind in POOLED_TASK_KINDS]
+    workers = min(workers, math.ceil(len(pooled) / MIN_TASKS_PER_WORKER))
+    if workers <= 1 or multiprocessing.current_process().daemon:
+        return [route_times(task) for task in tasks]
+
+    pooled_tasks = [tasks[idx] for idx in pooled]
+    chunk_size = math.ceil(len(pooled_tasks) / (workers * CHUNKS_PER_WORKER))
+    chunks = [pooled_tasks[i:i + chunk_size] for i in range(0, len(pooled_tasks), chunk_size)]
+
+    results: list[list | None] = [None] * len(tasks)
+    with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_route_worker,
+            initargs=(simdata.road_net, shift_change_area_id)
+    ) as executor:
+        chunk_results = executor.map(_route_times_chunk, chunks)
+
+        # подъезды считаются здесь же, пока пул занят маршрутами между объектами
+        pooled_set = set(pooled)
+        for idx, task in enumerate(tasks):
+            if idx not in pooled_set:
+                results[idx] = route_times(task)
+
+        # map сохраняет порядок частей - результат не зависит от порядка завершения процессов
+        pooled_times = (times for chunk_result in chunk_results for times in chunk_result)
+        for idx, times in zip(pooled, pooled_times):
+            results[idx] = times
+    return results
+
+
+class _GroupEntry:
+    """Запись кэша матрицы для группы самосвалов: недостающие значения досчитываются и помечают запись изменённой"""
+
+    def __init__(self, data: dict[str, dict]) -> None:
+        self.data = data
+        self.changed = False
+
+    def get_or_compute(self, section: str, key, compute: Callable[[], Any]) -> Any:
+        values = self.data[section]
+        if key not in values:
+            values[key] = compute()
+            self.changed = True
+        return values[key]
+
+    def set(self, section: str, key, value) -> None:
+        self.data[section][key] = value
+        self.changed = True
+
+
+def get_planning_data(simdata: SimData, workers: int = 1) -> InputPlanningData:
     """
-    Метод набивающий матрицу данных
+    Метод набивающий матрицу данных.
+
+    Времена считаются один раз на группу самосвалов с одинаковыми свойствами (TRUCK_PLANNING_FIELDS)
+    и раздаются всем самосвалам группы. Составляющие матрицы группы берутся из постоянного кэша
+    (см. matrix_cache), маршруты ищутся только для того, чего в кэше нет, - задачами по маршруту
+    для всех групп сразу (см. compute_route_tasks). Подъезд от начального положения на ребре дороги
+    зависит от текущей позиции и в кэш не попадает
     """
     truck_count = len(simdata.trucks)
     shovel_count = len(simdata.shovels)
     unl_count = len(simdata.unloads)
-    shift_change_area = simdata.idle_areas.shift_change_areas[0]
 
     planning_data = InputPlanningData(
         N=truck_count,
@@ -33,103 +267,100 @@ def get_planning_data(simdata: SimData) -> InputPlanningData:
         Kmax_by_truck=None
     )
 
-    # Идем по самосвалам
+    cache = get_planning_cache()
+    road_hash = road_net_fingerprint(simdata) if cache.enabled and simdata.trucks else None
+
+    # Группы самосвалов с одинаковыми свойствами
+    groups: dict[tuple, list[Truck]] = defaultdict(list)
     for truck in simdata.trucks.values():
+        groups[props_snapshot(truck.properties, TRUCK_PLANNING_FIELDS)].append(truck)
+
+    cache_keys: dict[tuple, str | None] = {}
+    entries: dict[tuple, _GroupEntry] = {}
+    # (вид, ключ) -> группы, которым нужен маршрут
+    route_groups: dict[tuple[str, Any], list[tuple[tuple, TruckProperties]]] = defaultdict(list)
+
+    for snapshot, trucks in groups.items():
+        props = trucks[0].properties
+        cache_keys[snapshot] = cache.entry_key(road_hash, group_fingerprint(snapshot)) if road_hash else None
+        entry = entries[snapshot] = _GroupEntry(cache.load(cache_keys[snapshot]))
+        group = (snapshot, props)
 
-        # Идем по экскаваторам
+        # Погрузка и разгрузка не зависят от маршрутов и считаются сразу
         for shovel in simdata.shovels.values():
-            time_load, weight, _ = ShovelCalc.calculate_load_cycles(shovel.properties, truck.properties)
-
-            planning_data.T_load[
-                truck.id,
-                shovel.id
-            ] = int(time_load / 60)
-
-            if truck.initial_edge_id and truck.initial_lat and truck.initial_lon:
-                start_route = build_route_edges_by_road_net_from_position(
-                    lon=truck.initial_lon,
-                    lat=truck.initial_lat,
-                    edge_idx=truck.initial_edge_id,
-                    height=None,
-                    to_object_id=shovel.id,
-                    to_object_type=ObjectType.SHOVEL,
-                    road_net=simdata.road_net,
-                )
+            def calculate_load():
+                time_load, weight, _ = ShovelCalc.calculate_load_cycles(shovel.properties, props)
+                return int(time_load / 60), int(weight)
 
+            entry.get_or_compute(
+                'load', (shovel.id, props_snapshot(shovel.properties, SHOVEL_CYCLE_FIELDS)), calculate_load
+            )
+
+            for unload in simdata.unloads.values():
+                if (shovel.id, unload.id) not in entry.data['haul']:
+                    route_groups['haul', (shovel.id, unload.id)].append(group)
+
+            positions = dict.fromkeys(start_position_key(truck) for truck in trucks)
+            for position in positions:
+                if position is not None or shovel.id not in entry.data['start']:
+                    route_groups['start', (position, shovel.id)].append(group)
+
+        for unload in simdata.unloads.values():
+            entry.get_or_compute(
+                'unload',
+                (unload.id, props_snapshot(unload.properties, UNLOAD_CALC_FIELDS)),
+                lambda: int(UnloadCalc.unload_calculation_by_norm(unload.properties, props)["t_total"] / 60)
+            )
+            if unload.id not in entry.data['end']:
+                route_groups['end', unload.id].append(group)
+
+    tasks = [(kind, key, tuple(task_groups)) for (kind, key), task_groups in route_groups.items()]
+    # Подъезд от положения на ребре дороги: (снимок свойств, положение, экскаватор) -> время
+    position_starts: dict[tuple, int] = {}
+
+    for (kind, key, task_groups), times in zip(tasks, compute_route_tasks(simdata, tasks, workers)):
+        for (snapshot, _), value in zip(task_groups, times):
+            if kind != 'start':
+                entries[snapshot].set(kind, key, value)
+                continue
+
+            position, shovel_id = key
+            if position is None:
+                entries[snapshot].set('start', shovel_id, value)
             else:
-                start_route = build_route_edges_by_road_net(
-                    from_object_id=shift_change_area.id,
-                    from_object_type=ObjectType.IDLE_AREA,
-                    to_object_id=shovel.id,
-                    to_object_type=ObjectType.SHOVEL,
-                    road_net=simdata.road_net
-                )
-
-            planning_data.T_start[
-                truck.id,
-                shovel.id
-            ] = int(TruckCalc.calculate_time_motion_by_edges(
-                start_route,
-                truck.properties,
-                forward=True
-            ) / 60)
-
-            planning_data.m_tons[
-                truck.id,
-                shovel.id
-            ] = int(weight)
-
-            # Идем по пунктам разгрузки
+                position_starts[snapshot, position, shovel_id] = value
+
+    for snapshot, trucks in groups.items():
+        entry = entries[snapshot].data
+
+        for shovel in simdata.shovels.values():
+            time_load, weight = entry['load'][shovel.id, props_snapshot(shovel.properties, SHOVEL_CYCLE_FIELDS)]
+
+            for truck in trucks:
+                position = start_position_key(truck)
+                planning_data.T_load[truck.id, shovel.id] = time_load
+                planning_data.m_tons[truck.id, shovel.id] = weight
+                if position is None:
+                    planning_data.T_start[truck.id, shovel.id] = entry['start'][shovel.id]
+                else:
+                    planning_data.T_start[truck.id, shovel.id] = position_starts[snapshot, position, shovel.id]
+
             for unload in simdata.unloads.values():
-                route = build_route_edges_by_road_net(
-                    from_object_id=shovel.id,
-                    from_object_type=ObjectType.SHOVEL,
-                    to_object_id=unload.id,
-                    to_object_type=ObjectType.UNLOAD,
-                    road_net=simdata.road_net
-                )
-                planning_data.T_haul[
-                    truck.id,
-                    shovel.id,
-                    unload.id
-                ] = int(TruckCalc.calculate_time_motion_by_edges(
-                    route,
-                    truck.properties,
-                    forward=True
-                ) / 60)
-
-                planning_data.T_return[
-                    truck.id,
-                    unload.id,
-                    shovel.id
-                ] = int(TruckCalc.calculate_time_motion_by_edges(
-                    route,
-                    truck.properties,
-                    forward=False
-                ) / 60)
-
-        # Идем по пунктам разгрузки
+                time_haul, time_return = entry['haul'][shovel.id, unload.id]
+
+                for truck in trucks:
+                    planning_data.T_haul[truck.id, shovel.id, unload.id] = time_haul
+                    planning_data.T_return[truck.id, unload.id, shovel.id] = time_return
+
         for unload in simdata.unloads.values():
-            planning_data.T_unload[
-                truck.id,
-                unload.id
-            ] = int(UnloadCalc.unload_calculation_by_norm(unload.properties, truck.properties)["t_total"] / 60)
+            time_unload = entry['unload'][unload.id, props_snapshot(unload.properties, UNLOAD_CALC_FIELDS)]
+            time_end = entry['end'][unload.id]
 
-            end_route = build_route_edges_by_road_net(
-                from_object_id=unload.id,
-                from_object_type=ObjectType.UNLOAD,
-                to_object_id=shift_change_area.id,
-                to_object_type=ObjectType.IDLE_AREA,
-                road_net=simdata.road_net
-            )
+            for truck in trucks:
+                planning_data.T_unload[truck.id, unload.id] = time_unload
+                planning_data.T_end[truck.id, unload.id] = time_end
 
-            planning_data.T_end[
-                truck.id,
-                unload.id
-            ] = int(TruckCalc.calculate_time_motion_by_edges(
-                end_route,
-                truck.properties,
-                forward=True
-            ) / 60)
+        if cache_keys[snapshot] and entries[snapshot].changed:
+            cache.store(cache_keys[snapshot], entry)
 
-    return planning_data
\ No newline at end of file
+    return planning_data
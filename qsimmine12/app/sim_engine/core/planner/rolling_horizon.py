@@ -0,0 +1,91 @@
+"""
+Скользящий горизонт планирования для солверов CBC/HIGHS/CP.
+
+Вместо всего остатка смены план строится на окно ближайших SIM_CONFIG["rolling_horizon"] минут
+и продлевается каждые SIM_CONFIG["rolling_horizon_step"] минут (и при событиях перепланирования).
+Размер модели, а значит и время решения, ограничены окном, а не длиной смены.
+
+Окно меняет только матрицу планирования, сами модели солверов не меняются:
+- если окно заканчивается раньше смены, возвращаться на пересменку не нужно (T_end = 0), а окно
+  удлиняется на один гружёный ход с разгрузкой - оценка конца окна: рейс, начатый в окне, учитывается целиком;
+- самосвалы, уже начавшие рейс (погрузка, гружёный ход, разгрузка), доезжают его - это закреплённый префикс плана.
+  Они доступны для нового плана только после разгрузки и возврата к экскаватору
+"""
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from app.sim_engine.core.planner.entities import InputPlanningData
+from app.sim_engine.core.props import SimData
+
+# Стадии начатого рейса
+TRIP_STAGE_LOADING = 'loading'
+TRIP_STAGE_HAULING = 'hauling'
+TRIP_STAGE_UNLOADING = 'unloading'
+
+
+@dataclass
+class HorizonWindow:
+    """Окно планирования скользящего горизонта"""
+    # Окно заканчивается раньше смены
+    open_end: bool
+    # Закреплённые рейсы: самосвал -> (стадия, экскаватор, пункт разгрузки)
+    busy_trips: dict[int, tuple[str, int, int]] = field(default_factory=dict)
+
+
+def rolling_horizon(sim_conf: dict) -> int | None:
+    """Длина окна (мин), None - скользящий горизонт выключен"""
+    return sim_conf.get("rolling_horizon") or None
+
+
+def rolling_horizon_step(sim_conf: dict) -> int:
+    """Период продления плана (мин): не больше окна, по умолчанию половина окна"""
+    horizon = rolling_horizon(sim_conf)
+    step = sim_conf.get("rolling_horizon_step") or max(1, horizon // 2)
+    return min(step, horizon)
+
+
+def fit_window(sim_data: SimData, horizon: int | None) -> bool:
+    """
+    Сужает интервал планирования sim_data до окна от start_time.
+    True - окно короче оставшейся смены
+    """
+    if not horizon:
+        return False
+
+    window_end = sim_data.start_time + timedelta(minutes=horizon)
+    if window_end >= sim_data.end_time:
+        return False
+
+    sim_data.end_time = window_end
+    sim_data.duration = horizon * 60
+    return True
+
+
+def apply_window(inst: InputPlanningData, window: HorizonWindow) -> None:
+    """Приводит матрицу планирования к окну (см. описание модуля)"""
+    if window.open_end:
+        tail = 0
+        for i in inst.truck_ids:
+            trip_tails = [
+                inst.T_haul[i, j, z] + inst.T_unload[i, z]
+                for j in inst.shovel_ids for z in inst.unload_ids
+            ]
+            tail = max(tail, min(trip_tails, default=0))
+
+        inst.D_work += tail
+        for key in inst.T_end:
+            inst.T_end[key] = 0
+
+    for i, (stage, j0, z0) in window.busy_trips.items():
+        if (i, j0) not in inst.T_load or (i, z0) not in inst.T_unload:
+            # Самосвал, экскаватор или пункт разгрузки текущего рейса исключены из планирования
+            continue
+
+        remaining = inst.T_unload[i, z0]
+        if stage == TRIP_STAGE_LOADING:
+            remaining += inst.T_load[i, j0] + inst.T_haul[i, j0, z0]
+        elif stage == TRIP_STAGE_HAULING:
+            remaining += inst.T_haul[i, j0, z0]
+
+        for j in inst.shovel_ids:
+            inst.T_start[i, j] = remaining + inst.T_return[i, z0, j]
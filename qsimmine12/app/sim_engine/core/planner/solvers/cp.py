@@ -1,34 +1,52 @@
 import logging
+import time
 
-from math import floor
 from ortools.sat.python import cp_model
 
 from app.sim_engine.core.planner.entities import InputPlanningData
+from app.sim_engine.core.planner.trip_bounds import shortest_cycle_bound
+from app.sim_engine.core.planner.warm_start import PreviousPlan, build_warm_start
 
 logger = logging.getLogger(__name__)
 
 
+class FirstSolutionTimer(cp_model.CpSolverSolutionCallback):
+    """Время до первого допустимого решения (с)"""
+
+    def __init__(self):
+        super().__init__()
+        self.started = time.perf_counter()
+        self.first_solution_sec: float | None = None
+
+    def on_solution_callback(self):
+        if self.first_solution_sec is None:
+            self.first_solution_sec = time.perf_counter() - self.started
+
+
 class CPSolver:
     msg_out: bool
     time_limit: int
     workers: int
+    warm_start: bool = True
 
     @staticmethod
     def compute_Kmax_i(inst: InputPlanningData, i: int) -> int:
-        """Грубая верхняя граница числа рейсов для самосвала i"""
-        js = {j for (ti, j) in inst.T_start.keys() if ti == i}
-        zs = {z for (ti, z) in inst.T_end.keys() if ti == i}
-        min_start = min(inst.T_start[i, j] for j in js)
-        min_end = min(inst.T_end[i, z] for z in zs)
-        min_d = min(
-            inst.T_haul[i, j, z] + inst.T_return[i, z, j] + inst.T_load[i, j] + inst.T_unload[i, z]
-            for j in js for z in zs
-        )
-        available = inst.D_work - min_start - min_end
-        return max(0, floor(available / max(1, min_d)))
+        """Грубая верхняя граница числа рейсов для самосвала i (уточнённые границы - см. trip_bounds)"""
+        return shortest_cycle_bound(inst, i)
 
     @classmethod
-    def build_cp_model(cls, inst: InputPlanningData, use_individual_kmax: bool = True):
+    def build_cp_model(
+            cls,
+            inst: InputPlanningData,
+            use_individual_kmax: bool = True,
+            warm_start: bool = False,
+            previous_plan: PreviousPlan | None = None
+    ):
+        """
+        Модель CP-SAT. При warm_start в модель добавляются подсказки (hints) наличия рейсов, выбора
+        экскаватора и пункта разгрузки и времён начала: из предыдущего плана previous_plan,
+        а без него - из жадного расписания (см. warm_start.build_warm_start)
+        """
         model = cp_model.CpModel()
 
         I = inst.truck_ids
@@ -104,6 +122,10 @@ class CPSolver:
                 if k > 1:
                     model.Add(sum(choose_shovel[i, k, j] for j in J) <= sum(choose_shovel[i, k - 1, j] for j in J))
 
+        # Общая граница рейсов карьера по вместимости экскаваторов и пунктов разгрузки
+        if inst.trip_cap is not None:
+            model.Add(sum(choose_shovel.values()) <= inst.trip_cap)
+
         # Очереди: NoOverlap
         for j in J:
             model.AddNoOverlap(shovel_to_intervals[j])
@@ -151,6 +173,26 @@ class CPSolver:
                     terms.append(ton * choose_shovel[i, k, j])
         model.Maximize(sum(terms))
 
+        if warm_start:
+            hinted = {
+                (trip.truck_id, trip.order): trip
+                for trip in build_warm_start(inst, Kmax_i, previous_plan)
+            }
+            for i in I:
+                for k in range(1, Kmax_i[i] + 1):
+                    trip = hinted.get((i, k))
+                    for j in J:
+                        model.AddHint(choose_shovel[i, k, j], trip is not None and trip.shovel_id == j)
+                    for z in Zs:
+                        model.AddHint(choose_dump[i, k, z], trip is not None and trip.unload_id == z)
+                    if trip is None:
+                        continue
+                    j, z = trip.shovel_id, trip.unload_id
+                    model.AddHint(s_load[i, k, j], trip.start_load)
+                    model.AddHint(e_load[i, k, j], trip.start_load + inst.T_load[i, j])
+                    model.AddHint(s_unload[i, k, z], trip.start_unload)
+                    model.AddHint(e_unload[i, k, z], trip.start_unload + inst.T_unload[i, z])
+
         # Пакуем ссылки для извлечения результатов
         V = dict(
             choose_shovel=choose_shovel, choose_dump=choose_dump,
@@ -160,12 +202,17 @@ class CPSolver:
         return model, V
 
     @classmethod
-    def run(cls, inst: InputPlanningData):
+    def run(cls, inst: InputPlanningData, previous_plan: PreviousPlan | None = None):
         """Решение CP‑SAT и извлечение расписания в прежнем формате."""
 
         if cls.msg_out:
             logger.info("Start builing cp model")
-        model, V = cls.build_cp_model(inst, use_individual_kmax=True)
+        model, V = cls.build_cp_model(
+            inst,
+            use_individual_kmax=True,
+            warm_start=cls.warm_start,
+            previous_plan=previous_plan
+        )
 
         if cls.msg_out:
             logger.info("End builing cp model")
@@ -180,7 +227,8 @@ class CPSolver:
         if cls.msg_out:
             logger.info("Start solve")
 
-        status_code = solver.Solve(model)
+        timer = FirstSolutionTimer()
+        status_code = solver.Solve(model, timer)
 
         if cls.msg_out:
             logger.info("End solve")
@@ -198,6 +246,7 @@ class CPSolver:
         result = {
             "status": status_str,
             "objective": solver.ObjectiveValue() if status_code in (cp_model.OPTIMAL, cp_model.FEASIBLE) else 0.0,
+            "first_solution_sec": timer.first_solution_sec,
             "trips": [],
         }
 
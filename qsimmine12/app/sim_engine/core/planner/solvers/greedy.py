@@ -1,27 +1,37 @@
 import logging
-from copy import deepcopy
+from copy import copy
 from datetime import datetime
 from typing import List
 
+import numpy as np
+
 from app.sim_engine.core.planner.entities import InputPlanningData
-from app.sim_engine.core.planner.planning_matrix import get_planning_data
-from app.sim_engine.core.props import PlannedTrip
+from app.sim_engine.core.planner.planning_matrix import calculate_start_time, get_planning_data, matrix_workers
+from app.sim_engine.core.props import PlannedTrip, Truck as TruckData
 from app.sim_engine.core.simulations.truck import Truck
 from app.sim_engine.core.simulations.utils.dependency_resolver import DependencyResolver as DR
+from app.sim_engine.core.simulations.utils.profiler import profiled_section
+from app.sim_engine.core.simulations.utils.replanning import REPLANNABLE_STATES, current_assignment
 from app.sim_engine.enums import ObjectType
-from app.sim_engine.states import TruckState
 
 logger = logging.getLogger(__name__)
 
 
 class GreedySolver:
+    """
+    Жадный распределитель рейсов.
+
+    Матрица планирования строится один раз по исходным данным симуляции и дальше не меняется.
+    Исключение и включение объектов - маски поверх неё, а при перепланировании пересчитываются
+    только времена подъезда (T_start) самосвалов, сменивших положение, - лениво, при первом обращении
+    """
 
     def __init__(self, planning_data: InputPlanningData = None):
         env = DR.env()
 
         self.sim_context = env.sim_context
+        self.replanning_stats = env.replanning_stats
         self._raw_sim_data = env.sim_data
-        self._sim_data = deepcopy(env.sim_data)
         self._planning_data = planning_data
 
         self.exclude_objects: dict[ObjectType, list] = {
@@ -30,25 +40,130 @@ class GreedySolver:
             ObjectType.UNLOAD: []
         }
 
-    def _refresh_data(self):
-        self._sim_data = deepcopy(self._raw_sim_data)
-        self._planning_data = None
+        # Положения самосвалов на момент последнего перепланирования (копии, исходные данные не меняются)
+        self._trucks: dict[int, TruckData] = {}
+
+        # Матрица планирования в виде массивов по слотам самосвал/экскаватор/пункт разгрузки (см. _build_arrays)
+        self._truck_slots: dict[int, int] | None = None
+        self._shovel_order: list[int] = []
+        self._unload_order: list[int] = []
+        self._load: np.ndarray | None = None  # [самосвал, экскаватор]
+        self._tons: np.ndarray | None = None  # [самосвал, экскаватор]
+        self._unload_time: np.ndarray | None = None  # [самосвал, пункт разгрузки]
+        self._trip_base: np.ndarray | None = None  # [самосвал, экскаватор, пункт разгрузки]
+        self._start: np.ndarray | None = None  # [самосвал, экскаватор], строки пересчитываются лениво
+        self._stale_start_rows: set[int] = set()
+        self._pair_mask: np.ndarray | None = None  # [экскаватор, пункт разгрузки]
+
+        self.start_time: datetime | None = None
+        self.end_time: datetime | None = None
 
     @property
     def sim_data(self):
-        return self._sim_data
+        return self._raw_sim_data
 
     @property
     def planning_data(self) -> InputPlanningData:
         if not self._planning_data:
-            self._planning_data = get_planning_data(self.sim_data)
+            self._planning_data = get_planning_data(self._raw_sim_data, workers=matrix_workers(DR.sim_conf()))
         return self._planning_data
 
+    @property
+    def truck_ids(self) -> list[int]:
+        """Самосвалы, участвующие в распределении"""
+        excluded = self.exclude_objects[ObjectType.TRUCK]
+        return [truck_id for truck_id in self._raw_sim_data.trucks if truck_id not in excluded]
+
+    @property
+    def shovel_ids(self) -> list[int]:
+        """Экскаваторы, доступные для распределения"""
+        excluded = self.exclude_objects[ObjectType.SHOVEL]
+        return [shovel_id for shovel_id in self._raw_sim_data.shovels if shovel_id not in excluded]
+
+    @property
+    def unload_ids(self) -> list[int]:
+        """Пункты разгрузки, доступные для распределения"""
+        excluded = self.exclude_objects[ObjectType.UNLOAD]
+        return [unload_id for unload_id in self._raw_sim_data.unloads if unload_id not in excluded]
+
+    def _build_arrays(self) -> None:
+        """
+        Переводит матрицу планирования в массивы NumPy. Постоянная часть цикла
+        (погрузка + движение гружёным + разгрузка + возврат) складывается один раз
+        """
+        planning_data = self.planning_data
+        truck_ids = list(self._raw_sim_data.trucks)
+        shovel_ids = list(self._raw_sim_data.shovels)
+        unload_ids = list(self._raw_sim_data.unloads)
+
+        shape = (len(truck_ids), len(shovel_ids))
+        load = np.zeros(shape)
+        tons = np.zeros(shape)
+        start = np.zeros(shape)
+        unload_time = np.zeros((len(truck_ids), len(unload_ids)))
+        trip_base = np.zeros((len(truck_ids), len(shovel_ids), len(unload_ids)))
+
+        for i, truck_id in enumerate(truck_ids):
+            for z, unload_id in enumerate(unload_ids):
+                unload_time[i, z] = planning_data.T_unload[truck_id, unload_id]
+            for j, shovel_id in enumerate(shovel_ids):
+                load[i, j] = planning_data.T_load[truck_id, shovel_id]
+                tons[i, j] = planning_data.m_tons[truck_id, shovel_id]
+                start[i, j] = planning_data.T_start[truck_id, shovel_id]
+                for z, unload_id in enumerate(unload_ids):
+                    trip_base[i, j, z] = (
+                            load[i, j] +
+                            planning_data.T_haul[truck_id, shovel_id, unload_id] +
+                            unload_time[i, z] +
+                            planning_data.T_return[truck_id, unload_id, shovel_id]
+                    )
+
+        self._shovel_order, self._unload_order = shovel_ids, unload_ids
+        self._load, self._tons, self._start = load, tons, start
+        self._unload_time, self._trip_base = unload_time, trip_base
+        self._stale_start_rows = {i for i, truck_id in enumerate(truck_ids) if truck_id in self._trucks}
+        self._truck_slots = {truck_id: i for i, truck_id in enumerate(truck_ids)}
+        self._update_masks()
+
+    def _update_masks(self) -> None:
+        if self._truck_slots is None:
+            return
+        shovel_mask = np.array([shovel_id not in self.exclude_objects[ObjectType.SHOVEL]
+                                for shovel_id in self._shovel_order], dtype=bool)
+        unload_mask = np.array([unload_id not in self.exclude_objects[ObjectType.UNLOAD]
+                                for unload_id in self._unload_order], dtype=bool)
+        self._pair_mask = shovel_mask[:, None] & unload_mask[None, :]
+
+    def _truck_slot(self, truck_id: int) -> int:
+        if self._truck_slots is None:
+            self._build_arrays()
+        return self._truck_slots[truck_id]
+
+    def _start_row(self, truck_id: int) -> np.ndarray:
+        """
+        Времена подъезда самосвала ко всем экскаваторам (мин) от его положения на момент последнего
+        перепланирования. До первого перепланирования - из матрицы планирования
+        """
+        i = self._truck_slot(truck_id)
+        if i in self._stale_start_rows:
+            truck = self._trucks[truck_id]
+            self._start[i] = [
+                calculate_start_time(self._raw_sim_data, truck, shovel_id) for shovel_id in self._shovel_order
+            ]
+            self._stale_start_rows.discard(i)
+        return self._start[i]
+
+    def start_time_to_shovel(self, truck_id: int, shovel_id: int) -> int:
+        """Время подъезда самосвала к экскаватору (мин), см. _start_row"""
+        return int(self._start_row(truck_id)[self._shovel_order.index(shovel_id)])
+
     def _included_object(self, object_type: ObjectType, object_id: int):
         self.exclude_objects[object_type].remove(object_id)
+        self._update_masks()
 
     def _excluded_object(self, object_type: ObjectType, object_id: int):
         self.exclude_objects[object_type].append(object_id)
+        self._update_masks()
 
     def _included_objects(self, objects: list[tuple[int, ObjectType]]):
         for obj in objects:
@@ -59,29 +174,76 @@ class GreedySolver:
             self._excluded_object(object_type=obj[1], object_id=obj[0])
 
     def _update_trucks_position(self, truck_id, sim_truck):
-        truck = self.sim_data.trucks[truck_id]
-        truck.initial_lat = sim_truck.position.lat
-        truck.initial_lon = sim_truck.position.lon
-        truck.initial_edge_id = sim_truck.edge.index if sim_truck.edge else None
+        """Запоминает положение самосвала; времена подъезда сбрасываются, только если оно изменилось"""
+        position = (
+            sim_truck.position.lat,
+            sim_truck.position.lon,
+            sim_truck.edge.index if sim_truck.edge else None,
+        )
+        truck = self._trucks.get(truck_id)
+        if truck is not None and (truck.initial_lat, truck.initial_lon, truck.initial_edge_id) == position:
+            return
 
-    def _update_sim_data(self):
-        for truck_id in self.exclude_objects[ObjectType.TRUCK]:
-            self.sim_data.trucks.pop(truck_id, None)
+        if truck is None:
+            truck = copy(self._raw_sim_data.trucks[truck_id])
+            self._trucks[truck_id] = truck
+        truck.initial_lat, truck.initial_lon, truck.initial_edge_id = position
 
-        for shovel_id in self.exclude_objects[ObjectType.SHOVEL]:
-            self.sim_data.shovels.pop(shovel_id, None)
+        if self._truck_slots is not None:
+            self._stale_start_rows.add(self._truck_slots[truck_id])
 
-        for unload_id in self.exclude_objects[ObjectType.UNLOAD]:
-            self.sim_data.unloads.pop(unload_id, None)
+    def _set_horizon(self, start_time: datetime | None, end_time: datetime | None):
+        # Горизонт не влияет на матрицу жадного распределителя, запоминаем для согласованности с MILP/CP
+        if start_time:
+            self.start_time = start_time
+        if end_time:
+            self.end_time = end_time
+
+    def _keeps_assignment(self, sim_truck) -> bool:
+        """
+        Сохранит ли самосвал текущую связку, если выбрать рейс заново по обновлённым данным.
+        Ожидающий самосвал учитывается в очереди своего экскаватора, что только занижает оценку текущей связки:
+        совпадение выбора остаётся верным, а при расхождении самосвал просто прерывается, как раньше
+        """
+        assignment = current_assignment(sim_truck)
+        if assignment is None:
+            return False
+
+        shovel_id, unload_id = assignment
+        if shovel_id in self.exclude_objects[ObjectType.SHOVEL] or unload_id in self.exclude_objects[ObjectType.UNLOAD]:
+            return False
+
+        try:
+            choice = self.choose_next_trip(sim_truck, sim_truck.env.now)
+        except KeyError:
+            return False
+
+        return choice is not None and (choice[0].id, choice[1].id) == assignment
 
-    @staticmethod
-    def _reset_cycle(sim_truck):
-        if sim_truck.state in [
-            TruckState.MOVING_EMPTY,
-            TruckState.WAITING,
-        ]:
-            sim_truck.process.interrupt()
+    def _reset_cycle(self, sim_truck):
+        """Прерывает самосвал для выбора нового рейса, только если его связка меняется"""
+        if sim_truck.state not in REPLANNABLE_STATES:
+            return
 
+        if self._keeps_assignment(sim_truck):
+            self.replanning_stats.interrupts_avoided += 1
+            return
+
+        self.replanning_stats.interrupts += 1
+        sim_truck.process.interrupt()
+
+    def _reset_cycles(self):
+        self.replanning_stats.replans += 1
+
+        trucks = [self.sim_context.trucks.get(truck_id) for truck_id in self.truck_ids]
+        # Сначала обновляем положение всех самосвалов - от него зависят времена подъезда в данных планирования
+        for truck in trucks:
+            logger.debug(f"rebuild truck: {truck.name} id: {truck.id}")
+            self._update_trucks_position(truck.id, truck)
+        for truck in trucks:
+            self._reset_cycle(truck)
+
+    @profiled_section("planner_rebuild")
     def rebuild_planning_data(
             self,
             start_time=None,
@@ -89,12 +251,7 @@ class GreedySolver:
             excluded_object: tuple[int, ObjectType] = None,
             included_object: tuple[int, ObjectType] = None
     ):
-        self._refresh_data()
-
-        if start_time:
-            self.sim_data.start_time = start_time
-        if end_time:
-            self.sim_data.end_time = end_time
+        self._set_horizon(start_time, end_time)
 
         if excluded_object:
             self._excluded_object(object_type=excluded_object[1], object_id=excluded_object[0])
@@ -102,14 +259,9 @@ class GreedySolver:
         elif included_object:
             self._included_object(object_type=included_object[1], object_id=included_object[0])
 
-        self._update_sim_data()
-
-        for truck_id in self.sim_data.trucks.keys():
-            truck = self.sim_context.trucks.get(truck_id)
-            logger.debug(f"rebuild truck: {truck.name} id: {truck.id}")
-            self._update_trucks_position(truck_id, truck)
-            self._reset_cycle(truck)
+        self._reset_cycles()
 
+    @profiled_section("planner_rebuild")
     def rebuild_planning_data_cascade(
             self,
             start_time: datetime | None = None,
@@ -117,75 +269,60 @@ class GreedySolver:
             excluded_objects: List[tuple[int, ObjectType]] | None = None,
             included_objects: List[tuple[int, ObjectType]] | None = None
     ):
-        self._refresh_data()
-
-        if start_time:
-            self.sim_data.start_time = start_time
-        if end_time:
-            self.sim_data.end_time = end_time
+        self._set_horizon(start_time, end_time)
 
         if excluded_objects:
             self._excluded_objects(excluded_objects)
         elif included_objects:
             self._included_objects(included_objects)
 
-        self._update_sim_data()
-
-        for truck_id in self.sim_data.trucks.keys():
-            truck = self.sim_context.trucks.get(truck_id)
-            logger.debug(f"rebuild truck: {truck.name}")
-            self._update_trucks_position(truck_id, truck)
-            self._reset_cycle(truck)
-
-    @staticmethod
-    def find_trucks_to_shovel(shovel):
-        trucks = []
-        for truck in shovel.quarry.truck_map.values():
-            if truck.shovel and truck.shovel.id == shovel.id and truck.state == TruckState.MOVING_EMPTY:
-                trucks.append(truck)
-        return trucks
+        self._reset_cycles()
 
     def choose_next_trip(self, truck, now: int):
-        """Выбирает лучшую связку (shovel, unload) для данного самосвала"""
-        best_score, best_choice = -1, None
-
-        choices = []
-
-        for shovel_id in self.sim_data.shovels.keys():
-            shovel = self.sim_context.shovels[shovel_id]
-
-            moving_trucks = self.find_trucks_to_shovel(shovel)
-            trucks_count = len(shovel.trucks_queue) + len(moving_trucks)
-            wait_shovel = trucks_count * self.planning_data.T_load[(truck.id, shovel.id)]
-
-            for unload_id in self.sim_data.unloads.keys():
-                unld = self.sim_context.unloads[unload_id]
+        """
+        Выбирает лучшую связку (shovel, unload) для данного самосвала.
+
+        Оценка связки - тоннаж / время цикла, где время цикла - подъезд, ожидание за самосвалами в очереди
+        и в пути к экскаватору, погрузка, движение гружёным, ожидание и разгрузка, возврат.
+        Считается одной операцией над массивом экскаватор x пункт разгрузки
+        """
+        i = self._truck_slot(truck.id)
+        if not self._pair_mask.any():
+            return None
 
-                wait_unl = len(unld.trucks_queue) * self.planning_data.T_unload[(truck.id, unld.id)]
+        inbound_trucks = truck.quarry.inbound_trucks
+        shovels = self.sim_context.shovels
+        unloads = self.sim_context.unloads
+        trucks_count = np.array([
+            len(shovels[shovel_id].trucks_queue) + inbound_trucks[shovel_id] for shovel_id in self._shovel_order
+        ])
+        unload_queue = np.array([len(unloads[unload_id].trucks_queue) for unload_id in self._unload_order])
+
+        cycle_time = (
+                (self._start_row(truck.id) + trucks_count * self._load[i])[:, None] +
+                self._trip_base[i] +
+                (unload_queue * self._unload_time[i])[None, :]
+        )
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = np.where(self._pair_mask, self._tons[i][:, None] / cycle_time, -np.inf)
 
-                cycle_time = (
-                        self.planning_data.T_start[(truck.id, shovel.id)] +
-                        wait_shovel +
-                        self.planning_data.T_load[(truck.id, shovel.id)] +
-                        self.planning_data.T_haul[(truck.id, shovel.id, unld.id)] +
-                        wait_unl +
-                        self.planning_data.T_unload[(truck.id, unld.id)] +
-                        self.planning_data.T_return[(truck.id, unld.id, shovel.id)]
-                )
-                tons = self.planning_data.m_tons[(truck.id, shovel.id)]
-                score = tons / cycle_time
+        # argmax возвращает первый максимум - как и перебор по порядку экскаваторов и пунктов разгрузки
+        j, z = np.unravel_index(np.argmax(scores), scores.shape)
+        if not np.isfinite(scores[j, z]):
+            return None
 
-                choices.append((shovel.name, unld.name, cycle_time, score))
-                if score > best_score:
-                    best_score = score
-                    best_choice = (shovel, unld, cycle_time, score)
+        best_choice = (shovels[self._shovel_order[j]], unloads[self._unload_order[z]], int(cycle_time[j, z]),
+                       float(scores[j, z]))
 
         logger.debug(f"Choose trip for Track:{truck.name}; time: {truck.current_time}")
-        logger.debug(f"Choices:{choices}")
+        logger.debug(f"Choice:{best_choice[0].name}, {best_choice[1].name}, {best_choice[2]}, {best_choice[3]}")
         return best_choice
 
     def assign_trip(self, truck: Truck, now: int) -> PlannedTrip | None:
         """Формирует новый PlannedTrip и обновляет маршруты для самосвала"""
+        if truck.id in self.exclude_objects[ObjectType.TRUCK]:
+            # Исключённый самосвал не распределяется, пока его не вернут в планирование
+            return None
 
         try:
             choice = self.choose_next_trip(truck, now)
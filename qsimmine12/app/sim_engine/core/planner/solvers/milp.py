@@ -1,36 +1,41 @@
 import logging
-from math import floor
 from typing import Dict, List, Tuple
 
 from pulp import (
-    LpProblem, LpMaximize, LpVariable, LpBinary, LpInteger, lpSum, LpStatus, value, PULP_CBC_CMD, HiGHS_CMD, )
+    LpProblem, LpMaximize, LpVariable, LpBinary, LpInteger, lpSum, LpStatus, value, PULP_CBC_CMD, HiGHS_CMD,
+    LpStatusOptimal, LpSolutionOptimal, )
 
 from app.sim_engine.core.planner.entities import InputPlanningData
+from app.sim_engine.core.planner.trip_bounds import shortest_cycle_bound
+from app.sim_engine.core.planner.warm_start import PreviousPlan
 from app.sim_engine.core.simulations.utils.dependency_resolver import DependencyResolver as DR
 from app.sim_engine.enums import SolverType
 
 logger = logging.getLogger(__name__)
 
 
+def solution_status(model: LpProblem) -> str:
+    """
+    Статус решения модели PuLP. По истечении time_limit CBC/HiGHS возвращают статус Optimal и для недоказанного
+    рекорда: оптимальность подтверждает только статус решения, иначе - Feasible
+    """
+    if model.status == LpStatusOptimal and model.sol_status != LpSolutionOptimal:
+        return "Feasible"
+    return LpStatus[model.status]
+
+
 class MILPSolver:
     solver_type: SolverType
     msg_out: bool
     time_limit: int
     workers: int
+    # Тёплого старта нет: жадное расписание недопустимо для модели, см. Planner.WARM_START_SOLVERS
+    warm_start: bool = False
 
     @staticmethod
     def compute_Kmax_i(inst: InputPlanningData, i: int) -> int:
-        """Грубая верхняя граница числа рейсов для самосвала i"""
-        js = {j for (ti, j) in inst.T_start.keys() if ti == i}
-        zs = {z for (ti, z) in inst.T_end.keys() if ti == i}
-        min_start = min(inst.T_start[i, j] for j in js)
-        min_end = min(inst.T_end[i, z] for z in zs)
-        min_d = min(
-            inst.T_haul[i, j, z] + inst.T_return[i, z, j] + inst.T_load[i, j] + inst.T_unload[i, z]
-            for j in js for z in zs
-        )
-        available = inst.D_work - min_start - min_end
-        return max(0, floor(available / max(1, min_d)))
+        """Грубая верхняя граница числа рейсов для самосвала i (уточнённые границы - см. trip_bounds)"""
+        return shortest_cycle_bound(inst, i)
 
     @classmethod
     def default_Kmax(cls, inst: InputPlanningData) -> Dict[int, int]:
@@ -105,6 +110,10 @@ class MILPSolver:
             for k in range(1, Kmax[i]):
                 model += y[i, k + 1] <= y[i, k]
 
+        # Общая граница рейсов карьера по вместимости экскаваторов и пунктов разгрузки
+        if inst.trip_cap is not None:
+            model += lpSum(y.values()) <= inst.trip_cap
+
         # (A3) Для первого рейса прибытие в начале смены и запрет начинать раньше
         for i in I:
             if Kmax[i] == 0:
@@ -200,8 +209,8 @@ class MILPSolver:
         return model, vars_pack
 
     @classmethod
-    def run(cls, inst: InputPlanningData):
-        """Решить модель и получить расписание
+    def run(cls, inst: InputPlanningData, previous_plan: PreviousPlan | None = None):
+        """Решить модель и получить расписание (previous_plan не используется)
         """
 
         if cls.msg_out:
@@ -239,14 +248,16 @@ class MILPSolver:
         if cls.msg_out:
             logger.info("End solve")
 
+        status_str = solution_status(model)
+
         result = {
-            "status": LpStatus[model.status],
+            "status": status_str,
             "objective": value(model.objective),
             "trips": [],
         }
 
         # Если решения нет (Infeasible и т.п.), вернём «пусто»
-        if LpStatus[model.status] not in ("Optimal", "Optimal_Infeasible", "Not Solved", "Feasible"):
+        if status_str not in ("Optimal", "Optimal_Infeasible", "Not Solved", "Feasible"):
             return result
 
         # Извлекаем расписание, находим активные рейсы (y=1) и их (j,z)
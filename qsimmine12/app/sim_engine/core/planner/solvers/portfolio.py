@@ -0,0 +1,205 @@
+"""
+Портфель солверов: CP-SAT, MILP (HiGHS, без него - CBC) и жадное расписание наперегонки.
+
+Ни один солвер не лучше остальных на всех карьерах: CP-SAT выигрывает на одних матрицах планирования,
+HiGHS - на других, а жадное расписание (см. warm_start) строится мгновенно. Участники портфеля решают
+одну и ту же матрицу в отдельных процессах с общим бюджетом time_limit. Жадное расписание - начальный
+рекорд, каждый завершившийся солвер заменяет рекорд, если перевозит больше. Доказанный оптимум (статус
+Optimal; недоказанный рекорд MILP по истечении time_limit - Feasible, см. MILPSolver.run) останавливает гонку
+досрочно, по истечении бюджета (с запасом grace на запуск процессов и выгрузку решения) незавершившиеся
+процессы снимаются. Процессы участников запускаются через spawn: fork в многопоточном веб-воркере небезопасен.
+
+Победитель и итоги участников - в result["winner"] и result["portfolio"]. В демон-процессе
+(например, в пуле прогонов достоверного результата) дочерние процессы запрещены - участники решают
+по очереди, деля time_limit поровну.
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from dataclasses import dataclass, field
+from multiprocessing.connection import wait
+
+from app.sim_engine.core.planner.entities import InputPlanningData
+from app.sim_engine.core.planner.solvers.cp import CPSolver
+from app.sim_engine.core.planner.warm_start import PreviousPlan, build_warm_start
+from app.sim_engine.enums import SolverType
+
+logger = logging.getLogger(__name__)
+
+STATUS_CANCELLED = "Cancelled"
+STATUS_FAILED = "Failed"
+
+
+@dataclass
+class PortfolioMember:
+    """Участник портфеля: класс солвера и его настройки (атрибуты класса, см. Planner._solver_settings)"""
+    solver_type: SolverType
+    solver: type
+    settings: dict = field(default_factory=dict)
+
+    def run(self, inst: InputPlanningData, previous_plan: PreviousPlan | None = None) -> dict:
+        for key, value in self.settings.items():
+            setattr(self.solver, key, value)
+        return self.solver.run(inst, previous_plan=previous_plan)
+
+
+def _run_member(conn, member: PortfolioMember, inst: InputPlanningData, previous_plan: PreviousPlan | None) -> None:
+    """Точка входа процесса участника: результат или ошибка отправляются в conn"""
+    if hasattr(os, "setpgrp"):
+        # своя группа процессов - при снятии участника завершаются и запущенные им CBC/HiGHS
+        os.setpgrp()
+    started = time.perf_counter()
+    try:
+        result = member.run(inst, previous_plan)
+    except Exception as e:
+        result = {"status": STATUS_FAILED, "objective": None, "trips": [], "error": repr(e)}
+    conn.send((result, time.perf_counter() - started))
+    conn.close()
+
+
+def _cancel(process) -> None:
+    """Снимает участника вместе с его группой процессов"""
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except (AttributeError, ProcessLookupError, PermissionError):
+        # группа ещё не создана или её нет на платформе
+        process.terminate()
+
+
+def greedy_plan(inst: InputPlanningData, previous_plan: PreviousPlan | None = None) -> dict:
+    """Жадное расписание в формате результата солверов"""
+    Kmax = inst.Kmax_by_truck or {i: CPSolver.compute_Kmax_i(inst, i) for i in inst.truck_ids}
+    trips = build_warm_start(inst, Kmax, previous_plan)
+    return {
+        "status": "Feasible",
+        "objective": float(sum(inst.m_tons[trip.truck_id, trip.shovel_id] for trip in trips)),
+        "trips": [
+            {
+                "truck_id": trip.truck_id,
+                "order": trip.order,
+                "shovel_id": trip.shovel_id,
+                "unload_id": trip.unload_id,
+                "start_load": trip.start_load,
+                "start_unload": trip.start_unload,
+                "volume, t": inst.m_tons[trip.truck_id, trip.shovel_id],
+            }
+            for trip in trips
+        ],
+    }
+
+
+class PortfolioSolver:
+    msg_out: bool
+    time_limit: int
+    workers: int
+    warm_start: bool = True
+    # Участники гонки, задаются Planner
+    members: list[PortfolioMember] = []
+    # Запас сверх time_limit на запуск процессов, построение модели и выгрузку решения, с
+    grace: float = 5.0
+
+    @staticmethod
+    def _report(result: dict, sec: float) -> dict:
+        return {"status": result["status"], "objective": result["objective"], "sec": round(sec, 3)}
+
+    @staticmethod
+    def _is_better(result: dict, best: dict) -> bool:
+        return bool(result["trips"]) and (result["objective"] or 0) > (best["objective"] or 0)
+
+    @classmethod
+    def _race(cls, inst: InputPlanningData, previous_plan: PreviousPlan | None) -> dict[SolverType, tuple[dict, float]]:
+        """Участники в отдельных процессах; незавершившиеся к сроку или после доказанного оптимума снимаются"""
+        ctx = multiprocessing.get_context("spawn")
+        deadline = time.monotonic() + cls.time_limit + cls.grace
+
+        processes = {}
+        connections = {}
+        for member in cls.members:
+            parent_conn, child_conn = ctx.Pipe(duplex=False)
+            process = ctx.Process(
+                target=_run_member,
+                args=(child_conn, member, inst, previous_plan),
+                name=f"portfolio-{member.solver_type.key()}",
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            processes[member.solver_type] = process
+            connections[parent_conn] = member.solver_type
+
+        finished = {}
+        try:
+            while connections:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                for conn in wait(list(connections), timeout=timeout):
+                    solver_type = connections.pop(conn)
+                    try:
+                        finished[solver_type] = conn.recv()
+                    except EOFError:
+                        # процесс упал, не отправив результат
+                        finished[solver_type] = ({"status": STATUS_FAILED, "objective": None, "trips": []}, 0.0)
+                    conn.close()
+                if any(result["status"] == "Optimal" for result, _ in finished.values()):
+                    break
+        finally:
+            for conn in connections:
+                conn.close()
+            for process in processes.values():
+                if process.is_alive():
+                    _cancel(process)
+                process.join()
+
+        return finished
+
+    @classmethod
+    def _sequential(
+            cls, inst: InputPlanningData, previous_plan: PreviousPlan | None
+    ) -> dict[SolverType, tuple[dict, float]]:
+        """Участники по очереди в текущем процессе с равной долей time_limit"""
+        share = max(1, cls.time_limit // max(1, len(cls.members)))
+        finished = {}
+        for member in cls.members:
+            member.settings["time_limit"] = share
+            started = time.perf_counter()
+            try:
+                result = member.run(inst, previous_plan)
+            except Exception as e:
+                result = {"status": STATUS_FAILED, "objective": None, "trips": [], "error": repr(e)}
+            finished[member.solver_type] = (result, time.perf_counter() - started)
+            if result["status"] == "Optimal":
+                break
+        return finished
+
+    @classmethod
+    def run(cls, inst: InputPlanningData, previous_plan: PreviousPlan | None = None) -> dict:
+        """Лучшее расписание участников портфеля в пределах time_limit"""
+        started = time.perf_counter()
+        best = greedy_plan(inst, previous_plan)
+        winner = SolverType.GREEDY
+        portfolio = {SolverType.GREEDY.key(): cls._report(best, time.perf_counter() - started)}
+
+        if multiprocessing.current_process().daemon:
+            finished = cls._sequential(inst, previous_plan)
+        else:
+            finished = cls._race(inst, previous_plan)
+
+        for member in cls.members:
+            if member.solver_type not in finished:
+                portfolio[member.solver_type.key()] = {"status": STATUS_CANCELLED, "objective": None, "sec": None}
+                continue
+            result, sec = finished[member.solver_type]
+            portfolio[member.solver_type.key()] = cls._report(result, sec)
+            if cls._is_better(result, best):
+                best, winner = result, member.solver_type
+
+        logger.info('Solver portfolio', {
+            'winner': winner.key(),
+            'objective': best["objective"],
+            'sec': round(time.perf_counter() - started, 3),
+            'members': portfolio,
+        })
+        return {**best, "winner": winner.key(), "portfolio": portfolio}
@@ -0,0 +1,132 @@
+import logging
+from collections import defaultdict
+from math import ceil
+
+from pulp import LpProblem, LpMaximize, LpVariable, LpBinary, lpSum, value, PULP_CBC_CMD, HiGHS_CMD
+
+from app.sim_engine.core.planner.entities import InputPlanningData
+from app.sim_engine.core.planner.solvers.milp import solution_status
+from app.sim_engine.core.planner.warm_start import PreviousPlan
+
+logger = logging.getLogger(__name__)
+
+
+class TimeIndexedSolver:
+    """
+    Временная (time-indexed) MILP постановка без попарных переменных порядка рейсов.
+
+    Смена делится на интервалы по time_bucket минут. Бинарная n[i,j,z,t] - самосвал i начинает погрузку
+    на экскаваторе j в начале интервала t и везёт на пункт разгрузки z, разгрузка начинается на границе интервала.
+    Ограничения - вместимость по интервалам:
+    - самосвал в каждом интервале занят не более чем одним циклом (погрузка, гружёный ход, разгрузка
+      и возврат к экскаватору);
+    - экскаватор в каждом интервале грузит не более одного самосвала, пункт разгрузки - разгружает не более одного;
+    - первая погрузка не раньше подъезда T_start, разгрузка и заезд на пересменку T_end - до конца смены.
+    Число переменных и ограничений растёт линейно по самосвалам и интервалам (I*J*Z*T и (I+J+Z)*T)
+    вместо O(P^2*J) у MILPSolver. План консервативен: длительности округляются вверх до интервала,
+    а возврат после разгрузки оценивается сверху - временем до самого дальнего экскаватора
+    """
+    msg_out: bool
+    time_limit: int
+    workers: int
+    warm_start: bool = False
+    time_bucket: int = 2
+
+    @staticmethod
+    def buckets(minutes: int, bucket: int) -> int:
+        return max(1, ceil(minutes / bucket))
+
+    @classmethod
+    def build_model(cls, inst: InputPlanningData):
+        I = inst.truck_ids
+        J = inst.shovel_ids
+        Z = inst.unload_ids
+        bucket = cls.time_bucket
+        T = inst.D_work // bucket
+
+        model = LpProblem("MaxVolumeTimeIndexed", LpMaximize)
+
+        n = {}
+        # Занятость по интервалам: ключ ресурса -> интервал -> переменные
+        truck_busy = defaultdict(lambda: defaultdict(list))
+        shovel_busy = defaultdict(lambda: defaultdict(list))
+        unload_busy = defaultdict(lambda: defaultdict(list))
+
+        for i in I:
+            for j in J:
+                load = cls.buckets(inst.T_load[i, j], bucket)
+                first = ceil(inst.T_start[i, j] / bucket)
+                for z in Z:
+                    # разгрузка начинается на границе интервала после погрузки и гружёного хода
+                    haul = ceil((inst.T_load[i, j] + inst.T_haul[i, j, z]) / bucket)
+                    unload = cls.buckets(inst.T_unload[i, z], bucket)
+                    # возврат - к самому дальнему экскаватору: следующий рейс допустим с любого из них
+                    back = max(inst.T_return[i, z, j_next] for j_next in J)
+                    cycle = haul + unload + ceil(back / bucket)
+                    # последний интервал, в котором рейс успевает разгрузиться и заехать на пересменку
+                    last = (inst.D_work - inst.T_unload[i, z] - inst.T_end[i, z]) // bucket - haul
+
+                    for t in range(first, min(last, T - 1) + 1):
+                        var = LpVariable(f"n_{i}_{j}_{z}_{t}", 0, 1, LpBinary)
+                        n[i, j, z, t] = var
+                        for dt in range(cycle):
+                            truck_busy[i][t + dt].append(var)
+                        for dt in range(load):
+                            shovel_busy[j][t + dt].append(var)
+                        for dt in range(unload):
+                            unload_busy[z][t + haul + dt].append(var)
+
+        for busy in (truck_busy, shovel_busy, unload_busy):
+            for by_bucket in busy.values():
+                for variables in by_bucket.values():
+                    if len(variables) > 1:
+                        model += lpSum(variables) <= 1
+
+        model += lpSum(inst.m_tons[i, j] * var for (i, j, z, t), var in n.items())
+        return model, dict(n=n)
+
+    @classmethod
+    def run(cls, inst: InputPlanningData, previous_plan: PreviousPlan | None = None):
+        """Решить временную постановку и получить расписание в формате MILPSolver (previous_plan не используется)"""
+        if cls.msg_out:
+            logger.info("Start builing time-indexed model")
+
+        model, V = cls.build_model(inst)
+
+        if cls.msg_out:
+            logger.info("End builing time-indexed model")
+
+        cmd = HiGHS_CMD(msg=cls.msg_out, timeLimit=cls.time_limit, threads=cls.workers)
+        if not cmd.available():
+            cmd = PULP_CBC_CMD(msg=cls.msg_out, timeLimit=cls.time_limit, threads=cls.workers)
+
+        model.solve(cmd)
+
+        result = {
+            "status": solution_status(model),
+            "objective": value(model.objective),
+            "trips": [],
+        }
+        if result["status"] not in ("Optimal", "Optimal_Infeasible", "Not Solved", "Feasible"):
+            return result
+
+        trips_by_truck = defaultdict(list)
+        for (i, j, z, t), var in V["n"].items():
+            if var.value() is not None and var.value() > 0.5:
+                trips_by_truck[i].append((t, j, z))
+
+        bucket = cls.time_bucket
+        for i, trips in trips_by_truck.items():
+            for order, (t, j, z) in enumerate(sorted(trips), start=1):
+                result["trips"].append({
+                    "truck_id": i,
+                    "order": order,
+                    "shovel_id": j,
+                    "unload_id": z,
+                    "start_load": t * bucket,
+                    "start_unload": (t + ceil((inst.T_load[i, j] + inst.T_haul[i, j, z]) / bucket)) * bucket,
+                    "volume, t": inst.m_tons[i, j],
+                })
+
+        result["trips"].sort(key=lambda r: (r["truck_id"], r["order"]))
+        return result
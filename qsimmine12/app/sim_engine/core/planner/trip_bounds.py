@@ -0,0 +1,173 @@
+"""
+Границы числа рейсов для моделей CP/MILP.
+
+Размер моделей растёт с числом потенциальных рейсов: у CPSolver - необязательные интервалы на каждый
+рейс, у MILPSolver - переменные y[i,k] и попарный порядок очереди экскаватора (O(P^2*J)).
+Граница по самому короткому циклу самосвала не учитывает, что экскаваторы и пункты разгрузки общие.
+Предварительный проход уточняет её:
+- вместимость экскаватора: погрузки на нём не пересекаются, поэтому их не больше, чем помещается
+  кратчайших погрузок между первым возможным подъездом и последней погрузкой, после которой ещё
+  успевают разгрузиться и заехать на пересменку; то же для пунктов разгрузки. Сумма по экскаваторам -
+  общая граница рейсов карьера, она же ограничивает каждый самосвал. Вместимость пунктов разгрузки
+  учитывается только для моделей, где разгрузки не пересекаются (unload_capacity, у CPSolver): в MILPSolver
+  такого ограничения нет, и граница по пунктам разгрузки отсекала бы допустимые и оптимальные планы;
+- очереди: замкнутая сеть (MVA, см. TrucksNeededCalculator.mean_value_analysis) с равным распределением
+  рейсов по экскаваторам и пунктам разгрузки даёт среднее ожидание в очередях за рейс. Самосвал
+  не сделает больше рейсов, чем помещается его кратчайших циклов с этим ожиданием, с запасом margin.
+
+Вместимость - строгая граница, оценка по очередям - эвристика: при неравномерной загрузке оптимальный план
+может дать отдельному самосвалу больше рейсов, поэтому она включается только явно запасом margin
+(SIM_CONFIG["trip_bound_margin"], по умолчанию None - только строгие границы)
+"""
+from dataclasses import dataclass
+from math import ceil, floor
+
+from app.sim_engine.core.calculations.trucks_needed import TrucksNeededCalculator
+from app.sim_engine.core.planner.entities import InputPlanningData
+
+
+def shortest_cycle_bound(inst: InputPlanningData, i: int) -> int:
+    """Грубая верхняя граница числа рейсов для самосвала i по кратчайшему циклу"""
+    js = {j for (ti, j) in inst.T_start.keys() if ti == i}
+    zs = {z for (ti, z) in inst.T_end.keys() if ti == i}
+    min_start = min(inst.T_start[i, j] for j in js)
+    min_end = min(inst.T_end[i, z] for z in zs)
+    min_d = min(
+        inst.T_haul[i, j, z] + inst.T_return[i, z, j] + inst.T_load[i, j] + inst.T_unload[i, z]
+        for j in js for z in zs
+    )
+    available = inst.D_work - min_start - min_end
+    return max(0, floor(available / max(1, min_d)))
+
+
+@dataclass
+class TripBounds:
+    # Граница по кратчайшему циклу (до уточнения)
+    naive: dict[int, int]
+    # Уточнённая граница по самосвалам - Kmax_by_truck
+    per_truck: dict[int, int]
+    # Общая граница рейсов карьера
+    global_cap: int
+    shovel_caps: dict[int, int]
+    unload_caps: dict[int, int]
+    # Среднее ожидание в очередях за рейс по MVA (мин), None - оценка по очередям не применялась
+    queue_wait: float | None = None
+
+    @staticmethod
+    def model_size(Kmax: dict[int, int], shovels: int, unloads: int) -> dict:
+        """Размер моделей по числу потенциальных рейсов P"""
+        trips = sum(Kmax.values())
+        return {
+            "trips": trips,
+            "cp_intervals": trips * (shovels + unloads),
+            "milp_order_vars": shovels * trips * (trips - 1) // 2,
+        }
+
+    def report(self, inst: InputPlanningData) -> dict:
+        before = self.model_size(self.naive, inst.M, inst.Z)
+        after = self.model_size(self.per_truck, inst.M, inst.Z)
+        return {
+            "global_cap": self.global_cap,
+            "queue_wait": None if self.queue_wait is None else round(self.queue_wait, 2),
+            "before": before,
+            "after": after,
+            "reduction": {
+                key: round(1 - after[key] / before[key], 4) if before[key] else 0.0
+                for key in before
+            },
+        }
+
+
+def _capacity(window: int, duration: int) -> int:
+    return max(0, floor(window / max(1, duration)))
+
+
+def capacity_caps(inst: InputPlanningData) -> tuple[dict[int, int], dict[int, int]]:
+    """Строгие границы числа погрузок на экскаваторах и разгрузок на пунктах разгрузки"""
+    I = inst.truck_ids
+    J = inst.shovel_ids
+    Z = inst.unload_ids
+    D = inst.D_work
+
+    shovel_caps = {}
+    for j in J:
+        first_start = min(inst.T_start[i, j] for i in I)
+        # погрузка заканчивается не позже, чем за кратчайшие ход, разгрузку и заезд на пересменку до конца смены
+        tail = min(inst.T_haul[i, j, z] + inst.T_unload[i, z] + inst.T_end[i, z] for i in I for z in Z)
+        shovel_caps[j] = _capacity(D - tail - first_start, min(inst.T_load[i, j] for i in I))
+
+    unload_caps = {}
+    for z in Z:
+        first_start = min(inst.T_start[i, j] + inst.T_load[i, j] + inst.T_haul[i, j, z] for i in I for j in J)
+        tail = min(inst.T_end[i, z] for i in I)
+        unload_caps[z] = _capacity(D - tail - first_start, min(inst.T_unload[i, z] for i in I))
+
+    return shovel_caps, unload_caps
+
+
+def queue_wait(inst: InputPlanningData) -> float:
+    """Среднее ожидание в очередях экскаваторов и пунктов разгрузки за рейс (MVA, рейсы поровну по объектам)"""
+    I = inst.truck_ids
+    J = inst.shovel_ids
+    Z = inst.unload_ids
+
+    demands = {}
+    for j in J:
+        demands["shovel", j] = sum(inst.T_load[i, j] for i in I) / len(I) / len(J)
+    for z in Z:
+        demands["unload", z] = sum(inst.T_unload[i, z] for i in I) / len(I) / len(Z)
+    think_time = sum(
+        inst.T_haul[i, j, z] + inst.T_return[i, z, j] for i in I for j in J for z in Z
+    ) / (len(I) * len(J) * len(Z))
+
+    network = TrucksNeededCalculator.mean_value_analysis(
+        demands=demands,
+        servers={key: 1 for key in demands},
+        think_time=think_time,
+        population=len(I),
+    )
+    return max(0.0, sum(network["residence"].values()) - sum(demands.values()))
+
+
+def compute_trip_bounds(
+        inst: InputPlanningData,
+        margin: float | None = None,
+        unload_capacity: bool = False,
+) -> TripBounds:
+    """
+    Границы числа рейсов по самосвалам и по карьеру (см. описание модуля).
+    unload_capacity - учитывать вместимость пунктов разгрузки (только для моделей без пересечения разгрузок)
+    """
+    I = inst.truck_ids
+    naive = {i: shortest_cycle_bound(inst, i) for i in I}
+
+    shovel_caps, unload_caps = capacity_caps(inst)
+    global_cap = sum(shovel_caps.values())
+    if unload_capacity:
+        global_cap = min(global_cap, sum(unload_caps.values()))
+    per_truck = {i: min(naive[i], global_cap) for i in I}
+
+    wait = None
+    if margin is not None and len(I) > 1:
+        wait = queue_wait(inst)
+        for i in I:
+            available = (
+                inst.D_work
+                - min(inst.T_start[i, j] for j in inst.shovel_ids)
+                - min(inst.T_end[i, z] for z in inst.unload_ids)
+            )
+            min_cycle = min(
+                inst.T_load[i, j] + inst.T_haul[i, j, z] + inst.T_unload[i, z] + inst.T_return[i, z, j]
+                for j in inst.shovel_ids for z in inst.unload_ids
+            )
+            contended = ceil(margin * max(0, available) / max(1.0, min_cycle + wait))
+            per_truck[i] = min(per_truck[i], contended)
+
+    return TripBounds(
+        naive=naive,
+        per_truck=per_truck,
+        global_cap=global_cap,
+        shovel_caps=shovel_caps,
+        unload_caps=unload_caps,
+        queue_wait=wait,
+    )
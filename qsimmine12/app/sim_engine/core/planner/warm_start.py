@@ -0,0 +1,103 @@
+"""
+Начальное решение для тёплого старта CP солвера и жадного участника портфеля.
+
+Расписание строится списочным планированием по матрице планирования: самосвал, раньше всех освободившийся
+после разгрузки, получает следующий рейс. Связка рейса берётся из предыдущего плана (если он есть
+и его объекты не исключены), иначе выбирается жадно - максимум тонн в минуту цикла с учётом очередей.
+Экскаватор и пункт разгрузки обслуживают по одному самосвалу, смена не превышается, число рейсов
+не больше Kmax - решение допустимо для CP модели и служит подсказкой (hint) солверу
+"""
+import heapq
+from dataclasses import dataclass
+
+from app.sim_engine.core.planner.entities import InputPlanningData
+
+# Предыдущий план: самосвал -> связки (экскаватор, пункт разгрузки) по порядку рейсов
+PreviousPlan = dict[int, list[tuple[int, int]]]
+
+
+@dataclass
+class WarmStartTrip:
+    truck_id: int
+    order: int
+    shovel_id: int
+    unload_id: int
+    arrival: int  # прибытие к экскаватору
+    start_load: int
+    start_unload: int
+
+
+def previous_plan_from_trips(planned_trips: dict | None) -> PreviousPlan:
+    """Предыдущий план из плановых рейсов самосвалов (PlannedTrip)"""
+    if not planned_trips:
+        return {}
+    return {
+        truck_id: [(trip.shovel_id, trip.unload_id) for trip in sorted(trips, key=lambda trip: trip.order)]
+        for truck_id, trips in planned_trips.items()
+    }
+
+
+def build_warm_start(
+        inst: InputPlanningData,
+        Kmax: dict[int, int],
+        previous: PreviousPlan | None = None,
+) -> list[WarmStartTrip]:
+    I = inst.truck_ids
+    J = inst.shovel_ids
+    Z = inst.unload_ids
+    previous = previous or {}
+
+    shovel_free = {j: 0 for j in J}
+    shovel_arrival = {j: -1 for j in J}
+    unload_free = {z: 0 for z in Z}
+
+    trips: list[WarmStartTrip] = []
+    # (освобождение после разгрузки, самосвал, номер следующего рейса, последний пункт разгрузки)
+    heap = [(0, i, 1, None) for i in I if Kmax.get(i, 0) > 0]
+    heapq.heapify(heap)
+
+    def schedule(i: int, k: int, last_unload: int | None, released: int, j: int, z: int) -> WarmStartTrip | None:
+        if last_unload is None:
+            arrival = inst.T_start[i, j]
+        else:
+            # Очередь экскаватора в порядке прибытия (как в MILP модели): прибытие не раньше предыдущего
+            arrival = max(released + inst.T_return[i, last_unload, j], shovel_arrival[j] + 1)
+        start_load = max(arrival, shovel_free[j])
+        start_unload = max(start_load + inst.T_load[i, j] + inst.T_haul[i, j, z], unload_free[z])
+        if start_unload + inst.T_unload[i, z] + inst.T_end[i, z] > inst.D_work:
+            return None
+        return WarmStartTrip(i, k, j, z, arrival, start_load, start_unload)
+
+    while heap:
+        released, i, k, last_unload = heapq.heappop(heap)
+
+        trip = None
+        planned = previous.get(i, [])
+        if k <= len(planned) and planned[k - 1][0] in shovel_free and planned[k - 1][1] in unload_free:
+            trip = schedule(i, k, last_unload, released, *planned[k - 1])
+
+        if trip is None:
+            best_score = 0.0
+            for j in J:
+                for z in Z:
+                    candidate = schedule(i, k, last_unload, released, j, z)
+                    if candidate is None:
+                        continue
+                    finish = candidate.start_unload + inst.T_unload[i, z]
+                    score = inst.m_tons[i, j] / max(1, finish - released)
+                    if score > best_score:
+                        best_score, trip = score, candidate
+
+        if trip is None:
+            continue
+
+        trips.append(trip)
+        shovel_free[trip.shovel_id] = trip.start_load + inst.T_load[i, trip.shovel_id]
+        shovel_arrival[trip.shovel_id] = max(shovel_arrival[trip.shovel_id], trip.arrival)
+        finish = trip.start_unload + inst.T_unload[i, trip.unload_id]
+        unload_free[trip.unload_id] = finish
+        if k < Kmax[i]:
+            heapq.heappush(heap, (finish, i, k + 1, trip.unload_id))
+
+    trips.sort(key=lambda trip: (trip.truck_id, trip.order))
+    return trips
@@ -203,11 +203,16 @@ class SimData:
     road_net: dict
 
     lunch_times: list[tuple[datetime, datetime]] = field(default_factory=list)
+    # Начала смен внутри интервала симуляции (границы для режима длинного горизонта)
+    shift_starts: list[datetime] = field(default_factory=list)
     planned_idles: dict[tuple[str, int], PlannedIdle] = field(default_factory=dict)
     blasting_list: list[Blasting] = field(default_factory=list)
 
     target_shovel_load: float = 0.9
 
+    # Антитетический прогон: все потоки случайных чисел выдают 1 - U (см. AntitheticRandom)
+    antithetic: bool = False
+
 
 @dataclass
 class TripData:
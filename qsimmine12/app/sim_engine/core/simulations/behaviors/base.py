@@ -8,6 +8,17 @@ from app.sim_engine.events import EventType
 from app.sim_engine.states import TruckState, ExcState
 
 
+def get_parked_duration(env, target) -> int:
+    """
+    Сколько секунд актор гарантированно стоит без изменения состояния (режим fast_forward).
+    0 - актор не на стоянке, время пропускать нельзя
+    """
+    parked_until = getattr(target, "parked_until", None)
+    if parked_until is None:
+        return 0
+    return max(0, int(parked_until - env.now))
+
+
 class BaseBehavior(ABC):
     """
     Абстрактный базовый класс для всех поведений в симуляции.
@@ -46,7 +57,10 @@ class BaseTickBehavior:
                 self.target.main_tic_process()
             if hasattr(self.target, "telemetry_process"):
                 self.target.telemetry_process()
-            yield self.env.timeout(self.target.tick)
+
+            # Актор стоит до известного момента - пишем ключевой кадр и пропускаем время стоянки
+            parked_duration = get_parked_duration(self.env, self.target)
+            yield self.env.timeout(max(self.target.tick, parked_duration))
 
 
 class BreakdownBehavior(BaseBehavior):
@@ -55,7 +69,9 @@ class BreakdownBehavior(BaseBehavior):
     """
 
     def __init__(self, target, props):
-        self.calc = BreakdownCalc(target.quarry.seeded_random)
+        self.calc = BreakdownCalc(
+            target.quarry.get_random_stream(type(target).__name__.lower(), target.id, "breakdown")
+        )
         super().__init__(target, props)
 
     def run(self):
@@ -71,10 +87,17 @@ class BreakdownBehavior(BaseBehavior):
             time_to_failure = self.calc.calculate_failure_time(**input_data)
             time_to_failure = int(time_to_failure)
 
-            while time_to_failure != 0:
+            while time_to_failure > 0:
+                # На стоянке наработка не идёт, пропускаем время стоянки целиком
+                parked_duration = get_parked_duration(self.env, self.target)
+                if parked_duration:
+                    yield self.env.timeout(parked_duration)
+                    continue
+
+                step_sec = min(self.target.tick, time_to_failure)
                 if self.target.state.is_work:
-                    time_to_failure -= 1
-                yield self.env.timeout(1)
+                    time_to_failure -= step_sec
+                yield self.env.timeout(step_sec)
 
             self.target.broken = True
             self.target.push_event(event_type=EventType.BREAKDOWN_BEGIN)
@@ -100,23 +123,39 @@ class FuelBehavior(BaseBehavior):
     def run(self):
 
         while True:
+            # На стоянке расход только на холостом ходу, начисляем его за всё время стоянки разом
+            parked_duration = get_parked_duration(self.env, self.target)
+            if parked_duration:
+                self.target.fuel = self.calc.calculate_fuel_level_while_idle(
+                    fuel_lvl=self.target.fuel,
+                    fuel_idle_lph=self.target.properties.fuel_idle_lph,
+                    duration=parked_duration,
+                )
+                if self.target.fuel < self.target.properties.fuel_threshold_planned:
+                    self.target.fuel_empty = True
+
+                yield self.env.timeout(parked_duration)
+                continue
+
             if self.target.state.is_moving:
                 self.target.fuel = self.calc.calculate_fuel_level_while_moving(
                     fuel_lvl=self.target.fuel,
                     sfc=self.target.properties.fuel_specific_consumption,
                     density=self.target.properties.fuel_density,
                     p_engine=self.target.properties.engine_power_kw,
+                    duration=self.target.tick,
                 )
             else:
                 self.target.fuel = self.calc.calculate_fuel_level_while_idle(
                     fuel_lvl=self.target.fuel,
-                    fuel_idle_lph=self.target.properties.fuel_idle_lph
+                    fuel_idle_lph=self.target.properties.fuel_idle_lph,
+                    duration=self.target.tick,
                 )
 
             if self.target.fuel < self.target.properties.fuel_threshold_planned:
                 self.target.fuel_empty = True
 
-            yield self.env.timeout(1)
+            yield self.env.timeout(self.target.tick)
 
 
 class LunchBehavior(BaseBehavior):
@@ -142,13 +181,14 @@ class LunchBehavior(BaseBehavior):
             while self.env.now < nearest_lunch_end:
                 # если объект в рабочем состоянии - отправляем на обед
                 if self.target.state.is_work and not self.target.at_lunch:
+                    self.target.lunch_end = nearest_lunch_end
                     self.target.at_lunch = True
                     self.target.push_event(event_type=EventType.LUNCH_BEGIN)
                     lunch_time_remaining: int = nearest_lunch_end - self.env.now
                     yield self.env.timeout(lunch_time_remaining)
                 else:
                     # если не в рабочем, просто ждём
-                    yield self.env.timeout(1)
+                    yield self.env.timeout(self.target.tick)
 
             # Обед закончился
             if self.target.at_lunch:
@@ -201,6 +241,7 @@ class PlannedIdleBehavior(BaseBehavior):
             while self.env.now < nearest_idle_end:
                 # Если можем отправить в простой - отправляем
                 if self._should_start_planned_idle():
+                    self.target.planned_idle_end = nearest_idle_end
                     self.target.at_planned_idle = True
                     self.target.push_event(event_type=EventType.PLANNED_IDLE_BEGIN)
 
@@ -208,7 +249,7 @@ class PlannedIdleBehavior(BaseBehavior):
                     yield self.env.timeout(idle_time_remaining)
                 else:
                     # если не в рабочем, просто ждём
-                    yield self.env.timeout(1)
+                    yield self.env.timeout(self.target.tick)
 
             # Простой закончился
             if self.target.at_planned_idle:
@@ -1,3 +1,5 @@
+import heapq
+import math
 from copy import deepcopy
 from datetime import timedelta
 from typing import List
@@ -5,7 +7,7 @@ from typing import List
 from app.sim_engine.core.geometry import path_intersects_polygons, \
     find_all_route_edges_by_road_net_from_object_to_object
 from app.sim_engine.core.props import Blasting
-from app.sim_engine.core.simulations.behaviors.base import BaseBehavior
+from app.sim_engine.core.simulations.behaviors.base import BaseBehavior, get_parked_duration
 from app.sim_engine.enums import ObjectType
 from app.sim_engine.events import EventType
 from app.sim_engine.states import TruckState
@@ -49,50 +51,66 @@ class QuarryBlastingWatcher(BaseBehavior):
                 trucks_to_include.append(truck.id)
         return trucks_to_exclude, trucks_to_include
 
-    def run(self):
-        blasting_list = self.generate_blasting_list()
-
-        while blasting_list:
-            # Фильтруем актуальные и активные взрывные работы
-            blasting_list = [b for b in blasting_list if self.env.now < b.end_time]
-            active_blasting = [b for b in blasting_list if b.start_time <= self.env.now < b.end_time]
+    def build_schedule(self) -> list[tuple[float, int, Blasting]]:
+        """Куча начал взрывных работ: (время начала, порядковый номер, взрывные работы)"""
+        starts = [(blasting.start_time, idx, blasting) for idx, blasting in enumerate(self.generate_blasting_list())]
+        heapq.heapify(starts)
+        return starts
+
+    def push_blasting_event(self, event_type: EventType, blasting: Blasting):
+        self.target.push_event(
+            event_type,
+            **dict(
+                blasting_id=blasting.id,
+                blasting_start=self.target.start_time + timedelta(seconds=blasting.start_time),
+                blasting_end=self.target.start_time + timedelta(seconds=blasting.end_time),
+            )
+        )
 
-            self.target.active_blasting = active_blasting
-            self.target.active_blasting_polygons = [zone for blasting in active_blasting for zone in blasting.zones]
+    def run(self):
+        starts = self.build_schedule()
+        # Куча окончаний активных взрывных работ: (время окончания, порядковый номер, id взрывных работ)
+        ends: list[tuple[float, int, int]] = []
+        active: dict[int, Blasting] = {}
+
+        while starts or active:
+            # Обрабатываем границы, наступившие к текущему моменту
+            while starts and starts[0][0] <= self.env.now:
+                _, idx, blasting = heapq.heappop(starts)
+                if self.env.now < blasting.end_time:
+                    active[blasting.id] = blasting
+                    heapq.heappush(ends, (blasting.end_time, idx, blasting.id))
+            while ends and ends[0][0] <= self.env.now:
+                _, _, blasting_id = heapq.heappop(ends)
+                active.pop(blasting_id, None)
+
+            # Зоны пересобираются только на границах взрывных работ
+            self.target.active_blasting = list(active.values())
+            self.target.active_blasting_polygons = [zone for blasting in active.values() for zone in blasting.zones]
+            # ближайший момент, когда набор активных взрывных работ изменится
+            self.target.next_blasting_change = min(
+                [heap[0][0] for heap in (starts, ends) if heap],
+                default=None,
+            )
 
             # Пауза, чтобы дать технике возможность изменить состояние перед генерацией событий
             yield self.env.timeout(1)
 
-            # активные взрывные работы
-            active_ids = {b.id for b in active_blasting}
-            # завершившиеся взрывные работы
-            completed_ids = set(self.active_blasting_dict.keys()) - active_ids
-
             # Обрабатываем завершение взрывных работ
-            for blasting_id in completed_ids:
-                blasting = self.active_blasting_dict.pop(blasting_id)
-                self.target.push_event(
-                    EventType.BLASTING_END,
-                    **dict(
-                        blasting_id=blasting.id,
-                        blasting_start=self.target.start_time + timedelta(seconds=blasting.start_time),
-                        blasting_end=self.target.start_time + timedelta(seconds=blasting.end_time),
-                    )
-                )
+            for blasting_id in set(self.active_blasting_dict.keys()) - set(active.keys()):
+                self.push_blasting_event(EventType.BLASTING_END, self.active_blasting_dict.pop(blasting_id))
 
             # Обрабатываем начало новых взрывных работ
-            for blasting in active_blasting:
+            for blasting in active.values():
                 if blasting.id not in self.active_blasting_dict:
-                    self.target.push_event(
-                        EventType.BLASTING_BEGIN,
-                        **dict(
-                            blasting_id=blasting.id,
-                            blasting_start=self.target.start_time + timedelta(seconds=blasting.start_time),
-                            blasting_end=self.target.start_time + timedelta(seconds=blasting.end_time),
-                        )
-                    )
+                    self.push_blasting_event(EventType.BLASTING_BEGIN, blasting)
                     self.active_blasting_dict[blasting.id] = blasting
 
+            # Спим до следующей границы (в целых секундах, как при посекундном опросе)
+            next_change = self.target.next_blasting_change
+            if next_change is not None and next_change > self.env.now:
+                yield self.env.timeout(math.ceil(next_change - self.env.now))
+
 
 class TruckBlastingWatcher(BaseBehavior):
     """
@@ -115,7 +133,8 @@ class TruckBlastingWatcher(BaseBehavior):
                 in_blasting_idle = False
                 self.target.push_event(EventType.BLASTING_IDLE_END, write_event=False)
 
-            yield self.env.timeout(1)
+            # на стоянке состояние самосвала не меняется
+            yield self.env.timeout(max(self.target.tick, get_parked_duration(self.env, self.target)))
 
 
 class ShovelBlastingWatcher(BaseBehavior):
@@ -136,7 +155,7 @@ class ShovelBlastingWatcher(BaseBehavior):
         # Если активные зоны взрывных работ не изменились,
         # тогда стоим и ждём, пока зоны поменяются, чтобы заново проверять возможность проезда
         while remember_zones == {blasting.id for blasting in self.target.quarry.active_blasting}:
-            yield self.env.timeout(1)
+            yield self.env.timeout(self.target.tick)
 
     def run(self):
         while True:
@@ -172,7 +191,7 @@ class ShovelBlastingWatcher(BaseBehavior):
 
             yield from self.wait_blasting_changing()
 
-            yield self.env.timeout(1)
+            yield self.env.timeout(self.target.tick)
 
 
 class UnloadBlastingWatcher(BaseBehavior):
@@ -193,7 +212,7 @@ class UnloadBlastingWatcher(BaseBehavior):
         # Если активные зоны взрывных работ не изменились,
         # тогда стоим и ждём, пока зоны поменяются, чтобы заново проверять возможность проезда
         while remember_zones == {blasting.id for blasting in self.target.quarry.active_blasting}:
-            yield self.env.timeout(1)
+            yield self.env.timeout(self.target.tick)
 
     def run(self):
         while True:
@@ -229,4 +248,4 @@ class UnloadBlastingWatcher(BaseBehavior):
 
             yield from self.wait_blasting_changing()
 
-            yield self.env.timeout(1)
+            yield self.env.timeout(self.target.tick)
@@ -0,0 +1,15 @@
+from app.sim_engine.core.planner.rolling_horizon import rolling_horizon_step
+from app.sim_engine.core.simulations.behaviors.base import BaseBehavior
+
+
+class QuarryRollingHorizon(BaseBehavior):
+    """
+    Класс для карьера (Quarry), продлевающий план MILP/CP солвера скользящим горизонтом:
+    каждые rolling_horizon_step минут план перестраивается на следующее окно с текущих положений самосвалов
+    """
+
+    def run(self):
+        step = rolling_horizon_step(self.target.sim_conf) * 60
+        while True:
+            yield self.env.timeout(step)
+            self.target.rebuild_plan(start_time=self.target.current_time)
@@ -1,18 +1,19 @@
 import copy
-from datetime import timedelta
 
 import simpy
 
 from app.sim_engine.core.props import FuelStationProperties
 from app.sim_engine.core.simulations.behaviors.base import BaseTickBehavior
 from app.sim_engine.core.simulations.utils.dependency_resolver import DependencyResolver as DR
+from app.sim_engine.core.simulations.utils.helpers import sim_time_step
+from app.sim_engine.core.simulations.utils.trucks_queue import TrucksQueue
 from app.sim_engine.enums import ObjectType
 from app.sim_engine.events import FuelStationEvent, EventType
 from app.sim_engine.states import FuelStationState, TruckState
 
 
 class FuelStation:
-    def __init__(self, properties: FuelStationProperties, unit_id, name, initial_position, tick=1):
+    def __init__(self, properties: FuelStationProperties, unit_id, name, initial_position, tick: int | None = None):
         env = DR.env()
 
         self.env = env
@@ -24,17 +25,15 @@ class FuelStation:
         self.position = initial_position
         self.writer = DR.writer()
         self.start_time = env.sim_data.start_time
-        self.tick = tick
-        self.trucks_queue = []
+        self.tick = tick if tick is not None else sim_time_step()
+        self.trucks_queue = TrucksQueue()
 
         # Базовый логика процессов каждого тика.
         self.tick_proc = BaseTickBehavior(self)
 
     @property
     def current_time(self):
-        current_time = self.start_time + timedelta(seconds=self.env.now)
-        timestamp = current_time.timestamp()
-        return timestamp
+        return self.env.now_ts
 
     def refuelling(self, truck):
         with self.resource.request() as req:
@@ -44,10 +43,13 @@ class FuelStation:
             fuel_needed = truck.properties.fuel_capacity - truck.fuel
             refuel_time = fuel_needed / self.properties.flow_rate
             old_state = copy.copy(truck.state)
-            for _ in range(int(refuel_time)):
+            remaining = int(refuel_time)
+            while remaining > 0:
+                step_sec = min(self.tick, remaining)
                 truck.state = TruckState.REFUELING
-                truck.fuel += self.properties.flow_rate
-                yield self.env.timeout(1)
+                truck.fuel += self.properties.flow_rate * step_sec
+                yield self.env.timeout(step_sec)
+                remaining -= step_sec
             self.push_event(event_type=EventType.REFUELING_END, truck=truck)
             truck.fuel_empty = False
             truck.fuel = truck.properties.fuel_capacity
@@ -74,12 +76,13 @@ class FuelStation:
         self.writer.push_event(event)
 
     def telemetry_process(self):
+        refuelling_names, queue_names = self.trucks_queue.split_names(self.properties.num_pumps)
         frame_data = {
             "object_id": f"{self.id}_fuel_station",
             "object_type": ObjectType.FUEL_STATION.key(),
             "timestamp": self.current_time,
-            "refuelling_trucks": [truck.name for truck in self.trucks_queue[:self.properties.num_pumps]],
-            "trucks_queue": [truck.name for truck in self.trucks_queue[self.properties.num_pumps:]],
+            "refuelling_trucks": list(refuelling_names),
+            "trucks_queue": list(queue_names),
             "state": self.state.ru()
         }
         self.writer.writerow(frame_data)
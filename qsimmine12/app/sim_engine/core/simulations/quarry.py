@@ -1,7 +1,8 @@
 import logging
 import random
+from collections import defaultdict
 from copy import deepcopy
-from datetime import timedelta, datetime
+from datetime import datetime
 from typing import Tuple
 
 # TODO: Решить проблему циклических ссылок
@@ -9,13 +10,19 @@ from typing import Tuple
 # from app.sim_engine.core.simulations.truck import Truck
 # from app.sim_engine.core.simulations.unload import Unload
 from app.sim_engine.core.planner.manage import Planner
+from app.sim_engine.core.planner.planning_matrix import matrix_workers
+from app.sim_engine.core.planner.rolling_horizon import HorizonWindow, fit_window, rolling_horizon
+from app.sim_engine.core.planner.warm_start import previous_plan_from_trips
 from app.sim_engine.core.props import SimData, Blasting, IdleArea
 from app.sim_engine.core.simulations.behaviors.blasting import QuarryBlastingWatcher
+from app.sim_engine.core.simulations.behaviors.rolling_horizon import QuarryRollingHorizon
 from app.sim_engine.core.simulations.utils.dependency_resolver import DependencyResolver as DR
 from app.sim_engine.core.simulations.utils.helpers import safe_int
+from app.sim_engine.core.simulations.utils.profiler import profiled_section
+from app.sim_engine.core.simulations.utils.random_streams import AntitheticRandom, derive_stream_seed
+from app.sim_engine.core.simulations.utils.replanning import REPLANNABLE_STATES, busy_trip, current_assignment
 from app.sim_engine.enums import ObjectType, SolverType
 from app.sim_engine.events import Event, EventType
-from app.sim_engine.states import TruckState
 
 logger = logging.getLogger(__name__)
 
@@ -39,6 +46,8 @@ class Quarry:
         self.trips_table = []
 
         self.truck_map: dict = {}
+        # Количество самосвалов, едущих порожними к каждому экскаватору (ведут сами самосвалы, см. Truck.state)
+        self.inbound_trucks: defaultdict[int, int] = defaultdict(int)
         self.shovel_map: dict = {}
         self.unload_map: dict = {}
         self.shift_change_area: IdleArea = None
@@ -53,21 +62,32 @@ class Quarry:
         }
 
         self.seeded_random: random.Random = random._inst
+        # Независимые потоки случайных чисел по объектам и назначению, см. get_random_stream
+        self.random_streams: dict[tuple, random.Random] = {}
 
         # механизм учёта взрывных работ
         self.active_blasting: list[Blasting] = []
         self.active_blasting_polygons: Tuple[Tuple[Tuple[float, float]]] | list[list[list[float]]] = []
+        self.next_blasting_change: float | None = None
         self.blasting_proc = QuarryBlastingWatcher(
             target=self,
         ) if self.sim_conf["blasting"] else None
+        # Продление плана MILP/CP солвера на границах окна скользящего горизонта
+        self.rolling_horizon_proc = QuarryRollingHorizon(
+            target=self,
+        ) if (
+            self.sim_conf["mode"] == "auto"
+            and self.sim_conf["solver"] != SolverType.GREEDY
+            and rolling_horizon(self.sim_conf)
+        ) else None
 
     @property
     def current_time(self) -> datetime:
-        return self.start_time + timedelta(seconds=self.env.now)
+        return self.env.now_dt
 
     @property
     def current_timestamp(self):
-        return self.current_time.timestamp()
+        return self.env.now_ts
 
     @property
     def restricted_zones(self):
@@ -82,15 +102,58 @@ class Quarry:
         if self.sim_data.seed is None:
             self.sim_data.seed = random.getrandbits(128)
         self.seeded_random = random.Random(self.sim_data.seed)
+        self.random_streams = {}
+
+    def get_random_stream(self, *key) -> random.Random:
+        """
+        Возвращает независимый поток случайных чисел для ключа (объект, назначение).
+
+        Зерно потока выводится из зерна прогона и ключа, поэтому дополнительные розыгрыши
+        одного объекта не сдвигают последовательности других - это позволяет сравнивать
+        сценарии на общих случайных числах.
+        """
+        if key not in self.random_streams:
+            random_cls = AntitheticRandom if self.sim_data.antithetic else random.Random
+            self.random_streams[key] = random_cls(derive_stream_seed(self.sim_data.seed, *key))
+        return self.random_streams[key]
+
+    def reseed_random(self, seed: int) -> None:
+        """Перезапускает генератор прогона и все созданные потоки с новым зерном"""
+        self.sim_data.seed = seed
+        self.seeded_random.seed(seed)
+        for key, stream in self.random_streams.items():
+            stream.seed(derive_stream_seed(seed, *key))
 
     def update_planned_trips(self):
+        """
+        Передаёт самосвалам новый план. Прерываются только самосвалы, у которых первый рейс плана
+        отличается от текущей связки; остальные продолжают текущий рейс, он же первый рейс нового плана
+        """
+        stats = self.env.replanning_stats
+        stats.replans += 1
+
         for truck_id, sim_truck in self.truck_map.items():
-            sim_truck.planned_trips = self.planned_trips.get(truck_id, sim_truck.planned_trips)
-            if sim_truck.state in [
-                TruckState.MOVING_EMPTY,
-                TruckState.WAITING,
-            ]:
-                sim_truck.process.interrupt()
+            new_trips = self.planned_trips.get(truck_id)
+            if sim_truck.state not in REPLANNABLE_STATES:
+                sim_truck.planned_trips = new_trips if new_trips is not None else sim_truck.planned_trips
+                continue
+
+            if not new_trips:
+                # Плана для самосвала нет - он продолжает текущий рейс и после прерывания
+                stats.interrupts_avoided += 1
+                if new_trips is not None:
+                    sim_truck.planned_trips = new_trips
+                continue
+
+            first_trip = new_trips[0]
+            if current_assignment(sim_truck) == (first_trip.shovel_id, first_trip.unload_id):
+                stats.interrupts_avoided += 1
+                sim_truck.planned_trips = new_trips[1:]
+                continue
+
+            stats.interrupts += 1
+            sim_truck.planned_trips = new_trips
+            sim_truck.process.interrupt()
 
     def update_trucks_position(self, sim_data):
         for truck_id, sim_truck in self.truck_map.items():
@@ -99,14 +162,12 @@ class Quarry:
             truck.initial_lon = sim_truck.position.lon
             truck.initial_edge_id = sim_truck.edge.index if sim_truck.edge else None
 
-    def rebuild_plan_by_add_exclude(
-            self,
-            start_time: datetime = None,
-            end_time: datetime = None,
-            exclude_object_id: int = None,
-            exclude_object_type: ObjectType = None
-    ) -> None:
-
+    @profiled_section("planner_rebuild")
+    def rebuild_plan(self, start_time: datetime = None, end_time: datetime = None) -> None:
+        """
+        Перестраивает план MILP/CP солвера с текущих положений самосвалов без исключённых объектов.
+        При скользящем горизонте план строится только на окно (см. rolling_horizon)
+        """
         sim_data_copy = deepcopy(self.sim_data)
         if start_time:
             sim_data_copy.start_time = start_time
@@ -115,26 +176,46 @@ class Quarry:
 
         self.update_trucks_position(sim_data_copy)
 
-        if exclude_object_type == ObjectType.TRUCK:
-            self.exclude_objects["trucks"].append(exclude_object_id)
-        elif exclude_object_type == ObjectType.SHOVEL:
-            self.exclude_objects["shovels"].append(exclude_object_id)
-        elif exclude_object_type == ObjectType.UNLOAD:
-            self.exclude_objects["unloads"].append(exclude_object_id)
+        window = None
+        horizon = rolling_horizon(self.sim_conf)
+        if horizon:
+            window = HorizonWindow(open_end=fit_window(sim_data_copy, horizon), busy_trips=self.busy_trips())
 
         planner = Planner(
             solver=self.sim_conf["solver"],
             msg=self.sim_conf["msg"],
             workers=self.sim_conf["workers"],
-            time_limit=self.sim_conf["time_limit"]
+            time_limit=self.sim_conf["time_limit"],
+            matrix_workers=matrix_workers(self.sim_conf),
+            warm_start=self.sim_conf["warm_start"],
+            time_bucket=self.sim_conf["time_bucket"],
+            trip_bound_margin=self.sim_conf["trip_bound_margin"],
+            use_plan_cache=self.sim_conf["plan_cache"]
         )
-
-        self.planned_trips = planner.run_with_exclude(sim_data_copy, self.exclude_objects)
+        # Оставшиеся рейсы текущего плана - подсказка для тёплого старта солвера
+        previous_plan = previous_plan_from_trips({
+            truck_id: sim_truck.planned_trips for truck_id, sim_truck in self.truck_map.items()
+        })
+        self.planned_trips = planner.run_with_exclude(
+            sim_data_copy, self.exclude_objects, window=window, previous_plan=previous_plan
+        )
+        self.env.replanning_stats.add_solver_win(planner.winner)
+        if planner.cache_hit:
+            self.env.replanning_stats.plan_cache_hits += 1
 
         if self.planned_trips:
             self.update_planned_trips()
 
-    def rebuild_plan_by_del_exclude(
+    def busy_trips(self) -> dict[int, tuple[str, int, int]]:
+        """Начатые рейсы самосвалов - закреплённый префикс плана скользящего горизонта"""
+        trips = {}
+        for truck_id, sim_truck in self.truck_map.items():
+            trip = busy_trip(sim_truck)
+            if trip is not None:
+                trips[truck_id] = trip
+        return trips
+
+    def rebuild_plan_by_add_exclude(
             self,
             start_time: datetime = None,
             end_time: datetime = None,
@@ -142,13 +223,22 @@ class Quarry:
             exclude_object_type: ObjectType = None
     ) -> None:
 
-        sim_data_copy = deepcopy(self.sim_data)
-        if start_time:
-            sim_data_copy.start_time = start_time
-        if end_time:
-            sim_data_copy.end_time = end_time
+        if exclude_object_type == ObjectType.TRUCK:
+            self.exclude_objects["trucks"].append(exclude_object_id)
+        elif exclude_object_type == ObjectType.SHOVEL:
+            self.exclude_objects["shovels"].append(exclude_object_id)
+        elif exclude_object_type == ObjectType.UNLOAD:
+            self.exclude_objects["unloads"].append(exclude_object_id)
 
-        self.update_trucks_position(sim_data_copy)
+        self.rebuild_plan(start_time=start_time, end_time=end_time)
+
+    def rebuild_plan_by_del_exclude(
+            self,
+            start_time: datetime = None,
+            end_time: datetime = None,
+            exclude_object_id: int = None,
+            exclude_object_type: ObjectType = None
+    ) -> None:
 
         if exclude_object_type == ObjectType.TRUCK:
             self.exclude_objects["trucks"].remove(exclude_object_id)
@@ -157,16 +247,7 @@ class Quarry:
         elif exclude_object_type == ObjectType.UNLOAD:
             self.exclude_objects["unloads"].remove(exclude_object_id)
 
-        planner = Planner(
-            solver=self.sim_conf["solver"],
-            msg=self.sim_conf["msg"],
-            workers=self.sim_conf["workers"],
-            time_limit=self.sim_conf["time_limit"]
-        )
-        self.planned_trips = planner.run_with_exclude(sim_data_copy, self.exclude_objects)
-
-        if self.planned_trips:
-            self.update_planned_trips()
+        self.rebuild_plan(start_time=start_time, end_time=end_time)
 
     def get_summary(self, end_time: datetime) -> dict:
         summary =  self.trip_service.get_summary(end_time)
@@ -1,5 +1,3 @@
-from datetime import timedelta
-
 import simpy
 
 from app.sim_engine.core.calculations.shovel import ShovelCalc
@@ -9,6 +7,8 @@ from app.sim_engine.core.simulations.behaviors.base import BreakdownBehavior, Ba
 from app.sim_engine.core.simulations.behaviors.blasting import ShovelBlastingWatcher
 from app.sim_engine.core.simulations.quarry import Quarry
 from app.sim_engine.core.simulations.utils.dependency_resolver import DependencyResolver as DR
+from app.sim_engine.core.simulations.utils.helpers import sim_time_step
+from app.sim_engine.core.simulations.utils.trucks_queue import TrucksQueue
 from app.sim_engine.enums import ObjectType, SolverType
 from app.sim_engine.events import Event, EventType
 from app.sim_engine.states import ExcState, TruckState
@@ -23,7 +23,7 @@ class Shovel:
             Point,
             quarry: Quarry,
             properties: ShovelProperties,
-            tick=1
+            tick: int | None = None
     ):
         env = DR.env()
         self.writer = DR.writer()
@@ -41,8 +41,8 @@ class Shovel:
         self.properties = properties
         self.cycles = 0
         self.start_time = env.sim_data.start_time
-        self.trucks_queue = []
-        self.tick = tick
+        self.trucks_queue = TrucksQueue()
+        self.tick = tick if tick is not None else sim_time_step()
 
         # механизм Поломок/Восстановлений
         self.broken = False
@@ -66,21 +66,21 @@ class Shovel:
 
     @property
     def current_time(self):
-        return self.start_time + timedelta(seconds=self.env.now)
+        return self.env.now_dt
 
     @property
     def current_timestamp(self):
-        return self.current_time.timestamp()
+        return self.env.now_ts
 
     @property
     def loading_truck(self):
         """Возвращает грузящийся самосвал (первый в очереди)"""
-        return self.trucks_queue[0] if self.trucks_queue else None
+        return self.trucks_queue.head
 
     @property
     def trucks_in_queue(self):
         """Возвращает список самосвалов, стоящих в очереди на погрузку"""
-        return self.trucks_queue[1:] if len(self.trucks_queue) > 1 else None
+        return self.trucks_queue.tail(1) or None
 
     def load_truck(self, truck):
         truck.req = self.resource.request()
@@ -93,7 +93,7 @@ class Shovel:
         ):
             while self.broken or truck.broken:
                 truck.state = TruckState.REPAIR if truck.broken else TruckState.IDLE
-                yield self.env.timeout(1)
+                yield self.env.timeout(self.tick)
             truck.state = TruckState.LOADING
             yield self.env.timeout(time)
             truck.weight = weight
@@ -168,6 +168,7 @@ class Shovel:
             self.writer.push_event(event)
 
     def telemetry_process(self):
+        loading_names, queue_names = self.trucks_queue.split_names(1)
         frame_data = {
             "object_id": f"{self.id}_shovel",
             "object_name": self.name,
@@ -176,7 +177,7 @@ class Shovel:
             "lon": round(self.position.lon, 6),
             "state": self.state.ru(),
             "timestamp": self.current_timestamp,
-            "loading_truck": self.trucks_queue[0].name if self.trucks_queue else "-",
-            "trucks_queue": [truck.name for truck in self.trucks_queue[1:]]
+            "loading_truck": loading_names[0] if loading_names else "-",
+            "trucks_queue": list(queue_names)
         }
         self.writer.writerow(frame_data)
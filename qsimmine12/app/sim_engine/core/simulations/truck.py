@@ -1,4 +1,3 @@
-from datetime import timedelta
 from typing import List, Callable, Optional, Set
 
 import simpy
@@ -24,6 +23,7 @@ from app.sim_engine.core.simulations.quarry import Quarry
 from app.sim_engine.core.simulations.shovel import Shovel
 from app.sim_engine.core.simulations.unload import Unload
 from app.sim_engine.core.simulations.utils.dependency_resolver import DependencyResolver as DR
+from app.sim_engine.core.simulations.utils.helpers import sim_time_step
 from app.sim_engine.enums import ObjectType, IdleAreaType, SolverType
 from app.sim_engine.events import EventType, Event
 from app.sim_engine.states import TruckState
@@ -44,7 +44,7 @@ class Truck:
             unload: Unload | None,
             properties: TruckProperties,
             fuel_stations: list[FuelStation],
-            tick=1
+            tick: int | None = None
     ):
 
         env = DR.env()
@@ -67,6 +67,9 @@ class Truck:
 
         self.planned_trips = planned_trips
         self.quarry = quarry
+        # Экскаватор, к которому самосвал учтён в quarry.inbound_trucks
+        self._inbound_shovel_id: int | None = None
+        self._state = TruckState.IDLE
         self.shovel = shovel
         self.unload = unload
 
@@ -87,7 +90,7 @@ class Truck:
         self.start_time = env.sim_data.start_time
         self.process = env.process(self.run())
         self.calculator = TruckCalc
-        self.tick = tick
+        self.tick = tick if tick is not None else sim_time_step()
 
         # Переменная для управления очередью на погрузке, разгрузке
         self.req = None
@@ -100,14 +103,19 @@ class Truck:
         self.fuel_empty = False
         self.fuel_proc = FuelBehavior(self, properties) if self.sim_conf["refuel"] and self.fuel_stations else None
 
+        # Момент, до которого самосвал гарантированно стоит (режим fast_forward)
+        self.parked_until: float | None = None
+
         # механизм отслеживания обеденных перерывов
         self.at_lunch = False
+        self.lunch_end: float | None = None
         self.lunch_proc = LunchBehavior(
             target=self
         ) if self.sim_conf["lunch"] and self.quarry.sim_data.lunch_times else None
 
         # механизм отслеживания плановых простоев
         self.at_planned_idle = False
+        self.planned_idle_end: float | None = None
         self.planned_idle_proc = PlannedIdleBehavior(
             target=self,
             object_type=ObjectType.TRUCK,
@@ -123,6 +131,36 @@ class Truck:
         # Базовая логика процессов каждого тика.
         self.tick_proc = BaseTickBehavior(self)
 
+    @property
+    def state(self) -> TruckState:
+        return self._state
+
+    @state.setter
+    def state(self, value: TruckState) -> None:
+        self._state = value
+        self._update_inbound()
+
+    @property
+    def shovel(self) -> Shovel | None:
+        return self._shovel
+
+    @shovel.setter
+    def shovel(self, value: Shovel | None) -> None:
+        self._shovel = value
+        self._update_inbound()
+
+    def _update_inbound(self) -> None:
+        """Поддерживает счётчик самосвалов, едущих порожними к экскаватору, для жадного распределения"""
+        shovel_id = self._shovel.id if self._shovel is not None and self._state == TruckState.MOVING_EMPTY else None
+        if shovel_id == self._inbound_shovel_id:
+            return
+
+        if self._inbound_shovel_id is not None:
+            self.quarry.inbound_trucks[self._inbound_shovel_id] -= 1
+        if shovel_id is not None:
+            self.quarry.inbound_trucks[shovel_id] += 1
+        self._inbound_shovel_id = shovel_id
+
     @property
     def nearest_fuel_station(self) -> FuelStation:
         if len(self.fuel_stations) > 2:
@@ -133,15 +171,17 @@ class Truck:
 
     @property
     def current_time(self):
-        return self.start_time + timedelta(seconds=self.env.now)
+        return self.env.now_dt
 
     @property
     def current_timestamp(self):
-        return self.current_time.timestamp()
+        return self.env.now_ts
 
     def travel_segment(self, p1: Point, p2: Point, speed_limit, acceleration):
-        for speed, position in self.calculator.calculate_segment_motion(p1, p2, self.speed, speed_limit, acceleration):
-            yield self.env.timeout(1)
+        for speed, position, step_sec in self.calculator.calculate_segment_motion(
+                p1, p2, self.speed, speed_limit, acceleration, self.tick
+        ):
+            yield self.env.timeout(step_sec)
             self.speed = speed
             self.position = position
 
@@ -187,7 +227,7 @@ class Truck:
         # логика поломок
         while self.broken:
             self.state = TruckState.REPAIR
-            yield self.env.timeout(1)
+            yield self.env.timeout(self.tick)
 
     def refuel_action(self):
         """Логика заправок"""
@@ -221,7 +261,7 @@ class Truck:
             # пережидаем обед
             while self.at_lunch:
                 self.state = TruckState.LUNCH
-                yield self.env.timeout(1)
+                yield from self.park(self.lunch_end)
 
             self.state = old_state
 
@@ -242,7 +282,7 @@ class Truck:
             # пережидаем плановый простой
             while self.at_planned_idle:
                 self.state = TruckState.PLANNED_IDLE
-                yield self.env.timeout(1)
+                yield from self.park(self.planned_idle_end)
 
             self.state = old_state
 
@@ -250,7 +290,23 @@ class Truck:
         """Логика ожидания изменений во взрывных работах"""
         while self.quarry.active_blasting and current_zones == {blasting.id for blasting in self.quarry.active_blasting}:
             self.state = TruckState.BLASTING_IDLE
-            yield self.env.timeout(1)
+            yield from self.park(self.quarry.next_blasting_change)
+
+    def park(self, until: float | None):
+        """
+        Стоянка самосвала на площадке.
+        В режиме fast_forward время пропускается сразу до известного момента окончания стоянки,
+        иначе ожидание идёт по тикам.
+        """
+        if not self.sim_conf["fast_forward"] or until is None or until - self.env.now <= self.tick:
+            yield self.env.timeout(self.tick)
+            return
+
+        self.parked_until = until
+        try:
+            yield self.env.timeout(until - self.env.now)
+        finally:
+            self.parked_until = None
 
     def blasting_action(self):
         """Логика поведения при активных взрывных работах"""
@@ -415,11 +471,12 @@ class Truck:
             position_changed = False
 
             # Ведём самосвал по текущему маршруту
-            for speed, position, edge in self.calculator.calculate_motion_by_edges(
+            for speed, position, edge, step_sec in self.calculator.calculate_motion_by_edges(
                     self.active_route_edge,
                     self.properties,
                     forward=forward,
-                    is_loaded=is_loaded):
+                    is_loaded=is_loaded,
+                    time_step_sec=self.tick):
 
                 # Action'ы могут влиять на местоположение самосвала, поэтому запоминаем позицию
                 position_before = (self.position.lon, self.position.lat)
@@ -431,13 +488,13 @@ class Truck:
                     position_changed = True
                     break
 
-                yield self.env.timeout(1)
+                yield self.env.timeout(step_sec)
                 self.speed = speed
                 self.position = position
                 self.edge = edge
 
                 if current_action == 'trip':
-                    self.statistic_service.update_truck_statistics(self.id, self.state)
+                    self.statistic_service.update_truck_statistics(self.id, self.state, duration=step_sec)
 
             if position_changed:
                 # Позиция поменялась, поэтому нужно построить новый маршрут от текущей позиции,
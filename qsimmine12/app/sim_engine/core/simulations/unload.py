@@ -1,5 +1,3 @@
-from datetime import timedelta
-
 import simpy
 
 from app.sim_engine.core.calculations.unload import UnloadCalc
@@ -7,6 +5,8 @@ from app.sim_engine.core.simulations.behaviors.base import BaseTickBehavior, Bre
 from app.sim_engine.core.simulations.behaviors.blasting import UnloadBlastingWatcher
 from app.sim_engine.core.simulations.quarry import Quarry
 from app.sim_engine.core.simulations.utils.dependency_resolver import DependencyResolver as DR
+from app.sim_engine.core.simulations.utils.helpers import sim_time_step
+from app.sim_engine.core.simulations.utils.trucks_queue import TrucksQueue
 from app.sim_engine.enums import ObjectType, SolverType
 from app.sim_engine.events import Event, EventType
 from app.sim_engine.states import UnloadState, TruckState
@@ -19,7 +19,7 @@ class Unload:
             unit_id,
             name,
             quarry: Quarry,
-            tick=1
+            tick: int | None = None
     ):
         env = DR.env()
         self.writer = DR.writer()
@@ -35,8 +35,8 @@ class Unload:
         self.name = name
         self.quarry = quarry
         self.start_time = env.sim_data.start_time
-        self.tick = tick
-        self.trucks_queue = []
+        self.tick = tick if tick is not None else sim_time_step()
+        self.trucks_queue = TrucksQueue()
 
         # механизм Поломок/Восстановлений
         self.broken = False
@@ -53,21 +53,21 @@ class Unload:
 
     @property
     def current_time(self):
-        return self.start_time + timedelta(seconds=self.env.now)
+        return self.env.now_dt
 
     @property
     def current_timestamp(self):
-        return self.current_time.timestamp()
+        return self.env.now_ts
 
     @property
     def unloading_truck(self):
         """Возвращает разгружающийся самосвал (первый в очереди)"""
-        return self.trucks_queue[0] if self.trucks_queue else None
+        return self.trucks_queue.head
 
     @property
     def trucks_in_queue(self):
         """Возвращает список самосвалов, стоящих в очереди на разгрузку"""
-        return self.trucks_queue[self.properties.trucks_at_once:] if len(self.trucks_queue) > self.properties.trucks_at_once else None
+        return self.trucks_queue.tail(self.properties.trucks_at_once) or None
 
     def unload_truck(self, truck):
         with self.resource.request() as req:
@@ -77,17 +77,21 @@ class Unload:
             time_unload = data["t_total"]
             weight_in_second = truck.weight / time_unload
             volume_in_second = truck.volume / time_unload
-            for _ in range(int(time_unload)):
+            # Разгрузка идёт шагами симуляции, последний шаг укорачивается до остатка времени разгрузки
+            remaining = int(time_unload)
+            while remaining > 0:
 
                 while self.broken or truck.broken:
                     truck.state = TruckState.REPAIR if truck.broken else TruckState.IDLE
-                    yield self.env.timeout(1)
+                    yield self.env.timeout(self.tick)
                 truck.state = TruckState.UNLOADING
 
-                truck.weight = max(0, truck.weight - weight_in_second)
-                truck.volume = max(0, truck.volume - volume_in_second)
+                step_sec = min(self.tick, remaining)
+                truck.weight = max(0, truck.weight - weight_in_second * step_sec)
+                truck.volume = max(0, truck.volume - volume_in_second * step_sec)
 
-                yield self.env.timeout(1)
+                yield self.env.timeout(step_sec)
+                remaining -= step_sec
             self.trucks_queue.remove(truck)
 
     def main_tic_process(self):
@@ -149,12 +153,13 @@ class Unload:
             self.writer.push_event(event)
 
     def telemetry_process(self):
+        unloading_names, queue_names = self.trucks_queue.split_names(self.properties.trucks_at_once)
         frame_data = {
             "object_id": f"{self.id}_unload",
             "object_type": ObjectType.UNLOAD.key(),
             "timestamp": self.current_timestamp,
-            "unloading_trucks": [truck.name for truck in self.trucks_queue[:self.properties.trucks_at_once]],
-            "trucks_queue": [truck.name for truck in self.trucks_queue[self.properties.trucks_at_once:]],
+            "unloading_trucks": list(unloading_names),
+            "trucks_queue": list(queue_names),
             "state": self.state.ru()
         }
         self.writer.writerow(frame_data)
\ No newline at end of file
@@ -1,15 +1,18 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 
 from app.sim_engine.core.simulations.utils.dependency_resolver import DependencyResolver as DR
 
 
 def sim_current_timestamp() -> float:
-    return sim_current_time().timestamp()
+    return DR.env().now_ts
 
 
 def sim_current_time() -> datetime:
-    env = DR.env()
-    return env.sim_data.start_time + timedelta(seconds=env.now)
+    return DR.env().now_dt
+
+
+def sim_current_hour() -> int:
+    return DR.env().now_hour
 
 
 def sim_end_time() -> datetime:
@@ -22,6 +25,11 @@ def sim_start_time() -> datetime:
     return env.sim_data.start_time
 
 
+def sim_time_step() -> int:
+    """Шаг симуляции в секундах (SIM_CONFIG["time_step"])"""
+    return int(DR.sim_conf().get("time_step", 1))
+
+
 def sim_duration() -> int:
     env = DR.env()
     return env.sim_data.duration
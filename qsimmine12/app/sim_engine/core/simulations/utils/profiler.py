@@ -0,0 +1,145 @@
+import functools
+import time
+from collections import defaultdict
+
+import simpy
+
+from app.sim_engine.core.simulations.utils.service_locator import ServiceLocator
+from app.sim_engine.events import Event
+from app.sim_engine.writer import IWriter
+
+
+class EngineProfiler:
+    """
+    Сборщик статистики работы движка: число событий и время их обработки по типам процессов,
+    глубина очереди событий, время в выделенных секциях (поиск маршрутов, перепланирование, запись).
+
+    Создаётся окружением только при включённой опции profile, в остальных случаях не существует вовсе
+    """
+
+    # Глубину очереди замеряем не на каждом событии, а раз в QUEUE_SAMPLE_RATE событий
+    QUEUE_SAMPLE_RATE = 100
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.events_total = 0
+        self.events: defaultdict[str, int] = defaultdict(int)
+        self.events_time: defaultdict[str, float] = defaultdict(float)
+
+        self.queue_samples = 0
+        self.queue_depth_sum = 0
+        self.queue_depth_max = 0
+
+        self.sections_count: defaultdict[str, int] = defaultdict(int)
+        self.sections_time: defaultdict[str, float] = defaultdict(float)
+        self._active_sections: set[str] = set()
+
+    @staticmethod
+    def event_source(event: simpy.Event) -> str:
+        """Имя процесса, который будет возобновлён событием (например, FuelBehavior.run)"""
+        for callback in event.callbacks or ():
+            process = getattr(callback, "__self__", None)
+            if isinstance(process, simpy.Process):
+                return process._generator.__qualname__
+        return type(event).__name__
+
+    def register_event(self, source: str, duration: float, queue_depth: int) -> None:
+        self.events_total += 1
+        self.events[source] += 1
+        self.events_time[source] += duration
+
+        if self.events_total % self.QUEUE_SAMPLE_RATE == 0:
+            self.queue_samples += 1
+            self.queue_depth_sum += queue_depth
+            self.queue_depth_max = max(self.queue_depth_max, queue_depth)
+
+    def in_section(self, name: str) -> bool:
+        return name in self._active_sections
+
+    def enter_section(self, name: str) -> None:
+        self._active_sections.add(name)
+
+    def exit_section(self, name: str, duration: float) -> None:
+        self._active_sections.discard(name)
+        self.sections_count[name] += 1
+        self.sections_time[name] += duration
+
+    def to_dict(self) -> dict:
+        wall_time = time.perf_counter() - self.started
+        return {
+            "wall_time_sec": round(wall_time, 3),
+            "events_total": self.events_total,
+            "events_per_sec": round(self.events_total / wall_time) if wall_time else None,
+            "processes": {
+                source: {
+                    "events": count,
+                    "time_sec": round(self.events_time[source], 3),
+                }
+                for source, count in sorted(self.events.items(), key=lambda item: -self.events_time[item[0]])
+            },
+            "queue_depth": {
+                "mean": round(self.queue_depth_sum / self.queue_samples, 1) if self.queue_samples else None,
+                "max": self.queue_depth_max,
+            },
+            "sections": {
+                name: {
+                    "calls": count,
+                    "time_sec": round(self.sections_time[name], 3),
+                }
+                for name, count in self.sections_count.items()
+            },
+        }
+
+
+def profiled_section(name: str):
+    """
+    Декоратор замера времени секции (поиск маршрута, перепланирование и т.д.).
+    Если профилирование выключено - только проверка наличия профилировщика.
+    Профилировщик привязан к прогону: вызовы вне прогона (до создания окружения или после завершения
+    run) не учитываются. Вложенные вызовы одной и той же секции учитываются один раз
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler: EngineProfiler | None = ServiceLocator.get('profiler')
+            if profiler is None or profiler.in_section(name):
+                return func(*args, **kwargs)
+
+            profiler.enter_section(name)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.exit_section(name, time.perf_counter() - started)
+
+        return wrapper
+
+    return decorator
+
+
+class ProfiledWriter(IWriter):
+    """Обёртка над писарем, замеряющая время записи телеметрии и событий"""
+
+    def __init__(self, writer: IWriter, profiler: EngineProfiler) -> None:
+        self.writer = writer
+        self.profiler = profiler
+
+    def update_data(self, key: str, **kwargs) -> None:
+        self.writer.update_data(key, **kwargs)
+
+    def push_event(self, evt: Event) -> None:
+        started = time.perf_counter()
+        self.writer.push_event(evt)
+        self.profiler.exit_section("writer", time.perf_counter() - started)
+
+    def writerow(self, row: dict) -> None:
+        started = time.perf_counter()
+        self.writer.writerow(row)
+        self.profiler.exit_section("writer", time.perf_counter() - started)
+
+    def finalize(self):
+        return self.writer.finalize()
+
+    def flush(self) -> dict:
+        return self.writer.flush()
@@ -0,0 +1,24 @@
+import hashlib
+import random
+
+
+def derive_stream_seed(seed: int, *key) -> int:
+    """
+    Детерминированно выводит зерно независимого потока из зерна прогона и ключа потока.
+    Ключ - произвольный набор значений, например ("truck", 3, "breakdown")
+    """
+    raw = ":".join(str(part) for part in (seed, *key)).encode()
+    return int.from_bytes(hashlib.sha256(raw).digest()[:16], "big")
+
+
+class AntitheticRandom(random.Random):
+    """
+    Генератор антитетического прогона: вместо U выдаёт 1 - U.
+    Распределения, построенные через random() (expovariate, uniform и т.д.), отражаются зеркально
+    относительно прогона с тем же зерном, что снижает дисперсию среднего по паре прогонов.
+    """
+
+    def random(self) -> float:
+        value = 1.0 - super().random()
+        # 1 - U лежит в (0, 1], а random() обязан возвращать [0, 1)
+        return value if value < 1.0 else 0.0
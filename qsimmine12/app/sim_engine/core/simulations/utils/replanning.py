@@ -0,0 +1,51 @@
+from dataclasses import dataclass, asdict, field
+
+from app.sim_engine.core.planner.rolling_horizon import TRIP_STAGE_LOADING, TRIP_STAGE_HAULING, \
+    TRIP_STAGE_UNLOADING
+from app.sim_engine.states import TruckState
+
+# Состояния, в которых самосвал можно перенаправить прерыванием процесса
+REPLANNABLE_STATES = (TruckState.MOVING_EMPTY, TruckState.WAITING)
+
+# Состояния начатого рейса, который самосвал доезжает при любом перепланировании
+BUSY_TRIP_STAGES = {
+    TruckState.LOADING: TRIP_STAGE_LOADING,
+    TruckState.MOVING_LOADED: TRIP_STAGE_HAULING,
+    TruckState.UNLOADING: TRIP_STAGE_UNLOADING,
+}
+
+
+@dataclass
+class ReplanningStats:
+    """
+    Счётчики перепланирований: сколько самосвалов прервано и скольким прерывание не потребовалось,
+    а для портфеля солверов - сколько раз победил каждый участник; сколько планов взято из кэша планов
+    """
+    replans: int = 0
+    interrupts: int = 0
+    interrupts_avoided: int = 0
+    plan_cache_hits: int = 0
+    solver_wins: dict[str, int] = field(default_factory=dict)
+
+    def add_solver_win(self, winner: str | None) -> None:
+        if winner is not None:
+            self.solver_wins[winner] = self.solver_wins.get(winner, 0) + 1
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def current_assignment(sim_truck) -> tuple[int, int] | None:
+    """Текущая связка (экскаватор, пункт разгрузки) самосвала"""
+    if sim_truck.shovel is None or sim_truck.unload is None:
+        return None
+    return sim_truck.shovel.id, sim_truck.unload.id
+
+
+def busy_trip(sim_truck) -> tuple[str, int, int] | None:
+    """Начатый рейс самосвала: (стадия, экскаватор, пункт разгрузки)"""
+    stage = BUSY_TRIP_STAGES.get(sim_truck.state)
+    assignment = current_assignment(sim_truck)
+    if stage is None or assignment is None:
+        return None
+    return stage, *assignment
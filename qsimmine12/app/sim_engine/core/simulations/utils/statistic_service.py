@@ -2,7 +2,7 @@ import logging
 import traceback
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from typing import List, Union, Optional, Dict
+from typing import Optional, Dict
 
 from app.sim_engine.core.calculations.trucks_needed import TrucksNeededCalculator
 from app.sim_engine.core.simulations.utils.dependency_resolver import DependencyResolver as DR
@@ -13,21 +13,51 @@ logger = logging.getLogger(__name__)
 
 
 # region Statistics data classes
+@dataclass
+class RunningStatistic:
+    """
+    Накопитель выборки длительностей без хранения самих значений.
+
+    Среднее и дисперсия считаются инкрементально (алгоритм Уэлфорда),
+    поэтому память не растёт с длительностью симуляции.
+    """
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    """Сумма квадратов отклонений от текущего среднего"""
+
+    def append(self, value: int | float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def variance(self) -> Optional[float]:
+        """Дисперсия выборки (с поправкой Бесселя) или None, если значений меньше 2"""
+        if self.count < 2:
+            return None
+        return self.m2 / (self.count - 1)
+
+
 @dataclass
 class UnloadStatistics:
     """Статистические данные по пунктам разгрузки"""
-    unload_durations: List[float | int] = field(default_factory=list)
+    unload_durations: RunningStatistic = field(default_factory=RunningStatistic)
     """Длительности разгрузок"""
-    truck_arrival_waiting_durations: List[float | int] = field(default_factory=list)
+    truck_arrival_waiting_durations: RunningStatistic = field(default_factory=RunningStatistic)
     """Длительности ожидания приезда самосвалов"""
 
 
 @dataclass
 class TruckStatistics:
     """Статистические данные по самосвалам"""
-    moving_loaded_duration: List[float | int] = field(default_factory=list)
+    moving_loaded_duration: RunningStatistic = field(default_factory=RunningStatistic)
     """Длительности движения гружёным"""
-    moving_empty_duration: List[float | int] = field(default_factory=list)
+    moving_empty_duration: RunningStatistic = field(default_factory=RunningStatistic)
     """Длительности движения порожним"""
 
 
@@ -47,9 +77,9 @@ class TotalShovelStatistics:
 @dataclass
 class ShovelStatistics:
     """Статистические данные по экскаваторам"""
-    load_durations: List[float | int] = field(default_factory=list)
+    load_durations: RunningStatistic = field(default_factory=RunningStatistic)
     """Длительности погрузок"""
-    truck_arrival_waiting_durations: List[float | int] = field(default_factory=list)
+    truck_arrival_waiting_durations: RunningStatistic = field(default_factory=RunningStatistic)
     """Длительности ожидания приезда самосвалов"""
     totals: TotalShovelStatistics = field(default_factory=TotalShovelStatistics)
     """Суммируемые статистические данные по экскаваторам"""
@@ -811,10 +841,9 @@ class StatisticService:
         self._truck_manager = TruckStatisticsManager(self.truck_stats, self.state_tracking)
         self._unload_manager = UnloadStatisticsManager(self.unload_stats, self.state_tracking)
 
-    def update_truck_statistics(self, obj_id: int, state: TruckState):
-        """Обновление статистики самосвала"""
-        # duration=1 соответствует одному шагу симуляции
-        self._truck_manager.update(obj_id, state, duration=1)
+    def update_truck_statistics(self, obj_id: int, state: TruckState, duration: int | float = 1):
+        """Обновление статистики самосвала (duration - длительность шага симуляции в секундах)"""
+        self._truck_manager.update(obj_id, state, duration=duration)
 
     def update_shovel_statistics(
             self,
@@ -839,42 +868,35 @@ class StatisticService:
         self._unload_manager.update(obj_id, state, duration, unloading_truck_id, unloading_truck_state)
 
     @staticmethod
-    def _calculate_mean(data_list: List[Union[int, float]]) -> Optional[float]:
+    def _calculate_mean(data: RunningStatistic) -> Optional[float]:
         """
-        Вспомогательный метод для расчета среднего арифметического (mean) значения списка.
+        Вспомогательный метод для получения среднего арифметического (mean) значения выборки.
 
         Args:
-            data_list: Список числовых значений
+            data: Накопитель выборки
 
         Returns:
-            Среднее арифметическое значение или None, если список пуст
+            Среднее арифметическое значение или None, если выборка пуста
         """
-        if not data_list:
+        if not data:
             return None
-        return sum(data_list) / len(data_list)
+        return data.mean
 
-    def _calculate_variance(self, data_list: List[Union[int, float]]) -> Optional[float]:
+    @staticmethod
+    def _calculate_variance(data: RunningStatistic) -> Optional[float]:
         """
-        Вспомогательный метод для расчета дисперсии списка.
+        Вспомогательный метод для получения дисперсии выборки.
 
         Дисперсия вычисляется по формуле для выборки (с поправкой Бесселя):
         variance = Σ(x - mean)² / (n - 1)
 
         Args:
-            data_list: Список числовых значений
+            data: Накопитель выборки
 
         Returns:
-            Дисперсия или None, если в списке меньше 2 элементов
+            Дисперсия или None, если в выборке меньше 2 элементов
         """
-        if len(data_list) < 2:
-            return None
-
-        mean = self._calculate_mean(data_list)
-        if mean is None:
-            return None
-
-        squared_deviations = [(x - mean) ** 2 for x in data_list]
-        return sum(squared_deviations) / (len(data_list) - 1)
+        return data.variance
 
     def calculate_trucks_needed(self, target_shovels_utilization: float = 0.9) -> float | None:
         """Производит расчёт требуемого количество самосвалов для достижения указанной целевой загрузки экскаваторов"""
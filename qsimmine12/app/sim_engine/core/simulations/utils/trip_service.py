@@ -4,7 +4,7 @@ import logging
 from collections import defaultdict
 
 from app.sim_engine.core.props import ActualTrip, ShiftChangeArea, QuarryObject, TripData, IdleArea
-from app.sim_engine.core.simulations.utils.helpers import sim_current_time, sim_start_time
+from app.sim_engine.core.simulations.utils.helpers import sim_current_hour, sim_current_time, sim_start_time
 from app.sim_engine.enums import ObjectType
 
 logger = logging.getLogger(__name__)
@@ -13,7 +13,8 @@ logger = logging.getLogger(__name__)
 class TripService:
     def __init__(self) -> None:
         self.__actual_trips: dict[int, ActualTrip] = {}
-        self.__finished_trips: defaultdict[int, list[ActualTrip]] = defaultdict(list)
+        # Самосвалы, завершившие хотя бы один рейс (сами рейсы не храним - они уходят в trips_table)
+        self.__trucks_with_finished_trips: set[int] = set()
 
         self.total_trips = 0
         self.total_volume = 0
@@ -39,7 +40,7 @@ class TripService:
             logger.debug(f"Trip для {truck_id} уже начат")
             return
 
-        if truck_id in self.__finished_trips:
+        if truck_id in self.__trucks_with_finished_trips:
             object_id = trip_data.unload_id
             object_type = ObjectType.UNLOAD
         else:
@@ -69,6 +70,12 @@ class TripService:
 
         self.trips_table.append(actual_trip.to_telemetry())
 
+    def flush_trips_table(self) -> list[dict]:
+        """Возвращает накопленные с прошлого сброса рейсы и очищает таблицу рейсов"""
+        trips_table = self.trips_table
+        self.trips_table = []
+        return trips_table
+
     def get_summary(self, end_time: datetime.datetime) -> dict:
         start_hour = sim_start_time().hour
         end_hour = end_time.hour
@@ -138,7 +145,7 @@ class TripService:
         actual_trip.end_time = current_time_value
         actual_trip.end_trip_data = trip_data
 
-        self.__finished_trips[truck_id].append(actual_trip)
+        self.__trucks_with_finished_trips.add(truck_id)
         del self.__actual_trips[truck_id]
 
         return actual_trip
@@ -158,7 +165,8 @@ class TripService:
         self.total_volume_round += round_volume
         self.total_weight_round += round_weight
 
-        hour = finished_trip.end_time.hour
+        # рейс завершается в текущий момент симуляции, час берётся из часов окружения
+        hour = sim_current_hour()
         # self.hourly_volume[hour] += volume
         # self.hourly_weight[hour] += weight
 
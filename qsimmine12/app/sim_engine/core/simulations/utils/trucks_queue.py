@@ -0,0 +1,83 @@
+from collections import OrderedDict
+from typing import Iterator, Protocol
+
+
+class QueuedTruck(Protocol):
+    id: int
+    name: str
+
+
+class TrucksQueue:
+    """
+    Очередь самосвалов к объекту (экскаватору, пункту разгрузки, заправке).
+
+    Порядок - порядок постановки в очередь. Постановка, удаление по id самосвала и доступ к первому
+    самосвалу - O(1). Ожидающие самосвалы и имена самосвалов для телеметрии кэшируются и пересчитываются
+    только после изменения очереди
+    """
+
+    def __init__(self) -> None:
+        self._trucks: OrderedDict[int, QueuedTruck] = OrderedDict()
+        self._tail_cache: dict[int, tuple[QueuedTruck, ...]] = {}
+        self._names_cache: dict[int, tuple[tuple[str, ...], tuple[str, ...]]] = {}
+
+    def _changed(self) -> None:
+        self._tail_cache.clear()
+        self._names_cache.clear()
+
+    def append(self, truck: QueuedTruck) -> None:
+        """
+        Ставит самосвал в конец очереди. Самосвал, уже стоящий в очереди, переставляется в конец,
+        как если бы он покинул очередь и встал в неё заново
+        """
+        self._trucks[truck.id] = truck
+        self._trucks.move_to_end(truck.id)
+        self._changed()
+
+    def remove(self, truck: QueuedTruck) -> None:
+        """Удаляет самосвал из очереди, как list.remove - ValueError, если самосвала в очереди нет"""
+        if self._trucks.pop(truck.id, None) is None:
+            raise ValueError(f"Самосвал {truck.id} не стоит в очереди")
+        self._changed()
+
+    @property
+    def head(self) -> QueuedTruck | None:
+        """Первый самосвал в очереди (обслуживаемый)"""
+        if not self._trucks:
+            return None
+        return next(iter(self._trucks.values()))
+
+    def tail(self, served: int) -> tuple[QueuedTruck, ...]:
+        """Самосвалы, ожидающие обслуживания, если одновременно обслуживаются served самосвалов"""
+        if len(self._trucks) <= served:
+            return ()
+        tail = self._tail_cache.get(served)
+        if tail is None:
+            tail = tuple(self._trucks.values())[served:]
+            self._tail_cache[served] = tail
+        return tail
+
+    def split_names(self, served: int) -> tuple[tuple[str, ...], tuple[str, ...]]:
+        """Имена обслуживаемых и ожидающих самосвалов"""
+        names = self._names_cache.get(served)
+        if names is None:
+            all_names = tuple(truck.name for truck in self._trucks.values())
+            names = (all_names[:served], all_names[served:])
+            self._names_cache[served] = names
+        return names
+
+    @property
+    def ids(self) -> list[int]:
+        return list(self._trucks)
+
+    def __contains__(self, truck: QueuedTruck) -> bool:
+        return truck.id in self._trucks
+
+    def __iter__(self) -> Iterator[QueuedTruck]:
+        return iter(self._trucks.values())
+
+    def __len__(self) -> int:
+        return len(self._trucks)
+
+    def __bool__(self) -> bool:
+        return bool(self._trucks)
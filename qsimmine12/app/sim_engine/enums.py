@@ -47,6 +47,10 @@ class SolverType(enum.Enum):
     CBC = (2, 'CBC')
     HIGHS = (3, 'HIGHS')
     CP = (4, 'CP')
+    # Временная MILP постановка (HiGHS, без него - CBC), см. TimeIndexedSolver
+    TIME_INDEXED = (5, 'TIME_INDEXED')
+    # Гонка CP, HIGHS и жадного расписания в отдельных процессах, см. PortfolioSolver
+    PORTFOLIO = (6, 'PORTFOLIO')
 
     def __str__(self):
         return self.key()
@@ -0,0 +1,179 @@
+"""
+Быстрая оценка результатов сценария без имитационного прогона.
+
+Парк самосвалов рассматривается как замкнутая сеть массового обслуживания: самосвалы по кругу проходят
+экскаваторы и пункты разгрузки, между ними - движение без очередей. Времена берутся из матрицы планирования,
+сеть решается методом анализа средних значений (MVA, см. TrucksNeededCalculator.mean_value_analysis).
+"""
+import logging
+import math
+from collections import defaultdict
+from datetime import timedelta
+from statistics import mean
+
+from app.sim_engine.core.calculations.shovel import ShovelCalc
+from app.sim_engine.core.calculations.trucks_needed import TrucksNeededCalculator
+from app.sim_engine.core.planner.entities import InputPlanningData
+from app.sim_engine.core.planner.planning_matrix import get_planning_data, matrix_workers
+from app.sim_engine.core.props import SimData
+from app.sim_engine.enums import ObjectType
+from app.sim_engine.writer import IWriter
+
+logger = logging.getLogger(__name__)
+
+# Матрица планирования хранит целые минуты с отброшенной дробной частью, в среднем это занижение на полминуты
+MATRIX_ROUNDING_BIAS_MIN = 0.5
+
+ESTIMATE_METHODS = ("exact", "approximate")
+
+
+def _route_shares(sim_data: SimData, planning_data: InputPlanningData) -> dict[tuple[int, int], float]:
+    """
+    Доли рейсов по парам (экскаватор, пункт разгрузки).
+
+    Ручные маршруты - пропорционально закреплённым самосвалам. Иначе каждый экскаватор работает на ближайший
+    пункт разгрузки, а рейсы распределяются пропорционально производительности экскаваторов (так их загрузка
+    выравнивается, как при распределении планировщиком)
+    """
+    routes = [route for route in sim_data.routes if route.truck_ids]
+    if routes:
+        trucks_by_pair = defaultdict(int)
+        for route in routes:
+            trucks_by_pair[route.shovel_id, route.unload_id] += len(route.truck_ids)
+        total = sum(trucks_by_pair.values())
+        return {pair: trucks / total for pair, trucks in trucks_by_pair.items()}
+
+    I, J, Z = planning_data.truck_ids, planning_data.shovel_ids, planning_data.unload_ids
+    if not J or not Z:
+        return {}
+
+    rates = {j: 1 / (mean(planning_data.T_load[i, j] for i in I) + MATRIX_ROUNDING_BIAS_MIN) for j in J}
+    total_rate = sum(rates.values())
+
+    shares = {}
+    for j in J:
+        z = min(Z, key=lambda z_: mean(planning_data.T_haul[i, j, z_] for i in I))
+        shares[j, z] = rates[j] / total_rate
+    return shares
+
+
+def _hourly_chart(sim_data: SimData, begin_offset: float, end_offset: float, total: float) -> list[dict]:
+    """Равномерно распределяет величину по часам активного интервала (в формате графиков сводки)"""
+    active = end_offset - begin_offset
+    if active <= 0 or total <= 0:
+        return []
+
+    chart = defaultdict(float)
+    cursor = begin_offset
+    while cursor < end_offset:
+        moment = sim_data.start_time + timedelta(seconds=cursor)
+        hour_end = (moment.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1) - sim_data.start_time)
+        step_end = min(end_offset, hour_end.total_seconds())
+        chart[moment.hour] += total * (step_end - cursor) / active
+        cursor = step_end
+
+    return [{'time': f"{hour}:00", 'value': int(value)} for hour, value in chart.items() if int(value)]
+
+
+def run_estimation(sim_data: SimData, writer: IWriter, sim_conf: dict) -> dict:
+    """
+    Оценивает рейсы, массу и загрузку экскаваторов за доли секунды.
+    Результат имеет ту же структуру, что и у симуляции (telemetry и events пустые),
+    подробности оценки - в result["meta"]["estimate"]
+    """
+    method = sim_conf.get("estimate_method", "exact")
+    if method not in ESTIMATE_METHODS:
+        raise ValueError(f"Неизвестный метод оценки: {method}. Допустимые: {ESTIMATE_METHODS}")
+
+    planning_data = get_planning_data(sim_data, workers=matrix_workers(sim_conf))
+    I = planning_data.truck_ids
+    shares = _route_shares(sim_data, planning_data)
+
+    # Требования к станциям за один рейс (мин) и время движения
+    demands: dict[tuple[ObjectType, int], float] = defaultdict(float)
+    servers: dict[tuple[ObjectType, int], int] = {}
+    think_time = TrucksNeededCalculator.T_rot / 60
+    weight_per_trip = 0.0
+    volume_per_trip = 0.0
+
+    for (j, z), share in shares.items():
+        shovel_key = (ObjectType.SHOVEL, j)
+        unload_key = (ObjectType.UNLOAD, z)
+        servers[shovel_key] = 1
+        servers[unload_key] = sim_data.unloads[z].properties.trucks_at_once
+
+        demands[shovel_key] += share * (mean(planning_data.T_load[i, j] for i in I) + MATRIX_ROUNDING_BIAS_MIN)
+        demands[unload_key] += share * (mean(planning_data.T_unload[i, z] for i in I) + MATRIX_ROUNDING_BIAS_MIN)
+        think_time += share * (
+            mean(planning_data.T_haul[i, j, z] + planning_data.T_return[i, z, j] for i in I)
+            + 2 * MATRIX_ROUNDING_BIAS_MIN
+        )
+
+        weight_per_trip += share * mean(planning_data.m_tons[i, j] for i in I)
+        volume_per_trip += share * mean(
+            ShovelCalc.calculate_load_cycles(sim_data.shovels[j].properties, truck.properties)[2]
+            for truck in sim_data.trucks.values()
+        )
+
+    network = TrucksNeededCalculator.mean_value_analysis(
+        demands=demands,
+        servers=servers,
+        think_time=think_time,
+        population=len(I),
+        exact=method == "exact",
+    )
+
+    # Рабочее время: без подъезда к первому экскаватору, возврата на пересменку и обедов (мин)
+    begin_offset_min = mean(planning_data.T_start.values()) if planning_data.T_start else 0
+    end_offset_min = mean(planning_data.T_end.values()) if planning_data.T_end else 0
+    lunches_min = 0
+    if sim_conf.get("lunch"):
+        lunches_min = sum((lunch_end - lunch_start).total_seconds() for lunch_start, lunch_end in sim_data.lunch_times) / 60
+    work_min = max(0.0, planning_data.D_work - begin_offset_min - end_offset_min - lunches_min)
+
+    trips = network["throughput"] * work_min
+    weight = trips * weight_per_trip
+    volume = trips * volume_per_trip
+
+    shovel_keys = [key for key in demands if key[0] == ObjectType.SHOVEL]
+    trucks_needed = TrucksNeededCalculator.trucks_needed_by_mva(
+        demands=demands,
+        servers=servers,
+        think_time=think_time,
+        target_keys=shovel_keys,
+        target_utilization=sim_data.target_shovel_load,
+        max_population=max(10 * len(I), 100),
+    )
+
+    begin_offset = begin_offset_min * 60
+    end_offset = sim_data.duration - end_offset_min * 60
+    summary = {
+        'trips': int(trips),
+        'volume': math.floor(volume),
+        'weight': math.floor(weight),
+        'chart_volume_data': _hourly_chart(sim_data, begin_offset, end_offset, weight),
+        'chart_trip_data': _hourly_chart(sim_data, begin_offset, end_offset, trips),
+        'trucks_count': len(I),
+        'shovels_count': len(shovel_keys),
+        'trips_table': [],
+        'trucks_needed': trucks_needed,
+    }
+
+    estimate = {
+        'method': method,
+        'trips_per_hour': round(network["throughput"] * 60, 2),
+        'cycle_time_min': round(network["cycle_time"], 2),
+        'work_time_min': round(work_min, 1),
+        'shovels_utilization': {
+            key[1]: round(value, 3) for key, value in network["utilization"].items() if key[0] == ObjectType.SHOVEL
+        },
+        'unloads_utilization': {
+            key[1]: round(value, 3) for key, value in network["utilization"].items() if key[0] == ObjectType.UNLOAD
+        },
+    }
+    logger.info('simulation estimate', estimate)
+
+    writer.update_data("meta", estimate=estimate)
+    result = writer.finalize()
+    result["summary"] = summary
+    return result
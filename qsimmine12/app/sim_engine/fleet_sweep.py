@@ -0,0 +1,193 @@
+"""
+Перебор размера парка самосвалов: кривая добычи от количества самосвалов по результатам симуляций.
+"""
+import logging
+import multiprocessing
+import random
+from copy import deepcopy
+from typing import Iterable
+
+from app.sim_engine.writer import DictReliabilityWriter
+
+logger = logging.getLogger(__name__)
+
+
+def make_fleet_raw_data(raw_data: dict, trucks_number: int) -> dict:
+    """
+    Формирует входные данные с заданным количеством самосвалов.
+
+    Самосвалы берутся из truck_list по порядку; недостающие дополняются копиями самосвалов из truck_list
+    по кругу (с новыми id), копия закрепляется за теми же маршрутами, что и исходный самосвал
+    """
+    templates = raw_data["quarry"].get("truck_list", [])
+    if not templates:
+        raise ValueError("В truck_list нет самосвалов для формирования парка")
+
+    data = deepcopy(raw_data)
+    quarry = data["quarry"]
+    next_id = max(truck["id"] for truck in templates) + 1
+
+    truck_list = []
+    clones_of: dict[int, list[int]] = {}
+    for idx in range(trucks_number):
+        template = templates[idx % len(templates)]
+        if idx < len(templates):
+            truck_list.append(deepcopy(template))
+            continue
+
+        copy_number = idx // len(templates)
+        clone = deepcopy(template)
+        clone["id"] = next_id
+        clone["name"] = f"{template['name']} ({copy_number + 1})"
+        truck_list.append(clone)
+        clones_of.setdefault(template["id"], []).append(next_id)
+        next_id += 1
+
+    quarry["truck_list"] = truck_list
+
+    truck_ids = {truck["id"] for truck in truck_list}
+    for trail in quarry.get("trail_list", []):
+        trucks = [truck_id for truck_id in trail.get("trucks", []) if truck_id in truck_ids]
+        for truck_id in trail.get("trucks", []):
+            trucks.extend(clones_of.get(truck_id, []))
+        trail["trucks"] = trucks
+
+    return data
+
+
+def run_fleet_point(raw_data: dict, options: dict, trucks_number: int) -> dict:
+    """Прогон одной точки перебора (функция верхнего уровня - должна сериализоваться для пула процессов)"""
+    # импорт здесь, чтобы избежать циклического импорта с simulation_manager
+    from app.sim_engine.simulation_manager import SimulationManager
+
+    result = SimulationManager(
+        raw_data=make_fleet_raw_data(raw_data, trucks_number),
+        options=options,
+        writer=DictReliabilityWriter,
+    ).run()
+
+    summary = result["summary"]
+    summary.pop("trips_table", None)
+    return {
+        "trucks": trucks_number,
+        "seed": result.get("meta", {}).get("seed"),
+        **summary,
+    }
+
+
+class FleetSweep:
+    """
+    Прогоняет сценарий для ряда размеров парка и строит кривую добычи от количества самосвалов.
+
+    Точки считаются пакетами по processes штук в пуле процессов по возрастанию размера парка.
+    Перебор останавливается, когда прирост метрики на каждый добавленный самосвал падает ниже min_marginal_gain.
+    Все точки считаются с одним зерном (seed из raw_data или случайным): потоки случайных чисел объектов выводятся
+    из него (см. random_streams), поэтому самосвал получает те же поломки при любом размере парка, и прирост
+    отражает размер парка, а не разброс между прогонами.
+    С расчётом достоверного результата точки считаются последовательно: пул процессов занят прогонами
+    Reliability внутри точки (процессы пула не могут порождать свои пулы)
+    """
+
+    def __init__(
+            self,
+            raw_data: dict,
+            options: dict,
+            trucks_numbers: Iterable[int],
+            min_marginal_gain: float | None = None,
+            metric: str = "weight",
+            reliability: bool = False,
+            processes_number: int | None = None,
+    ) -> None:
+        self.seed = raw_data.get("seed")
+        if self.seed is None:
+            self.seed = random.getrandbits(128)
+        self.raw_data = {**raw_data, "seed": self.seed}
+        self.trucks_numbers = sorted(set(int(n) for n in trucks_numbers if int(n) > 0))
+        if not self.trucks_numbers:
+            raise ValueError("Не задано ни одного размера парка для перебора")
+
+        self.min_marginal_gain = min_marginal_gain
+        self.metric = metric
+        self.reliability = reliability
+        self.options = {
+            **options,
+            "reliability_calc_enabled": reliability,
+        }
+
+        if processes_number is None:
+            self.processes = max(1, int(multiprocessing.cpu_count() / 2))
+        else:
+            self.processes = processes_number
+
+    def _metric(self, point: dict) -> float:
+        if self.reliability and f"{self.metric}_reliable" in point:
+            return point[f"{self.metric}_reliable"]
+        return point[self.metric]
+
+    def _run_batches(self):
+        """Отдаёт результаты точек пакетами по возрастанию размера парка"""
+        if self.reliability or self.processes == 1:
+            for trucks_number in self.trucks_numbers:
+                yield [run_fleet_point(self.raw_data, self.options, trucks_number)]
+            return
+
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(processes=self.processes) as pool:
+            for start in range(0, len(self.trucks_numbers), self.processes):
+                batch = self.trucks_numbers[start:start + self.processes]
+                yield pool.starmap(run_fleet_point, [(self.raw_data, self.options, n) for n in batch])
+
+    def run(self) -> dict:
+        logger.info('run_fleet_sweep', {
+            'trucks_numbers': f"{self.trucks_numbers}",
+            'metric': f"{self.metric}",
+            'min_marginal_gain': f"{self.min_marginal_gain}",
+            'seed': f"{self.seed}",
+            'reliability': f"{self.reliability}",
+            'proc': f"{self.processes}",
+        })
+
+        table: list[dict] = []
+        stopped_early = False
+
+        for batch in self._run_batches():
+            for point in batch:
+                if table:
+                    prev = table[-1]
+                    point["marginal_gain"] = (
+                            (self._metric(point) - self._metric(prev)) / (point["trucks"] - prev["trucks"])
+                    )
+                else:
+                    point["marginal_gain"] = None
+                table.append(point)
+
+                if (
+                        self.min_marginal_gain is not None
+                        and point["marginal_gain"] is not None
+                        and point["marginal_gain"] < self.min_marginal_gain
+                ):
+                    stopped_early = True
+
+            logger.info(f"Fleet sweep: {len(table)} of {len(self.trucks_numbers)} points done")
+            if stopped_early:
+                break
+
+        # Рекомендуемый парк - последняя точка, где прирост на самосвал был не ниже порога,
+        # без порога - точка с максимальной добычей
+        if self.min_marginal_gain is None:
+            recommended = max(table, key=self._metric)
+        else:
+            recommended = table[0]
+            for point in table[1:]:
+                if point["marginal_gain"] < self.min_marginal_gain:
+                    break
+                recommended = point
+
+        return {
+            "table": table,
+            "chart_data": [{"trucks": point["trucks"], "value": self._metric(point)} for point in table],
+            "metric": self.metric,
+            "recommended_trucks": recommended["trucks"],
+            "stopped_early": stopped_early,
+            "seed": self.seed,
+        }
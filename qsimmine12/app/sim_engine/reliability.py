@@ -7,6 +7,7 @@ from scipy import stats
 __all__ = (
     "assess_stability",
     "calc_reliability",
+    "extract_metric",
     "find_closest_result",
 )
 
@@ -63,6 +63,30 @@ def calculate_lunch_breaks(
     return lunch_breaks
 
 
+def calculate_shift_starts(
+        start_time: datetime,
+        end_time: datetime,
+        shift_config: list[dict],
+) -> list[datetime]:
+    """
+    Расчитывает начала смен, попадающие строго внутрь заданного временного интервала
+    """
+    shift_starts = set()
+
+    current_day = start_time.replace(hour=0, minute=0, second=0, microsecond=0)
+    analysis_end_day = end_time.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    while current_day <= analysis_end_day:
+        for shift in shift_config:
+            shift_start = current_day + timedelta(minutes=shift["begin_offset"])
+            if start_time < shift_start < end_time:
+                shift_starts.add(shift_start)
+
+        current_day += timedelta(days=1)
+
+    return sorted(shift_starts)
+
+
 def collect_planned_idles(idles_data: list[dict]):
     """
         Организует список плановых простоев в словарь,
@@ -311,6 +335,13 @@ class SimDataSerializer:
                 lunch_break_duration=data["quarry"].get("lunch_break_duration"),
             )
 
+        # --- смены ---
+        shift_starts = calculate_shift_starts(
+            start_time=start_time,
+            end_time=end_time,
+            shift_config=data["quarry"].get("shift_config", []),
+        )
+
         # --- плановые простои ---
         planned_idles = {}
         idles_data = data["quarry"].get("schedules", {}).get('planned_idle')
@@ -343,6 +374,7 @@ class SimDataSerializer:
             road_net=road_net,
             idle_areas=idle_areas_storage,
             lunch_times=lunch_times,
+            shift_starts=shift_starts,
             planned_idles=planned_idles,
             blasting_list=blasting_list,
 
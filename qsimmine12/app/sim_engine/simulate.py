@@ -1,7 +1,15 @@
 import functools
 import logging
+import math
 import multiprocessing
+import os
+import random
+import tempfile
+import traceback
 from abc import ABC, abstractmethod
+from copy import copy
+from dataclasses import dataclass
+from datetime import datetime, timedelta
 from typing import Callable
 
 from app.sim_engine.core.environment import QSimEnvironment
@@ -12,9 +20,12 @@ from app.sim_engine.core.simulations.quarry import Quarry
 from app.sim_engine.core.simulations.shovel import Shovel
 from app.sim_engine.core.simulations.truck import Truck
 from app.sim_engine.core.simulations.unload import Unload
+from app.sim_engine.core.simulations.utils.random_streams import derive_stream_seed
+from app.sim_engine.core.simulations.utils.service_locator import ServiceLocator
 from app.sim_engine.enums import ObjectType
-from app.sim_engine.reliability import assess_stability, calc_reliability, find_closest_result
-from app.sim_engine.writer import IWriter, DictReliabilityWriter
+from app.sim_engine.events import EventType
+from app.sim_engine.reliability import assess_stability, calc_reliability, extract_metric, find_closest_result
+from app.sim_engine.writer import IWriter, DictReliabilityWriter, IShiftSink, JsonLinesShiftSink
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +48,40 @@ def sim_data_validate(func):
     return wrapper
 
 
+class SimulationForkError(Exception):
+    pass
+
+
+@dataclass
+class SimulationCheckpoint:
+    """
+    Метка контрольной точки: момент симуляции и итоги к этому моменту.
+
+    Восстановить симуляцию из метки нельзя - генераторы simpy не сериализуются. Ветки (fork) продолжаются
+    только от текущего состояния живой симуляции, метка нужна, чтобы сравнить итоги веток с моментом ветвления
+    """
+    sim_time: int
+    timestamp: float
+    seed: int
+    trips: int
+    weight: float
+
+
+@dataclass
+class SimulationVariant:
+    """
+    Вариант продолжения симуляции от контрольной точки ("что если ...").
+
+    name - уникальное имя ветки, по нему возвращается результат
+    modifier - функция, изменяющая входные данные ветки, вызывается с экземпляром симуляции
+    seed - если задан, ветка продолжает работу с новым зерном генератора случайных чисел,
+           иначе все ветки используют общее состояние генератора из контрольной точки
+    """
+    name: str
+    modifier: Callable[["AbstractSimulation"], None] | None = None
+    seed: int | None = None
+
+
 class AbstractSimulation(ABC):
     def __init__(self, sim_data: SimData, writer: IWriter, sim_conf: dict) -> None:
         self._sim_data = sim_data
@@ -46,12 +91,61 @@ class AbstractSimulation(ABC):
         self._sim_shovels_map: dict[int, Shovel] = {}
         self._sim_unloads_map: dict[int, Unload] = {}
         self._sim_fuel_stations: list[FuelStation] = []
+        self._sim_truck_map: dict[int, Truck] = {}
 
         self._shift_change_area: IdleArea | None = None
         self._env: QSimEnvironment | None = None
         self._quarry: Quarry | None = None
 
+    @property
+    def env(self) -> QSimEnvironment | None:
+        return self._env
+
+    @property
+    def quarry(self) -> Quarry | None:
+        return self._quarry
+
     def run(self) -> dict:
+        try:
+            return self._run()
+        finally:
+            self._release_profiler()
+
+    def _run(self) -> dict:
+        if self._sim_conf.get("horizon"):
+            sink_path = self._sim_conf.get("horizon_sink_path")
+            if sink_path is None:
+                fd, sink_path = tempfile.mkstemp(prefix="sim_horizon_", suffix=".jsonl")
+                os.close(fd)
+
+            sink = JsonLinesShiftSink(sink_path)
+            try:
+                result = self.run_horizon(sink)
+            finally:
+                sink.close()
+
+            result["meta"]["horizon"]["sink_path"] = sink_path
+            return result
+
+        self._prepare()
+        self._run_to(self._sim_data.duration)
+        return self._finalize()
+
+    def _release_profiler(self) -> None:
+        """
+        Отвязывает профилировщик завершённого прогона, чтобы поиск маршрутов и планирование вне симуляции
+        (до создания окружения следующего прогона) не учитывались в его профиле
+        """
+        if self._env is None or self._env.profiler is None:
+            return
+        if ServiceLocator.get('profiler') is self._env.profiler:
+            ServiceLocator.unbind('profiler')
+
+    def _prepare(self) -> None:
+        """Создаёт окружение и объекты симуляции, если они ещё не созданы"""
+        if self._env is not None:
+            return
+
         self._env = QSimEnvironment(
             sim_data=self._sim_data,
             writer=self._writer,
@@ -63,17 +157,240 @@ class AbstractSimulation(ABC):
         self._quarry.prepare_seeded_random()
 
         self._writer.update_data("meta", seed=self._quarry.sim_data.seed)
+        if self._sim_data.antithetic:
+            self._writer.update_data("meta", antithetic=True)
 
         self._handle_simulation_setup()
 
-        self._env.run(until=self._sim_data.duration)
+    def _run_to(self, sim_time: int) -> None:
+        # simpy не позволяет запускать окружение до текущего момента времени
+        if sim_time > self._env.now:
+            self._env.run(until=sim_time)
 
+    def _finalize(self) -> dict:
         logger.info("[done] Симуляция завершена")
         result = self._writer.finalize()
         result["summary"] = self._quarry.get_summary(self._sim_data.end_time)
+        result["meta"]["replanning"] = self._env.replanning_stats.to_dict()
+
+        if self._env.profiler is not None:
+            profile = self._env.profiler.to_dict()
+            result["meta"]["profile"] = profile
+            logger.info('simulation profile', profile)
+
+        return result
+
+    # region Long horizon
+
+    def _shift_bounds(self) -> list[int]:
+        """
+        Границы участков прогона в секундах симуляции: начала смен, а без настроек смен - сутки от старта
+        """
+        duration = self._sim_data.duration
+        start_time = self._sim_data.start_time
+
+        if self._sim_data.shift_starts:
+            bounds = [int((shift_start - start_time).total_seconds()) for shift_start in self._sim_data.shift_starts]
+        else:
+            day = int(timedelta(days=1).total_seconds())
+            bounds = list(range(day, duration, day))
+
+        return [bound for bound in bounds if 0 < bound < duration] + [duration]
 
+    def run_horizon(self, sink: IShiftSink) -> dict:
+        """
+        Проводит симуляцию посменно. По окончании каждой смены её сводка, рейсы, телеметрия и события
+        передаются в sink и освобождаются, в памяти остаются только накопительные показатели.
+
+        Возвращает итоговый результат с общей сводкой (без телеметрии и таблицы рейсов)
+        """
+        self._prepare()
+        trip_service = self._quarry.trip_service
+
+        shift_begin = int(self._env.now)
+        shifts_count = 0
+        for shift_end in self._shift_bounds():
+            if shift_end <= shift_begin:
+                continue
+
+            totals_before = (trip_service.total_trips, trip_service.total_volume_round,
+                             trip_service.total_weight_round)
+            self._run_to(shift_end)
+
+            sink.write_shift({
+                "index": shifts_count,
+                "start_time": (self._sim_data.start_time + timedelta(seconds=shift_begin)).isoformat(),
+                "end_time": (self._sim_data.start_time + timedelta(seconds=shift_end)).isoformat(),
+                "summary": {
+                    "trips": trip_service.total_trips - totals_before[0],
+                    "volume": math.floor(trip_service.total_volume_round - totals_before[1]),
+                    "weight": math.floor(trip_service.total_weight_round - totals_before[2]),
+                    "trips_table": trip_service.flush_trips_table(),
+                },
+                **self._writer.flush(),
+            })
+            logger.info('horizon shift flushed', {'index': shifts_count, 'sim_time': shift_end})
+
+            shift_begin = shift_end
+            shifts_count += 1
+
+        result = self._finalize()
+        result["meta"]["horizon"] = {"shifts": shifts_count}
         return result
 
+    # endregion
+
+    # region Checkpoint/fork
+
+    def run_until(self, moment: int | datetime) -> SimulationCheckpoint:
+        """
+        Проводит симуляцию до указанного момента и возвращает контрольную точку.
+
+        moment - секунды от начала симуляции или абсолютное время
+        """
+        self._prepare()
+
+        if isinstance(moment, datetime):
+            sim_time = int((moment - self._sim_data.start_time).total_seconds())
+        else:
+            sim_time = int(moment)
+
+        if not self._env.now <= sim_time <= self._sim_data.duration:
+            raise ValueError(
+                f"Контрольная точка {sim_time} вне диапазона [{self._env.now}, {self._sim_data.duration}]"
+            )
+
+        self._run_to(sim_time)
+        return self.checkpoint()
+
+    def checkpoint(self) -> SimulationCheckpoint:
+        """Метка текущего момента симуляции (см. SimulationCheckpoint)"""
+        if self._env is None:
+            raise SimulationForkError("Симуляция ещё не запущена, используйте run_until")
+
+        quarry = self._quarry
+        return SimulationCheckpoint(
+            sim_time=int(self._env.now),
+            timestamp=quarry.current_timestamp,
+            seed=quarry.sim_data.seed,
+            trips=quarry.trip_service.total_trips,
+            weight=quarry.trip_service.total_weight_round,
+        )
+
+    def fork(self, variants: list[SimulationVariant], processes_number: int | None = None) -> dict[str, dict]:
+        """
+        Запускает продолжения симуляции от текущего момента по каждому варианту в отдельных процессах.
+        Ветвление возможно только от текущего состояния: контрольная точка симуляцию не восстанавливает.
+
+        Генераторы simpy не сериализуются, поэтому ветки порождаются через fork процесса:
+        дочерний процесс получает копию всего состояния симуляции без повторного прогона начала смены.
+        Возвращает результаты симуляции по именам вариантов.
+        """
+        if self._env is None:
+            raise SimulationForkError("Симуляция ещё не запущена, используйте run_until")
+        if "fork" not in multiprocessing.get_all_start_methods():
+            raise SimulationForkError("Ветвление симуляции требует поддержки fork на уровне ОС")
+
+        names = [variant.name for variant in variants]
+        if len(set(names)) != len(names):
+            raise SimulationForkError(f"Имена вариантов должны быть уникальны: {names}")
+
+        processes = processes_number or max(1, int(multiprocessing.cpu_count() / 2))
+
+        logger.info('fork simulation', {
+            'sim_time': f"{self._env.now}",
+            'variants': f"{len(variants)}",
+            'proc': f"{processes}",
+        })
+
+        ctx = multiprocessing.get_context("fork")
+        results: dict[str, dict] = {}
+
+        # Ограничиваем число одновременно работающих веток числом процессов
+        for offset in range(0, len(variants), processes):
+            running = []
+            for variant in variants[offset:offset + processes]:
+                reader, sender = ctx.Pipe(duplex=False)
+                process = ctx.Process(target=self._run_variant, args=(variant, sender))
+                process.start()
+                sender.close()
+                running.append((variant, process, reader))
+
+            for variant, process, reader in running:
+                # Результат забираем до join, иначе большой результат заблокирует запись в канал
+                try:
+                    status, payload = reader.recv()
+                except EOFError:
+                    status, payload = "error", "Процесс ветки завершился без результата"
+                process.join()
+
+                if status == "error":
+                    logger.error('fork variant failed', {
+                        'variant': variant.name,
+                        'traceback': payload,
+                    })
+                    raise SimulationForkError(f"Ошибка в ветке {variant.name}")
+
+                results[variant.name] = payload
+
+        return results
+
+    def _run_variant(self, variant: SimulationVariant, sender) -> None:
+        """Продолжение симуляции в дочернем процессе"""
+        try:
+            if variant.seed is not None:
+                self._quarry.reseed_random(variant.seed)
+                self._writer.update_data("meta", seed=variant.seed)
+            if variant.modifier is not None:
+                variant.modifier(self)
+
+            self._run_to(self._sim_data.duration)
+
+            result = self._finalize()
+            result["meta"]["variant"] = variant.name
+            sender.send(("ok", result))
+        except Exception:
+            sender.send(("error", traceback.format_exc()))
+        finally:
+            sender.close()
+
+    def schedule_breakdown(
+            self,
+            object_type: ObjectType,
+            object_id: int,
+            start: int | datetime,
+            duration: int,
+    ) -> None:
+        """
+        Планирует поломку объекта для ветки "что если".
+
+        start - секунды от начала симуляции или абсолютное время начала поломки
+        duration - длительность ремонта в секундах
+        """
+        objects_map = {
+            ObjectType.TRUCK: self._sim_truck_map,
+            ObjectType.SHOVEL: self._sim_shovels_map,
+            ObjectType.UNLOAD: self._sim_unloads_map,
+        }
+        if object_type not in objects_map or object_id not in objects_map[object_type]:
+            raise SimulationForkError(f"Объект {object_type.key()} {object_id} не найден в симуляции")
+
+        if isinstance(start, datetime):
+            start = int((start - self._sim_data.start_time).total_seconds())
+
+        target = objects_map[object_type][object_id]
+        self._env.process(self._forced_breakdown(target, max(0, start - int(self._env.now)), duration))
+
+    def _forced_breakdown(self, target, delay: int, duration: int):
+        yield self._env.timeout(delay)
+        target.broken = True
+        target.push_event(event_type=EventType.BREAKDOWN_BEGIN)
+        yield self._env.timeout(duration)
+        target.broken = False
+        target.push_event(event_type=EventType.BREAKDOWN_END)
+
+    # endregion
+
     @abstractmethod
     def _handle_simulation_setup(self) -> None:
         raise NotImplementedError
@@ -186,7 +503,7 @@ class Simulation(AbstractSimulation):
             if truck.id not in self._truck_route_map:
                 continue
             route, route_edge, shift_start_route, shovel_sim, unl_sim = self._truck_route_map[truck.id]
-            Truck(
+            self._sim_truck_map[truck.id] = Truck(
                 unit_id=truck.id,
                 name=truck.name,
                 initial_position=Point(truck.initial_lat, truck.initial_lon),
@@ -212,7 +529,6 @@ class PlannedTripsSimulation(AbstractSimulation):
     ) -> None:
         super().__init__(sim_data, writer, sim_conf)
         self._planned_trips = planned_trips
-        self._sim_truck_map: dict[int, Truck] = {}
 
     def _handle_simulation_setup(self) -> None:
         """
@@ -257,6 +573,8 @@ class PlannedTripsSimulation(AbstractSimulation):
 
 
 class Reliability:
+    VARIANCE_REDUCTION_MODES = (None, "crn", "antithetic")
+
     def __init__(
             self,
             simulation_closure: Callable,
@@ -274,6 +592,8 @@ class Reliability:
             consecutive: int = 2,
             boot_b: int = 5000,
             planned_trips: dict | None = None,
+            variance_reduction: str | None = None,
+            base_seed: int | None = None,
     ) -> None:
         self.simulation_closure = simulation_closure
         self.sim_data = sim_data
@@ -291,6 +611,13 @@ class Reliability:
         self.boot_b = boot_b
         self.planned_trips = planned_trips
 
+        # Снижение дисперсии: crn - общие случайные числа (зерна прогонов выводятся из base_seed,
+        # одна и та же серия зерен для всех сценариев), antithetic - пары прогонов U / 1 - U
+        if variance_reduction not in self.VARIANCE_REDUCTION_MODES:
+            raise ValueError(f"Неизвестный способ снижения дисперсии: {variance_reduction}")
+        self.variance_reduction = variance_reduction
+        self.base_seed = base_seed
+
         if processes_number is None:
             self.processes = int(multiprocessing.cpu_count() / 2)
         else:
@@ -302,8 +629,13 @@ class Reliability:
 
         `run_func` needs to be **picklable** (multiprocessing limitations)
         """
+        if self.variance_reduction and self.base_seed is None:
+            self.base_seed = random.getrandbits(64)
+
         logger.info('run_reliability', {
             'simulation_closure': f"{self.simulation_closure.__name__}",
+            'variance_reduction': f"{self.variance_reduction}",
+            'base_seed': f"{self.base_seed}",
             'metric': f"{self.metric}",
             'proc': f"{self.processes}",
             'init': f"{self.init_runs_number}",
@@ -326,15 +658,15 @@ class Reliability:
         ctx = multiprocessing.get_context("spawn")
         with ctx.Pool(processes=self.processes) as pool:
             while go_for_more:
-                starmap_args_list = [self._make_closure_args() for _ in range(next_runs_number)]
-                logger.info(f"Run {next_runs_number} simulations on {self.processes} processes")
+                starmap_args_list = self._make_runs_args(next_runs_number, runs_done=len(all_results))
+                logger.info(f"Run {len(starmap_args_list)} simulations on {self.processes} processes")
 
                 attempt_results = pool.starmap(self.simulation_closure, starmap_args_list)
                 logger.info("Finished executing simulations")
                 all_results.extend(attempt_results)
 
-                is_stable, metric_array, metric_median, stable_streak = assess_stability(
-                    all_results,
+                is_stable, _, metric_median, stable_streak = assess_stability(
+                    self._stability_samples(all_results),
                     metric=self.metric,
                     prev_metric_median=prev_metric_median,
                     cur_stable_streak=cur_stable_streak,
@@ -354,6 +686,7 @@ class Reliability:
                     cur_stable_streak = stable_streak
 
         logger.info("Calc reliable metric")
+        metric_array = extract_metric(all_results, self.metric)
         metric_reliable, metric_best_min, metric_best_max = calc_reliability(
             metric_array, alpha=self.alpha, boot_b=self.boot_b
         )
@@ -361,11 +694,13 @@ class Reliability:
         logger.info("Find result closest to reliable metric")
         closest_result = find_closest_result(all_results, metric_reliable, metric_best_max, self.metric)
 
-        self.sim_data.seed = closest_result["meta"]["seed"]
+        seed = closest_result["meta"]["seed"]
+        antithetic = closest_result["meta"].get("antithetic", False)
+        self.sim_data.seed = seed
 
-        logger.info(f"Reproduce closest result by seed: {self.sim_data.seed}")
+        logger.info(f"Reproduce closest result by seed: {seed}")
 
-        args = self._make_closure_args(writer=self.writer)
+        args = self._make_closure_args(writer=self.writer, seed=seed, antithetic=antithetic)
         final_result = self.simulation_closure(*args)
         final_result["summary"][f"{self.metric}_reliable"] = round(metric_reliable)
         final_result["summary"][f"{self.metric}_best_min"] = round(metric_best_min)
@@ -385,10 +720,55 @@ class Reliability:
 
         return final_result
 
-    def _make_closure_args(self, writer: IWriter = DictReliabilityWriter()) -> tuple:
+    def _make_runs_args(self, runs_number: int, runs_done: int) -> list[tuple]:
+        """Аргументы очередной серии прогонов с учётом способа снижения дисперсии"""
+        if self.variance_reduction is None:
+            return [self._make_closure_args() for _ in range(runs_number)]
+
+        if self.variance_reduction == "crn":
+            return [
+                self._make_closure_args(seed=derive_stream_seed(self.base_seed, "replication", idx))
+                for idx in range(runs_done, runs_done + runs_number)
+            ]
+
+        # Антитетические пары: прогон и его зеркальное отражение на одном зерне
+        args_list = []
+        first_pair = runs_done // 2
+        for idx in range(first_pair, first_pair + math.ceil(runs_number / 2)):
+            seed = derive_stream_seed(self.base_seed, "replication", idx)
+            args_list.append(self._make_closure_args(seed=seed))
+            args_list.append(self._make_closure_args(seed=seed, antithetic=True))
+        return args_list
+
+    def _stability_samples(self, results: list[dict]) -> list[dict]:
+        """
+        Выборка для оценки стабильности.
+        Для антитетических пар наблюдением служит среднее по паре - именно оно имеет сниженную дисперсию
+        """
+        if self.variance_reduction != "antithetic":
+            return results
+
+        samples = []
+        for pair in zip(results[::2], results[1::2]):
+            values = [result["summary"][self.metric] for result in pair]
+            samples.append({"summary": {self.metric: sum(values) / len(values)}})
+        return samples
+
+    def _make_closure_args(
+            self,
+            writer: IWriter = DictReliabilityWriter(),
+            seed: int | None = None,
+            antithetic: bool = False,
+    ) -> tuple:
+        sim_data = self.sim_data
+        if seed is not None or antithetic:
+            sim_data = copy(self.sim_data)
+            sim_data.seed = seed
+            sim_data.antithetic = antithetic
+
         if self.planned_trips is not None:
-            return self.sim_data, writer, self.sim_conf, self.planned_trips
-        return self.sim_data, writer, self.sim_conf
+            return sim_data, writer, self.sim_conf, self.planned_trips
+        return sim_data, writer, self.sim_conf
 
 
 @sim_data_validate
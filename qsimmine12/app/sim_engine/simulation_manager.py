@@ -3,14 +3,19 @@ import logging
 import multiprocessing
 import traceback
 from collections import defaultdict
+from copy import copy
 from multiprocessing import Manager
 from multiprocessing.managers import DictProxy  # noqa
-from typing import Any
+from typing import Any, Iterable
 
 from app.sim_engine.config import SIM_CONFIG
 from app.sim_engine.core.planner.manage import Planner
+from app.sim_engine.core.planner.planning_matrix import matrix_workers
+from app.sim_engine.core.planner.rolling_horizon import HorizonWindow, fit_window, rolling_horizon
 from app.sim_engine.core.props import SimData, PlannedTrip
 from app.sim_engine.enums import SolverType
+from app.sim_engine.estimate import run_estimation
+from app.sim_engine.fleet_sweep import FleetSweep
 from app.sim_engine.infra.exception_traceback import catch_errors
 from app.sim_engine.serializer import SimDataSerializer
 from app.sim_engine.simulate import Reliability, PlannedTripsSimulation, Simulation, run_simulation, \
@@ -66,6 +71,19 @@ class SimConfigOptionsValidator(IManagerValidator):
     def validate(data: dict) -> dict:
         if not isinstance(data, dict):
             raise SimConfigValidationError(f'Input config is invalid! Your config is {data}.')
+        time_step = data.get('time_step', 1)
+        if not isinstance(time_step, int) or isinstance(time_step, bool) or time_step < 1:
+            raise SimConfigValidationError(f'Time step must be a positive integer! Your time step is {time_step}.')
+        time_bucket = data.get('time_bucket', 2)
+        if not isinstance(time_bucket, int) or isinstance(time_bucket, bool) or time_bucket < 1:
+            raise SimConfigValidationError(f'Time bucket must be a positive integer! Your time bucket is {time_bucket}.')
+        margin = data.get('trip_bound_margin')
+        if margin is not None and (not isinstance(margin, (int, float)) or isinstance(margin, bool) or margin < 1):
+            raise SimConfigValidationError(f'Trip bound margin must be a number >= 1 or None! Your margin is {margin}.')
+        for key in ('rolling_horizon', 'rolling_horizon_step'):
+            value = data.get(key)
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 1):
+                raise SimConfigValidationError(f'{key} must be a positive integer or None! Your {key} is {value}.')
         return data
 
 
@@ -98,6 +116,7 @@ class SimulationManager:
 
         self._writer: IWriter = self.validate_writer(writer)
 
+        self._raw_data: dict = raw_data
         self._simdata: SimData = SimDataSerializer.serialize(data=raw_data)
         self.__use_multiprocessing = use_multiprocessing
 
@@ -139,6 +158,7 @@ class SimulationManager:
             устанавливает сериализованные данные в качестве текущих
         """
         self.raw_data_validator.validate(raw_data)
+        self._raw_data = raw_data
         self._simdata = SimDataSerializer.serialize(data=raw_data)
 
     def set_options(self, options: dict) -> None:
@@ -193,6 +213,34 @@ class SimulationManager:
 
         return self._process_simulation()
 
+    def run_fleet_sweep(
+            self,
+            trucks_numbers: Iterable[int],
+            min_marginal_gain: float | None = None,
+            metric: str = 'weight',
+            processes_number: int | None = None,
+    ) -> dict:
+        """
+            Прогоняет текущий сценарий для каждого размера парка из trucks_numbers
+            (самосвалы берутся из truck_list, при нехватке - копии по кругу).
+
+            min_marginal_gain - порог прироста метрики на один добавленный самосвал, ниже которого перебор
+            прекращается. Достоверный результат по точкам считается, если он включён в конфигурации.
+
+            Результат: таблица точек, данные графика метрики от количества самосвалов, рекомендуемый размер парка
+            и общее для всех точек зерно генератора случайных чисел (seed)
+        """
+        sweep = FleetSweep(
+            raw_data=self._raw_data,
+            options=self.config,
+            trucks_numbers=trucks_numbers,
+            min_marginal_gain=min_marginal_gain,
+            metric=metric,
+            reliability=self.config['reliability_calc_enabled'],
+            processes_number=processes_number,
+        )
+        return sweep.run()
+
     def _run_using_multiprocessing(self) -> dict:
         with Manager() as manager:
             manager_dict = manager.dict()
@@ -246,6 +294,10 @@ class SimulationManager:
         simulation_args = None
 
         match mode:
+            case 'estimate':
+                # Мгновенная оценка по замкнутой сети массового обслуживания, без имитационного прогона
+                return run_estimation(self.simdata, self.writer, self.config)
+
             case 'manual':
                 # Запуск симуляции с ручным определением маршрутов
                 simulation_closure = run_simulation
@@ -261,9 +313,20 @@ class SimulationManager:
                         solver=self.config['solver'],
                         msg=self.config['msg'],
                         workers=self.config['workers'],
-                        time_limit=self.config['time_limit']
+                        time_limit=self.config['time_limit'],
+                        matrix_workers=matrix_workers(self.config),
+                        warm_start=self.config['warm_start'],
+                        time_bucket=self.config['time_bucket'],
+                        trip_bound_margin=self.config['trip_bound_margin'],
+                        use_plan_cache=self.config['plan_cache']
                     )
-                    planned = planner.run(self.simdata)
+                    # При скользящем горизонте начальный план строится на первое окно, дальше его продлевает Quarry
+                    simdata = copy(self.simdata)
+                    window = None
+                    horizon = rolling_horizon(self.config)
+                    if horizon:
+                        window = HorizonWindow(open_end=fit_window(simdata, horizon))
+                    planned = planner.run(simdata, window=window)
 
                     planned_trips = defaultdict(list)
 
@@ -282,7 +345,7 @@ class SimulationManager:
         if simulation_closure is None or simulation_args is None:
             raise RuntimeError(
                 f'PlanningAndSimulationManager has no behavior for "{mode}" value in "mode" parameter. '
-                f'Set "auto" or "manual" value.'
+                f'Set "auto", "manual" or "estimate" value.'
             )
 
         if not reliability_calc_enabled:
@@ -303,6 +366,8 @@ class SimulationManager:
             delta_target=self.config['rel_delta_target'],
             consecutive=self.config['rel_consecutive'],
             boot_b=self.config['rel_boot_b'],
+            variance_reduction=self.config['rel_variance_reduction'],
+            base_seed=self.config['rel_base_seed'],
         )
 
         if planned_trips is not None:
@@ -0,0 +1,389 @@
+"""
+Генератор синтетических карьеров для тестов и бенчмарков симуляции.
+
+Формирует входные данные SimulationManager (тот же формат, что и run_sim_data*.json)
+без обращения к БД и сервису графа дорог: граф дорог строится параметрически
+в виде сетки уступов (grid) или дерева (tree) - магистраль с ответвлениями на уступы.
+"""
+import math
+import random
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+CENTER_LAT = 58.17
+CENTER_LON = 59.82
+METERS_IN_LAT_DEGREE = 111_320
+
+ROAD_NET_LAYOUTS = ("grid", "tree")
+
+
+def _offset(lat: float, lon: float, north_m: float, east_m: float) -> tuple[float, float]:
+    """Смещает точку на заданное число метров на север и восток"""
+    d_lat = north_m / METERS_IN_LAT_DEGREE
+    d_lon = east_m / (METERS_IN_LAT_DEGREE * math.cos(math.radians(lat)))
+    return lat + d_lat, lon + d_lon
+
+
+def _distance_m(a: tuple[float, float], b: tuple[float, float]) -> float:
+    """Расстояние между точками (lat, lon) в метрах, равнопромежуточное приближение"""
+    north = (b[0] - a[0]) * METERS_IN_LAT_DEGREE
+    east = (b[1] - a[1]) * METERS_IN_LAT_DEGREE * math.cos(math.radians(a[0]))
+    return math.hypot(north, east)
+
+
+def _iso(moment: datetime) -> str:
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+class _RoadNetBuilder:
+    """Собирает geojson графа дорог в формате road_net"""
+
+    def __init__(self) -> None:
+        self.features: list[dict] = []
+
+    def add_edge(self, a: tuple[float, float], b: tuple[float, float], bond: dict | None = None) -> None:
+        properties = {
+            "length": float(max(1, round(_distance_m(a, b)))),
+            "direction": "=",
+        }
+        if bond:
+            properties["point_1_bonds"] = [bond]
+
+        self.features.append({
+            "type": "Feature",
+            "geometry": {
+                "type": "LineString",
+                "coordinates": [[a[1], a[0], 0.0], [b[1], b[0], 0.0]],
+            },
+            "properties": properties,
+        })
+
+    def add_object(self, node: tuple[float, float], object_id: int, object_type: str,
+                   spur_m: float) -> tuple[float, float]:
+        """Добавляет тупиковое ответвление от узла к объекту, возвращает координаты объекта"""
+        position = _offset(node[0], node[1], spur_m, spur_m / 2)
+        self.add_edge(node, position, bond={"id": object_id, "type": object_type})
+        return position
+
+    def to_geojson(self) -> dict:
+        return {"type": "FeatureCollection", "features": self.features}
+
+
+def _grid_nodes(rows: int, cols: int, spacing_m: float) -> list[list[tuple[float, float]]]:
+    return [
+        [_offset(CENTER_LAT, CENTER_LON, -row * spacing_m, col * spacing_m) for col in range(cols)]
+        for row in range(rows)
+    ]
+
+
+def _build_grid(builder: _RoadNetBuilder, benches: int, width: int, spacing_m: float):
+    """
+    Сетка: верхний ряд - борт с пунктами разгрузки, нижний ряд - рабочие уступы с экскаваторами,
+    между ними - промежуточные горизонты. Соседние узлы соединены по горизонтали и вертикали
+    """
+    rows = benches + 2
+    nodes = _grid_nodes(rows, width, spacing_m)
+    for row in range(rows):
+        for col in range(width):
+            if col + 1 < width:
+                builder.add_edge(nodes[row][col], nodes[row][col + 1])
+            if row + 1 < rows:
+                builder.add_edge(nodes[row][col], nodes[row + 1][col])
+
+    top = nodes[0]
+    shovel_nodes = [node for row in nodes[1:] for node in reversed(row)]
+    service_nodes = nodes[rows // 2]
+    return top, shovel_nodes, service_nodes
+
+
+def _build_tree(builder: _RoadNetBuilder, benches: int, width: int, spacing_m: float):
+    """
+    Дерево: магистраль спускается от борта вниз, на каждом горизонте - ответвления на уступ влево и вправо
+    """
+    trunk = [_offset(CENTER_LAT, CENTER_LON, -level * spacing_m, 0) for level in range(benches + 1)]
+    for a, b in zip(trunk, trunk[1:]):
+        builder.add_edge(a, b)
+
+    top = [trunk[0]]
+    for step in range(1, width):
+        node = _offset(trunk[0][0], trunk[0][1], 0, step * spacing_m)
+        builder.add_edge(top[-1], node)
+        top.append(node)
+
+    shovel_nodes = []
+    for level in range(benches, 0, -1):
+        for side in (-1, 1):
+            prev = trunk[level]
+            for step in range(1, width):
+                node = _offset(trunk[level][0], trunk[level][1], 0, side * step * spacing_m)
+                builder.add_edge(prev, node)
+                prev = node
+            shovel_nodes.append(prev)
+
+    service_nodes = trunk
+    return top, shovel_nodes, service_nodes
+
+
+def generate_scenario(
+        trucks_num: int = 10,
+        shovels_num: int = 2,
+        unloads_num: int = 1,
+        fuel_stations_num: int = 1,
+        layout: str = "grid",
+        benches: int = 3,
+        spacing_m: float = 250,
+        start_time: datetime = datetime(2025, 10, 6, 5, 0, tzinfo=timezone.utc),
+        duration_hours: float = 2,
+        lunch: bool = True,
+        blasting: bool = True,
+        planned_idle: bool = True,
+        auto_distribution: bool = True,
+        seed: int | None = 0,
+) -> dict:
+    """
+    Формирует входные данные симуляции синтетического карьера.
+
+    Аргументы:
+    trucks_num, shovels_num, unloads_num, fuel_stations_num - состав техники и объектов
+    layout - вид графа дорог: grid (сетка уступов) или tree (магистраль с ответвлениями)
+    benches - число уступов (горизонтов) ниже борта
+    spacing_m - расстояние между соседними узлами графа
+    start_time, duration_hours - интервал симуляции (start_time в UTC)
+    lunch, blasting, planned_idle - добавлять ли обеды, взрывные работы и плановые простои
+    auto_distribution - сценарий с автоматическим распределением самосвалов (иначе маршруты задаются вручную)
+    seed - зерно для разброса параметров техники и зерно симуляции (None - случайные)
+    """
+    if layout not in ROAD_NET_LAYOUTS:
+        raise ValueError(f"Неизвестный вид графа дорог: {layout}. Допустимые: {ROAD_NET_LAYOUTS}")
+
+    rnd = random.Random(seed)
+    end_time = start_time + timedelta(hours=duration_hours)
+    width = max(shovels_num, unloads_num, fuel_stations_num, 4) + 1
+
+    builder = _RoadNetBuilder()
+    build = _build_grid if layout == "grid" else _build_tree
+    top_nodes, shovel_nodes, service_nodes = build(builder, benches, width, spacing_m)
+
+    spur_m = spacing_m / 5
+    quarry_id = 1
+
+    # --- Пункты разгрузки на борту ---
+    unload_list = []
+    for idx in range(unloads_num):
+        lat, lon = builder.add_object(top_nodes[idx % len(top_nodes)], idx + 1, "unload", spur_m)
+        unload_list.append({
+            "id": idx + 1,
+            "name": f"Пункт разгрузки {idx + 1}",
+            "quarry_id": quarry_id,
+            "initial_lat": lat,
+            "initial_lon": lon,
+            "initial_height": 0,
+            "angle": 3,
+            "unload_type": "hydraulic",
+            "payload_type": "gravel",
+            "trucks_at_once": 2,
+            "capacity": 10,
+            "initial_operating_time": 240000,
+            "average_repair_duration": 24,
+            "initial_failure_count": 50,
+        })
+
+    # --- Экскаваторы на уступах ---
+    shovel_list = []
+    for idx in range(shovels_num):
+        lat, lon = builder.add_object(shovel_nodes[idx % len(shovel_nodes)], idx + 1, "shovel", spur_m)
+        shovel_list.append({
+            "id": idx + 1,
+            "name": f"Э{idx + 1}",
+            "quarry_id": quarry_id,
+            "initial_lat": lat,
+            "initial_lon": lon,
+            "initial_height": 0,
+            "bucket_volume": rnd.choice([12, 16, 22]),
+            "bucket_lift_speed": 0.6,
+            "arm_turn_speed": 24,
+            "arm_turn_angle": 90,
+            "bucket_dig_speed": 0.5,
+            "bucket_fill_speed": 0.07,
+            "bucket_fill_coef": 0.9,
+            "arm_inertia_coef": 1.2,
+            "return_move_coef": 0.3,
+            "payload_type": "gravel",
+            "initial_operating_time": 4000,
+            "average_repair_duration": 480,
+            "initial_failure_count": 40,
+        })
+
+    # --- Заправки и площадки на промежуточном горизонте ---
+    service_iter = iter(service_nodes * (fuel_stations_num + 4))
+
+    fuel_station_list = []
+    for idx in range(fuel_stations_num):
+        lat, lon = builder.add_object(next(service_iter), idx + 1, "fuel_station", spur_m)
+        fuel_station_list.append({
+            "id": idx + 1,
+            "name": f"Заправка {idx + 1}",
+            "quarry_id": quarry_id,
+            "initial_lat": lat,
+            "initial_lon": lon,
+            "initial_height": 0,
+            "num_pumps": 2,
+            "flow_rate": 3,
+        })
+
+    idle_area_types = [
+        ("Площадка пересменки", dict(is_shift_change_area=True)),
+        ("Площадка обеда", dict(is_lunch_area=True)),
+        ("Площадка ожидания взрыва", dict(is_blast_waiting_area=True)),
+        ("Площадка ремонта", dict(is_repair_area=True)),
+    ]
+    idle_area_list = []
+    for idx, (name, flags) in enumerate(idle_area_types):
+        lat, lon = builder.add_object(next(service_iter), idx + 1, "idle_area", spur_m)
+        idle_area_list.append({
+            "id": idx + 1,
+            "name": name,
+            "quarry_id": quarry_id,
+            "initial_lat": lat,
+            "initial_lon": lon,
+            "initial_height": 0,
+            "is_shift_change_area": False,
+            "is_lunch_area": False,
+            "is_blast_waiting_area": False,
+            "is_repair_area": False,
+            **flags,
+        })
+    shift_change_area = idle_area_list[0]
+
+    # --- Самосвалы стартуют с площадки пересменки ---
+    truck_list = []
+    for idx in range(trucks_num):
+        body_capacity = rnd.choice([90, 130, 220])
+        truck_list.append({
+            "id": idx + 1,
+            "name": f"АС{idx + 1}",
+            "quarry_id": quarry_id,
+            "initial_lat": shift_change_area["initial_lat"],
+            "initial_lon": shift_change_area["initial_lon"],
+            "initial_height": 0,
+            "body_capacity": body_capacity,
+            "speed_empty": rnd.randint(30, 40),
+            "speed_loaded": rnd.randint(15, 22),
+            "fuel_capacity": 2900,
+            "fuel_level": rnd.randint(600, 2900),
+            "fuel_threshold_planned": 80,
+            "fuel_threshold_critical": 50,
+            "fuel_idle_lph": 15,
+            "fuel_specific_consumption": 208,
+            "fuel_density": 0.82,
+            "engine_power_kw": 1715,
+            "initial_operating_time": 1000,
+            "average_repair_duration": 4,
+            "initial_failure_count": 20000,
+        })
+
+    # --- Ручные маршруты: самосвалы по кругу закрепляются за парами экскаватор - ПР ---
+    trail_list = []
+    if shovels_num and unloads_num:
+        for idx in range(shovels_num):
+            trail_list.append({
+                "id": idx + 1,
+                "shovel_id": idx + 1,
+                "unload_id": idx % unloads_num + 1,
+                "trucks": [truck["id"] for truck in truck_list[idx::shovels_num]],
+                "segments": [],
+            })
+
+    # --- Расписания ---
+    middle = start_time + (end_time - start_time) / 2
+
+    blasting_schedule = []
+    if blasting:
+        lat, lon = service_nodes[len(service_nodes) // 2]
+        half = spacing_m / 3
+        corners = [(-half, -half), (-half, half), (half, half), (half, -half), (-half, -half)]
+        polygon = [[p[1], p[0]] for p in (_offset(lat, lon, n, e) for n, e in corners)]
+        blasting_schedule.append({
+            "id": 1,
+            "quarry_id": quarry_id,
+            "start_time": _iso(middle),
+            "end_time": _iso(middle + timedelta(minutes=20)),
+            "geojson_data": {
+                "type": "FeatureCollection",
+                "features": [{
+                    "type": "Feature",
+                    "geometry": {"type": "Polygon", "coordinates": [polygon]},
+                    "properties": {"id": 1, "group": 1, "content": "", "timeline_index": 0},
+                }],
+            },
+        })
+
+    planned_idle_schedule = []
+    if planned_idle:
+        idle_start = start_time + timedelta(minutes=20)
+        for idx, (vehicle_type, vehicle_id) in enumerate([("shovel", 1), ("truck", 1)]):
+            planned_idle_schedule.append({
+                "id": idx + 1,
+                "quarry_id": quarry_id,
+                "vehicle_type": vehicle_type,
+                "vehicle_id": vehicle_id,
+                "start_time": _iso(idle_start),
+                "end_time": _iso(idle_start + timedelta(minutes=20)),
+            })
+
+    # Одна смена, начинающаяся с началом симуляции (в часовом поясе карьера)
+    timezone_name = "Europe/Moscow"
+    local_start = start_time.astimezone(ZoneInfo(timezone_name))
+    shift_begin = local_start.hour * 60 + local_start.minute
+
+    return {
+        "start_time": _iso(start_time),
+        "end_time": _iso(end_time),
+        "seed": seed,
+        "scenario": {
+            "id": 1,
+            "name": "Синтетический сценарий",
+            "quarry_id": quarry_id,
+            "start_time": _iso(start_time),
+            "end_time": _iso(end_time),
+            "is_auto_truck_distribution": auto_distribution,
+            "is_calc_reliability_enabled": False,
+            "trails": [],
+        },
+        "quarry": {
+            "id": quarry_id,
+            "name": "Синтетический карьер",
+            "timezone": timezone_name,
+            "center_lat": CENTER_LAT,
+            "center_lon": CENTER_LON,
+            "center_height": 0,
+            "shift_config": [{
+                "begin_offset": shift_begin,
+                "end_offset": shift_begin + 720,
+                "begin_offset_time": f"{shift_begin // 60 % 24:02d}:{shift_begin % 60:02d}",
+                "end_offset_time": f"{(shift_begin + 720) // 60 % 24:02d}:{shift_begin % 60:02d}",
+                "reactId": "shift-1-0",
+            }],
+            "shift_change_duration": 30,
+            "shift_change_offset": 690,
+            "lunch_break_offset": int(duration_hours * 60 / 2) if lunch else 0,
+            "lunch_break_duration": 30 if lunch else 0,
+            "work_break_rate": 1,
+            "work_break_duration": 10,
+            "shovel_list": shovel_list,
+            "truck_list": truck_list,
+            "unload_list": unload_list,
+            "fuel_station_list": fuel_station_list,
+            "idle_area_list": idle_area_list,
+            "trail_list": trail_list,
+            "planned_idle_list": planned_idle_schedule,
+            "map_overlay_list": [],
+            "scenario_list": [],
+            "road_net_id": 1,
+            "road_net": builder.to_geojson(),
+            "schedules": {
+                "blasting": blasting_schedule,
+                "planned_idle": planned_idle_schedule,
+            },
+        },
+    }
@@ -0,0 +1,250 @@
+"""
+PYTEST_DONT_REWRITE
+
+Бенчмарк пропускной способности симуляции на синтетических карьерах.
+
+Запуск (требуется pytest-benchmark):
+    SIM_BENCHMARK=1 pytest app/sim_engine/tests/test_benchmark.py --benchmark-only
+
+Помимо времени прогона от pytest-benchmark, в extra_info каждого замера пишутся:
+setup_sec - время подготовки (сериализация + построение окружения и маршрутов),
+sim_sec_per_wall_sec - симуляционных секунд на секунду реального времени (без подготовки),
+events_per_sec - событий simpy в секунду, peak_rss_mb - пиковое потребление памяти прогоном.
+ru_maxrss - максимум за всю жизнь процесса, а все точки идут в одном процессе pytest, поэтому
+peak_rss_mb замеряется отдельным прогоном в новом процессе (spawn).
+Замеряемые прогоны идут без профилирования, чтобы оно не искажало sim_sec_per_wall_sec;
+events_per_sec и events_total берутся из отдельного прогона с профилированием.
+
+test_greedy_dispatch_decision замеряет один выбор рейса жадным распределителем на парке из 200 самосвалов,
+среднее время выбора (mean_ms) пишется в extra_info.
+
+test_planning_matrix_build замеряет построение матрицы планирования без кэша последовательно и в пуле процессов,
+результаты должны совпадать.
+
+test_planner_warm_start сравнивает холодный и тёплый старт CP-SAT на одной матрице планирования:
+время до первого допустимого решения и целевую функцию в пределах time_limit.
+
+test_time_indexed_scaling сравнивает размер модели (переменные, ограничения), время построения и решения
+попарной MILP постановки (CBC, только малые парки) и временной постановки TIME_INDEXED по размеру парка.
+
+test_time_step_drift сравнивает прогон с увеличенным шагом симуляции с эталонным шагом 1 с:
+ускорение по времени прогона и относительное отклонение рейсов и массы в сводке.
+"""
+
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from app.sim_engine.core.planner.matrix_cache import configure_planning_cache, get_planning_cache
+from app.sim_engine.core.planner.manage import Planner
+from app.sim_engine.core.planner.planning_matrix import get_planning_data
+from app.sim_engine.core.simulations.utils.dependency_resolver import DependencyResolver as DR
+from app.sim_engine.enums import SolverType
+from app.sim_engine.simulate import PlannedTripsSimulation
+from app.sim_engine.simulation_manager import SimulationManager
+from app.sim_engine.tests.scenario_generator import generate_scenario
+from app.sim_engine.writer import DictSimpleWriter
+
+pytest.importorskip("pytest_benchmark")
+
+pytestmark = pytest.mark.skipif(
+    not os.getenv("SIM_BENCHMARK"),
+    reason="Бенчмарк запускается только при заданной переменной окружения SIM_BENCHMARK",
+)
+
+# Размер парка -> (экскаваторы, пункты разгрузки, заправки)
+FLEET_SIZES = {
+    10: (2, 1, 1),
+    50: (8, 3, 2),
+    200: (30, 10, 4),
+}
+
+
+def peak_rss_mb() -> float:
+    """Пиковое потребление памяти процессом (ru_maxrss: Кб в Linux, байты в macOS)"""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return max_rss / 1024 / 1024
+    return max_rss / 1024
+
+
+def run_once(raw_data: dict, config: dict) -> dict:
+    setup_started = time.perf_counter()
+    manager = SimulationManager(raw_data=raw_data, writer=DictSimpleWriter, options=config)
+    simulation = PlannedTripsSimulation(manager.simdata, manager.writer, manager.config, defaultdict(list))
+    simulation.run_until(0)
+    setup_sec = time.perf_counter() - setup_started
+
+    run_started = time.perf_counter()
+    result = simulation.run()
+    run_sec = time.perf_counter() - run_started
+
+    return dict(
+        setup_sec=setup_sec,
+        run_sec=run_sec,
+        duration=manager.simdata.duration,
+        profile=result["meta"].get("profile"),
+        summary=result["summary"],
+    )
+
+
+def _peak_rss_of_run(raw_data: dict, config: dict) -> float:
+    """Точка входа процесса замера памяти: прогон и пиковое потребление памяти процессом"""
+    run_once(raw_data, config)
+    return peak_rss_mb()
+
+
+def run_peak_rss_mb(raw_data: dict, config: dict) -> float:
+    """Пиковое потребление памяти одного прогона - в новом процессе, без памяти предыдущих точек"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(_peak_rss_of_run, raw_data, config).result()
+
+
+@pytest.mark.parametrize("layout", ["grid", "tree"])
+@pytest.mark.parametrize("trucks_num", list(FLEET_SIZES))
+def test_simulation_throughput(benchmark, trucks_num, layout):
+    shovels_num, unloads_num, fuel_stations_num = FLEET_SIZES[trucks_num]
+    raw_data = generate_scenario(
+        trucks_num=trucks_num,
+        shovels_num=shovels_num,
+        unloads_num=unloads_num,
+        fuel_stations_num=fuel_stations_num,
+        layout=layout,
+        benches=max(3, shovels_num // 4),
+        duration_hours=2,
+        seed=1,
+    )
+    config = {"breakdown": True, "refuel": True, 'lunch': True, 'planned_idle': True, 'blasting': True,
+              'mode': 'auto'}
+
+    stats = benchmark.pedantic(run_once, args=(raw_data, config), rounds=3, iterations=1)
+
+    assert stats["summary"]["trips"] > 0
+
+    profiled = run_once(raw_data, {**config, 'profile': True})
+
+    benchmark.extra_info.update(
+        trucks=trucks_num,
+        setup_sec=round(stats["setup_sec"], 3),
+        sim_sec_per_wall_sec=round(stats["duration"] / max(stats["run_sec"], 1e-9), 1),
+        events_per_sec=profiled["profile"]["events_per_sec"],
+        events_total=profiled["profile"]["events_total"],
+        peak_rss_mb=round(run_peak_rss_mb(raw_data, config), 1),
+    )
+
+
+def test_greedy_dispatch_decision(benchmark):
+    raw_data = generate_scenario(trucks_num=200, shovels_num=30, unloads_num=10, fuel_stations_num=4,
+                                 duration_hours=1, seed=1)
+    manager = SimulationManager(raw_data=raw_data, writer=DictSimpleWriter, options={'mode': 'auto'})
+    simulation = PlannedTripsSimulation(manager.simdata, manager.writer, manager.config, defaultdict(list))
+    simulation.run_until(600)
+
+    solver = DR.solver()
+    truck = next(iter(simulation.env.sim_context.trucks.values()))
+    # первый вызов строит массивы матрицы планирования
+    solver.choose_next_trip(truck, simulation.env.now)
+
+    choice = benchmark(solver.choose_next_trip, truck, simulation.env.now)
+
+    assert choice is not None
+    benchmark.extra_info.update(
+        trucks=len(simulation.env.sim_context.trucks),
+        mean_ms=round(benchmark.stats.stats.mean * 1000, 4),
+    )
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_planning_matrix_build(benchmark, workers):
+    raw_data = generate_scenario(trucks_num=200, shovels_num=30, unloads_num=10, fuel_stations_num=4,
+                                 duration_hours=1, seed=1)
+    simdata = SimulationManager(raw_data=raw_data, writer=DictSimpleWriter, options={'mode': 'auto'}).simdata
+
+    previous = get_planning_cache().backend
+    configure_planning_cache(None)
+    try:
+        reference = get_planning_data(simdata, workers=1)
+        planning_data = benchmark.pedantic(get_planning_data, args=(simdata, workers), rounds=1, iterations=1)
+    finally:
+        configure_planning_cache(previous)
+
+    benchmark.extra_info.update(workers=workers, pairs=len(planning_data.T_haul))
+    assert planning_data == reference
+
+
+@pytest.mark.parametrize("warm_start", [False, True])
+def test_planner_warm_start(benchmark, warm_start):
+    raw_data = generate_scenario(trucks_num=10, shovels_num=2, unloads_num=1, fuel_stations_num=1,
+                                 duration_hours=2, seed=1)
+    simdata = SimulationManager(raw_data=raw_data, writer=DictSimpleWriter, options={'mode': 'auto'}).simdata
+    planning_data = get_planning_data(simdata)
+
+    solver = Planner(solver=SolverType.CP, msg=False, workers=4, time_limit=10, warm_start=warm_start)._init_solver()
+    result = benchmark.pedantic(solver.run, args=(planning_data,), rounds=1, iterations=1)
+
+    benchmark.extra_info.update(
+        warm_start=warm_start,
+        status=result["status"],
+        objective=result["objective"],
+        first_solution_sec=result.get("first_solution_sec"),
+        trips=len(result["trips"]),
+    )
+    assert result["trips"]
+
+
+@pytest.mark.parametrize("trucks_num", [5, 10, 30])
+@pytest.mark.parametrize("solver_type", [SolverType.CBC, SolverType.TIME_INDEXED])
+def test_time_indexed_scaling(benchmark, solver_type, trucks_num):
+    if solver_type == SolverType.CBC and trucks_num > 10:
+        pytest.skip("попарная MILP постановка на таком парке не строится за разумное время")
+
+    raw_data = generate_scenario(trucks_num=trucks_num, shovels_num=3, unloads_num=2, fuel_stations_num=1,
+                                 duration_hours=4, seed=1)
+    simdata = SimulationManager(raw_data=raw_data, writer=DictSimpleWriter, options={'mode': 'auto'}).simdata
+    planning_data = get_planning_data(simdata)
+
+    solver = Planner(solver=solver_type, msg=False, workers=4, time_limit=30)._init_solver()
+    build_start = time.perf_counter()
+    model = solver.build_model(planning_data)[0]
+    build_sec = time.perf_counter() - build_start
+    result = benchmark.pedantic(solver.run, args=(planning_data,), rounds=1, iterations=1)
+
+    benchmark.extra_info.update(
+        solver=solver_type.key(),
+        trucks=trucks_num,
+        variables=len(model.variables()),
+        constraints=len(model.constraints),
+        build_sec=round(build_sec, 3),
+        status=result["status"],
+        objective=result["objective"],
+    )
+    assert result["trips"]
+
+
+@pytest.mark.parametrize("time_step", [1, 5, 10])
+def test_time_step_drift(benchmark, time_step):
+    raw_data = generate_scenario(trucks_num=50, shovels_num=8, unloads_num=3, fuel_stations_num=2,
+                                 duration_hours=4, seed=1)
+    config = {"breakdown": False, "refuel": True, 'lunch': True, 'planned_idle': True, 'blasting': True,
+              'mode': 'auto'}
+
+    reference = run_once(raw_data, {**config, 'time_step': 1})
+    stats = benchmark.pedantic(run_once, args=(raw_data, {**config, 'time_step': time_step}), rounds=1, iterations=1)
+
+    def drift(key: str) -> float:
+        return round(abs(stats["summary"][key] - reference["summary"][key]) / max(reference["summary"][key], 1), 4)
+
+    benchmark.extra_info.update(
+        time_step=time_step,
+        speedup=round(reference["run_sec"] / max(stats["run_sec"], 1e-9), 2),
+        trips=stats["summary"]["trips"],
+        trips_drift=drift("trips"),
+        weight_drift=drift("weight"),
+    )
+    assert stats["summary"]["trips"] > 0
@@ -5,12 +5,40 @@ PYTEST_DONT_REWRITE
 import json
 import math
 import os
+import pickle
+from collections import defaultdict
+from dataclasses import replace
+from datetime import timedelta
 
 import pytest
-
-from app.sim_engine.enums import ObjectType
+from ortools.sat.python import cp_model
+from pulp import LpMaximize, LpProblem, LpSolutionIntegerFeasible, LpSolutionNoSolutionFound, LpSolutionOptimal, \
+    LpStatusNotSolved, LpStatusOptimal
+
+from app.sim_engine.core.calculations.memo import calc_caches_info, clear_calc_caches
+from app.sim_engine.core.calculations.shovel import ShovelCalc
+from app.sim_engine.core.calculations.truck import TruckCalc
+from app.sim_engine.core.calculations.unload import UnloadCalc
+from app.sim_engine.core.geometry import build_route_edges_by_road_net
+from app.sim_engine.core.planner.entities import InputPlanningData
+from app.sim_engine.core.planner.manage import Planner
+from app.sim_engine.core.planner.matrix_cache import DiskMatrixCacheBackend, configure_planning_cache, \
+    get_planning_cache
+from app.sim_engine.core.planner.planning_matrix import calculate_start_time, get_planning_data
+from app.sim_engine.core.planner.plan_cache import PLAN_KEY_PREFIX, configure_plan_cache, get_plan_cache, plan_key
+from app.sim_engine.core.planner.solvers.cp import CPSolver
+from app.sim_engine.core.planner.solvers.milp import solution_status
+from app.sim_engine.core.planner.solvers.portfolio import greedy_plan
+from app.sim_engine.core.planner.rolling_horizon import HorizonWindow, TRIP_STAGE_LOADING, apply_window, \
+    rolling_horizon_step
+from app.sim_engine.core.planner.trip_bounds import compute_trip_bounds
+from app.sim_engine.core.simulations.utils.service_locator import ServiceLocator
+from app.sim_engine.core.simulations.utils.trucks_queue import TrucksQueue
+from app.sim_engine.enums import ObjectType, SolverType
+from app.sim_engine.simulate import PlannedTripsSimulation, Reliability, SimulationVariant, run_simulation
 from app.sim_engine.simulation_manager import SimulationManager
-from app.sim_engine.writer import DictSimpleWriter
+from app.sim_engine.tests.scenario_generator import generate_scenario
+from app.sim_engine.writer import DictSimpleWriter, ListShiftSink
 
 USE_MULTIPROCESSING = True
 
@@ -435,3 +463,603 @@ def test_auto_mode_summary_result(input_data):
     assert 0 < summary['trips'] <= result['trips']
     assert 0 < summary['volume'] <= result['volume']
     assert 0 < summary['weight'] <= result['weight']
+
+
+def test_simulation_fork(input_data):
+    config = {"breakdown": False, "refuel": False, 'lunch': False, 'planned_idle': False, 'blasting': False,
+              'mode': 'auto'}
+    manager = SimulationManager(raw_data=input_data, writer=DictSimpleWriter, options=config)
+    simulation = PlannedTripsSimulation(manager.simdata, manager.writer, manager.config, defaultdict(list))
+
+    checkpoint = simulation.run_until(manager.simdata.duration // 2)
+    assert checkpoint.sim_time == manager.simdata.duration // 2
+    assert pickle.loads(pickle.dumps(checkpoint)) == checkpoint
+
+    shovel_id = next(iter(manager.simdata.shovels))
+    results = simulation.fork([
+        SimulationVariant(name='base'),
+        SimulationVariant(
+            name='shovel_breakdown',
+            modifier=lambda sim: sim.schedule_breakdown(ObjectType.SHOVEL, shovel_id, checkpoint.sim_time, 60 * 60),
+        ),
+    ])
+
+    for variant_result in results.values():
+        validate_result(variant_result)
+    assert results['base']['meta']['variant'] == 'base'
+    assert results['shovel_breakdown']['summary']['trips'] <= results['base']['summary']['trips']
+    assert results['base']['summary']['trips'] >= checkpoint.trips
+
+
+def _seeded_quarry(input_data, seed: int, antithetic: bool = False):
+    manager = SimulationManager(raw_data=input_data, writer=DictSimpleWriter, options={'mode': 'auto'})
+    manager.simdata.seed = seed
+    manager.simdata.antithetic = antithetic
+    simulation = PlannedTripsSimulation(manager.simdata, manager.writer, manager.config, defaultdict(list))
+    simulation.run_until(0)
+    return simulation.quarry
+
+
+def test_random_streams(input_data):
+    quarry = _seeded_quarry(input_data, seed=42)
+    other = _seeded_quarry(input_data, seed=42)
+
+    # дополнительные розыгрыши одного объекта не сдвигают поток другого
+    for _ in range(100):
+        other.get_random_stream("truck", 2, "breakdown").random()
+    expected = [quarry.get_random_stream("truck", 1, "breakdown").random() for _ in range(10)]
+    assert [other.get_random_stream("truck", 1, "breakdown").random() for _ in range(10)] == expected
+    assert quarry.get_random_stream("truck", 1, "breakdown") is quarry.get_random_stream("truck", 1, "breakdown")
+    assert _seeded_quarry(input_data, seed=43).get_random_stream("truck", 1, "breakdown").random() != expected[0]
+
+    # антитетический прогон на том же зерне выдаёт 1 - U
+    mirrored = _seeded_quarry(input_data, seed=42, antithetic=True)
+    values = [mirrored.get_random_stream("truck", 1, "breakdown").random() for _ in range(10)]
+    assert values == pytest.approx([1.0 - value for value in expected])
+
+
+def test_reliability_variance_reduction(input_data):
+    manager = SimulationManager(raw_data=input_data, writer=DictSimpleWriter, options={'mode': 'auto'})
+
+    def make(variance_reduction):
+        return Reliability(
+            simulation_closure=run_simulation,
+            sim_data=manager.simdata,
+            writer=manager.writer,
+            sim_conf=manager.config,
+            processes_number=1,
+            variance_reduction=variance_reduction,
+            base_seed=7,
+        )
+
+    # crn: зерно прогона зависит только от базового зерна и номера прогона
+    crn = make("crn")
+    seeds = [sim_data.seed for sim_data, *_ in crn._make_runs_args(4, 0)]
+    assert len(set(seeds)) == 4
+    assert [sim_data.seed for sim_data, *_ in make("crn")._make_runs_args(2, 2)] == seeds[2:]
+    assert manager.simdata.seed is None
+
+    # antithetic: пары прогонов на одном зерне, второй прогон пары - зеркальный
+    args = make("antithetic")._make_runs_args(4, 0)
+    assert len(args) == 4
+    for (plain, *_), (mirrored, *_) in zip(args[::2], args[1::2]):
+        assert plain.seed == mirrored.seed
+        assert not plain.antithetic
+        assert mirrored.antithetic
+    assert args[0][0].seed != args[2][0].seed
+
+    with pytest.raises(ValueError):
+        make("unknown")
+
+
+def test_simulation_profile(input_data):
+    config = {"breakdown": False, "refuel": False, 'lunch': False, 'planned_idle': False, 'blasting': False,
+              'mode': 'auto', 'profile': True}
+    result = SimulationManager(raw_data=input_data, writer=DictSimpleWriter, options=config).run()
+    validate_result(result)
+
+    profile = result["meta"]["profile"]
+    assert profile["events_total"] > 0
+    assert profile["events_total"] == sum(process["events"] for process in profile["processes"].values())
+    assert profile["queue_depth"]["max"] >= 0
+    assert profile["sections"]["route_search"]["calls"] > 0
+    assert profile["sections"]["writer"]["calls"] > 0
+
+    # профилировщик завершённого прогона отвязан и не учитывает вызовы вне симуляции
+    assert ServiceLocator.get('profiler') is None
+
+
+def test_generated_scenario():
+    raw_data = generate_scenario(trucks_num=4, shovels_num=2, unloads_num=1, fuel_stations_num=1,
+                                 duration_hours=2, seed=1)
+    config = {"breakdown": True, "refuel": True, 'lunch': True, 'planned_idle': True, 'blasting': True,
+              'mode': 'auto'}
+    result = SimulationManager(raw_data=raw_data, writer=DictSimpleWriter, options=config).run()
+    validate_result(result)
+
+    assert result["summary"]["trips"] > 0
+    assert 0 < result["summary"]["trucks_count"] <= 4
+    assert 0 < result["summary"]["shovels_count"] <= 2
+
+
+def test_trucks_queue():
+    class QueuedTruck:
+        def __init__(self, truck_id: int) -> None:
+            self.id = truck_id
+            self.name = f"truck_{truck_id}"
+
+    trucks = [QueuedTruck(truck_id) for truck_id in range(1, 5)]
+    queue = TrucksQueue()
+    assert not queue
+    assert queue.head is None
+    assert queue.tail(1) == ()
+    assert queue.split_names(1) == ((), ())
+
+    for truck in trucks[:3]:
+        queue.append(truck)
+    assert len(queue) == 3
+    assert queue.ids == [1, 2, 3]
+    assert queue.head is trucks[0]
+    assert queue.tail(1) == (trucks[1], trucks[2])
+    assert queue.tail(2) == (trucks[2],)
+    assert queue.tail(3) == ()
+    assert queue.split_names(2) == (("truck_1", "truck_2"), ("truck_3",))
+    assert trucks[1] in queue
+    assert trucks[3] not in queue
+
+    # кэш сбрасывается при изменении очереди
+    tail = queue.tail(1)
+    assert queue.tail(1) is tail
+    queue.append(trucks[3])
+    assert queue.tail(1) == (trucks[1], trucks[2], trucks[3])
+    assert queue.split_names(1) == (("truck_1",), ("truck_2", "truck_3", "truck_4"))
+
+    # повторная постановка переставляет самосвал в конец очереди
+    queue.append(trucks[1])
+    assert queue.ids == [1, 3, 4, 2]
+    assert queue.tail(1) == (trucks[2], trucks[3], trucks[1])
+
+    queue.remove(trucks[0])
+    assert queue.head is trucks[2]
+    assert list(queue) == [trucks[2], trucks[3], trucks[1]]
+    assert queue.split_names(1) == (("truck_3",), ("truck_4", "truck_2"))
+    with pytest.raises(ValueError):
+        queue.remove(trucks[0])
+
+
+def test_fast_forward_summary(input_data):
+    config = {"breakdown": False, "refuel": True, 'lunch': True, 'planned_idle': True, 'blasting': False,
+              'mode': 'auto'}
+    result = SimulationManager(use_multiprocessing=USE_MULTIPROCESSING, raw_data=input_data, writer=DictSimpleWriter, options=config).run()
+    result_ff = SimulationManager(use_multiprocessing=USE_MULTIPROCESSING, raw_data=input_data, writer=DictSimpleWriter, options={**config, 'fast_forward': True}).run()
+    validate_result(result_ff)
+
+    assert result_ff["summary"]["trips"] == result["summary"]["trips"]
+    assert result_ff["summary"]["weight"] == result["summary"]["weight"]
+    assert len(result_ff["telemetry"]) < len(result["telemetry"])
+
+
+def test_horizon_shift_flush(input_data):
+    config = {"breakdown": True, "refuel": True, 'lunch': True, 'planned_idle': True, 'blasting': True,
+              'mode': 'auto'}
+    manager = SimulationManager(raw_data=input_data, writer=DictSimpleWriter, options=config)
+    sim_data = manager.simdata
+    sim_data.shift_starts = [sim_data.start_time + timedelta(seconds=sim_data.duration // 2)]
+
+    sink = ListShiftSink()
+    simulation = PlannedTripsSimulation(sim_data, manager.writer, manager.config, defaultdict(list))
+    result = simulation.run_horizon(sink)
+
+    assert result['meta']['horizon']['shifts'] == 2
+    assert len(sink.shifts) == 2
+    assert result['telemetry'] == []
+    assert result['summary']['trips_table'] == []
+
+    shifts_trips = sum(shift['summary']['trips'] for shift in sink.shifts)
+    assert shifts_trips == result['summary']['trips']
+    assert shifts_trips == sum(len(shift['summary']['trips_table']) for shift in sink.shifts)
+    assert all(shift['telemetry'] for shift in sink.shifts)
+
+
+def test_estimate_mode(input_data):
+    config = {"breakdown": False, "refuel": False, 'lunch': False, 'planned_idle': False, 'blasting': False,
+              'mode': 'auto'}
+    result = SimulationManager(use_multiprocessing=USE_MULTIPROCESSING, raw_data=input_data, writer=DictSimpleWriter, options=config).run()
+    estimate = SimulationManager(raw_data=input_data, writer=DictSimpleWriter, options={**config, 'mode': 'estimate'}).run()
+
+    assert set(estimate['summary']) == set(result['summary'])
+    assert estimate['summary']['trips'] > 0
+    assert estimate['summary']['weight'] > 0
+    assert estimate['meta']['estimate']['shovels_utilization']
+    assert all(0 <= value <= 1 for value in estimate['meta']['estimate']['shovels_utilization'].values())
+
+    approximate = SimulationManager(
+        raw_data=input_data, writer=DictSimpleWriter, options={**config, 'mode': 'estimate', 'estimate_method': 'approximate'}
+    ).run()
+    assert approximate['summary']['trips'] == pytest.approx(estimate['summary']['trips'], rel=0.2)
+
+
+def test_fleet_sweep(input_data):
+    config = {"breakdown": False, "refuel": False, 'lunch': False, 'planned_idle': False, 'blasting': False,
+              'mode': 'auto'}
+    manager = SimulationManager(raw_data=input_data, writer=DictSimpleWriter, options=config)
+    trucks_in_scenario = len(input_data['quarry']['truck_list'])
+    trucks_numbers = [1, trucks_in_scenario, trucks_in_scenario + 2]
+
+    sweep = manager.run_fleet_sweep(trucks_numbers, processes_number=2)
+
+    assert [point['trucks'] for point in sweep['table']] == trucks_numbers
+    assert [point['trucks_count'] for point in sweep['table']] == trucks_numbers
+    assert len(sweep['chart_data']) == len(trucks_numbers)
+    assert sweep['table'][0]['marginal_gain'] is None
+    assert sweep['recommended_trucks'] in trucks_numbers
+    assert not sweep['stopped_early']
+
+
+def test_fleet_sweep_common_seed(input_data):
+    input_data.pop('seed', None)
+    config = {"breakdown": True, "refuel": False, 'lunch': False, 'planned_idle': False, 'blasting': False,
+              'mode': 'auto'}
+    manager = SimulationManager(raw_data=input_data, writer=DictSimpleWriter, options=config)
+    trucks_in_scenario = len(input_data['quarry']['truck_list'])
+
+    sweep = manager.run_fleet_sweep([trucks_in_scenario, trucks_in_scenario + 1], processes_number=2)
+
+    # общие случайные числа: без seed во входных данных все точки считаются с одним сгенерированным зерном
+    assert sweep['seed'] is not None
+    assert {point['seed'] for point in sweep['table']} == {sweep['seed']}
+
+
+def test_calc_cache(input_data):
+    config = {"breakdown": False, "refuel": False, 'lunch': False, 'planned_idle': False, 'blasting': False,
+              'mode': 'manual'}
+    clear_calc_caches()
+    first = SimulationManager(raw_data=input_data, writer=DictSimpleWriter, options=config).run()
+    info = calc_caches_info()
+
+    pairs = len(input_data['quarry']['shovel_list']) * len(input_data['quarry']['truck_list'])
+    assert info['shovel_load_schedule']['misses'] <= pairs
+    assert info['shovel_load_schedule']['hits'] > 0
+
+    clear_calc_caches()
+    second = SimulationManager(raw_data=input_data, writer=DictSimpleWriter, options=config).run()
+    assert first['summary'] == second['summary']
+
+
+def test_planning_matrix_cache(input_data, tmp_path):
+    config = {"breakdown": False, "refuel": False, 'lunch': False, 'planned_idle': False, 'blasting': False,
+              'mode': 'auto'}
+    previous = get_planning_cache().backend
+    cache = configure_planning_cache(DiskMatrixCacheBackend(tmp_path))
+    try:
+        first = SimulationManager(raw_data=input_data, writer=DictSimpleWriter, options=config).run()
+        assert cache.info()['misses'] > 0
+        assert list(tmp_path.iterdir())
+
+        cache.hits = 0
+        second = SimulationManager(raw_data=input_data, writer=DictSimpleWriter, options=config).run()
+        assert cache.info()['hits'] > 0
+        assert first['summary'] == second['summary']
+
+        cache.clear()
+        assert not list(tmp_path.glob('*.json'))
+    finally:
+        configure_planning_cache(previous)
+
+
+def _planning_data_per_truck(simdata) -> InputPlanningData:
+    """Прежнее построение матрицы планирования: маршруты и времена отдельно для каждого самосвала"""
+    inst = InputPlanningData(
+        N=len(simdata.trucks), M=len(simdata.shovels), Z=len(simdata.unloads), D_work=int(simdata.duration / 60),
+        T_haul={}, T_return={}, T_load={}, T_unload={}, T_start={}, T_end={}, m_tons={}, Kmax_by_truck=None,
+    )
+    shift_change_area = simdata.idle_areas.shift_change_areas[0]
+
+    for truck in simdata.trucks.values():
+        for shovel in simdata.shovels.values():
+            time_load, weight, _ = ShovelCalc.calculate_load_cycles(shovel.properties, truck.properties)
+            inst.T_load[truck.id, shovel.id] = int(time_load / 60)
+            inst.T_start[truck.id, shovel.id] = calculate_start_time(simdata, truck, shovel.id)
+            inst.m_tons[truck.id, shovel.id] = int(weight)
+
+            for unload in simdata.unloads.values():
+                route = build_route_edges_by_road_net(
+                    from_object_id=shovel.id, from_object_type=ObjectType.SHOVEL,
+                    to_object_id=unload.id, to_object_type=ObjectType.UNLOAD,
+                    road_net=simdata.road_net,
+                )
+                inst.T_haul[truck.id, shovel.id, unload.id] = int(
+                    TruckCalc.calculate_time_motion_by_edges(route, truck.properties, forward=True) / 60
+                )
+                inst.T_return[truck.id, unload.id, shovel.id] = int(
+                    TruckCalc.calculate_time_motion_by_edges(route, truck.properties, forward=False) / 60
+                )
+
+        for unload in simdata.unloads.values():
+            inst.T_unload[truck.id, unload.id] = int(
+                UnloadCalc.unload_calculation_by_norm(unload.properties, truck.properties)["t_total"] / 60
+            )
+            end_route = build_route_edges_by_road_net(
+                from_object_id=unload.id, from_object_type=ObjectType.UNLOAD,
+                to_object_id=shift_change_area.id, to_object_type=ObjectType.IDLE_AREA,
+                road_net=simdata.road_net,
+            )
+            inst.T_end[truck.id, unload.id] = int(
+                TruckCalc.calculate_time_motion_by_edges(end_route, truck.properties, forward=True) / 60
+            )
+
+    return inst
+
+
+def test_planning_data_grouped_builder(input_data, tmp_path):
+    simdata = SimulationManager(raw_data=input_data, writer=DictSimpleWriter, options={'mode': 'auto'}).simdata
+    trucks = list(simdata.trucks.values())
+    assert len(trucks) >= 4
+
+    # Две модели самосвалов и подъезд из середины ребра дороги: у двух самосвалов одной модели
+    # положение общее, у самосвала другой модели - то же положение
+    edge_id = 2
+    (lon_a, lat_a, *_), (lon_b, lat_b, *_) = simdata.road_net["features"][edge_id]["geometry"]["coordinates"][:2]
+    lat, lon = (lat_a + lat_b) / 2, (lon_a + lon_b) / 2
+    for truck in trucks[:2]:
+        truck.properties = replace(truck.properties, body_capacity=truck.properties.body_capacity * 0.6,
+                                   speed_empty_kmh=truck.properties.speed_empty_kmh + 7)
+    for truck in (trucks[1], trucks[2], trucks[3]):
+        truck.initial_edge_id, truck.initial_lat, truck.initial_lon = edge_id, lat, lon
+
+    expected = _planning_data_per_truck(simdata)
+
+    previous = get_planning_cache().backend
+    try:
+        configure_planning_cache(None)
+        assert get_planning_data(simdata) == expected
+
+        # составляющие групп из кэша дают ту же матрицу
+        configure_planning_cache(DiskMatrixCacheBackend(tmp_path))
+        assert get_planning_data(simdata) == expected
+        assert get_planning_data(simdata) == expected
+        assert get_planning_cache().info()['hits'] > 0
+    finally:
+        configure_planning_cache(previous)
+
+
+def test_plan_cache(input_data, tmp_path):
+    simdata = SimulationManager(raw_data=input_data, writer=DictSimpleWriter, options={'mode': 'auto'}).simdata
+    previous = get_plan_cache().backend
+    cache = configure_plan_cache(DiskMatrixCacheBackend(tmp_path, prefix=PLAN_KEY_PREFIX, max_age=3600))
+    try:
+        planner = Planner(solver=SolverType.CP, msg=False, workers=2, time_limit=5, use_plan_cache=True)
+        first = planner.run(simdata)
+        assert not planner.cache_hit
+        assert cache.info()['misses'] == 1
+
+        # та же матрица - план из кэша без решения
+        second = planner.run(simdata)
+        assert planner.cache_hit
+        assert second['trips'] == first['trips']
+
+        # исключённые объекты и настройки солвера входят в ключ
+        planning_data = planner.get_planning_data(simdata)
+        settings = planner._plan_settings()
+        key = plan_key(planning_data, None, settings)
+        assert key == plan_key(planner.get_planning_data(simdata), {}, settings)
+        assert key != plan_key(planning_data, {'trucks': [1], 'shovels': [], 'unloads': []}, settings)
+        assert key != plan_key(planning_data, None, {**settings, 'time_limit': 6})
+
+        # записи - JSON; устаревшая запись не читается и удаляется при следующей записи
+        path, = tmp_path.glob('*.json')
+        assert json.loads(path.read_bytes())['trips'] == first['trips']
+        expired = path.stat().st_mtime - 7200
+        os.utime(path, (expired, expired))
+        assert cache.load(key) is None
+        cache.store(plan_key(planning_data, None, {**settings, 'time_limit': 6}), first)
+        assert path not in list(tmp_path.glob('*.json'))
+
+        cache.clear()
+        assert not list(tmp_path.glob('*.json'))
+    finally:
+        configure_plan_cache(previous)
+
+
+def test_rolling_horizon_window():
+    inst = InputPlanningData(
+        N=1, M=2, Z=1, D_work=600,
+        T_haul={(1, 10, 20): 6, (1, 11, 20): 8},
+        T_return={(1, 20, 10): 4, (1, 20, 11): 5},
+        T_load={(1, 10): 3, (1, 11): 3},
+        T_unload={(1, 20): 2},
+        T_start={(1, 10): 7, (1, 11): 7},
+        T_end={(1, 20): 9},
+        m_tons={(1, 10): 90, (1, 11): 90},
+    )
+    apply_window(inst, HorizonWindow(open_end=True, busy_trips={1: (TRIP_STAGE_LOADING, 11, 20)}))
+
+    # окно удлинено на самый короткий гружёный ход с разгрузкой, возврат на пересменку не нужен
+    assert inst.D_work == 608
+    assert inst.T_end == {(1, 20): 0}
+    # самосвал доезжает начатый рейс: погрузка + ход + разгрузка + возврат к экскаватору
+    assert inst.T_start == {(1, 10): 3 + 8 + 2 + 4, (1, 11): 3 + 8 + 2 + 5}
+
+
+def test_rolling_horizon_simulation(input_data):
+    input_data['scenario']['solver_type'] = SolverType.CP.code()
+    config = {"breakdown": False, "refuel": False, 'lunch': False, 'planned_idle': False, 'blasting': False,
+              'mode': 'auto', 'rolling_horizon': 60, 'time_limit': 5, 'workers': 2, 'msg': False,
+              'plan_cache': False}
+    manager = SimulationManager(raw_data=input_data, writer=DictSimpleWriter, options=config)
+    result = manager.run()
+    validate_result(result)
+
+    step = rolling_horizon_step(manager.config)
+    assert step == 30
+    duration = manager.simdata.duration // 60
+    assert result['summary']['trips'] > 0
+    # план продлевается на каждой границе шага, кроме совпадающей с концом смены
+    assert result['meta']['replanning']['replans'] >= math.ceil(duration / step) - 1
+
+
+def test_time_indexed_solver():
+    inst = InputPlanningData(
+        N=2, M=1, Z=1, D_work=60,
+        T_haul={(1, 10, 20): 6, (2, 10, 20): 6},
+        T_return={(1, 20, 10): 4, (2, 20, 10): 4},
+        T_load={(1, 10): 3, (2, 10): 4},
+        T_unload={(1, 20): 2, (2, 20): 2},
+        T_start={(1, 10): 5, (2, 10): 7},
+        T_end={(1, 20): 5, (2, 20): 5},
+        m_tons={(1, 10): 90, (2, 10): 90},
+    )
+    milp = Planner(solver=SolverType.CBC, msg=False, workers=1, time_limit=30)._init_solver().run(inst)
+    solver = Planner(solver=SolverType.TIME_INDEXED, msg=False, workers=1, time_limit=30, time_bucket=1)._init_solver()
+    result = solver.run(inst)
+
+    # с интервалом 1 мин временная постановка совпадает с MILP по объёму
+    assert result["status"] == "Optimal"
+    assert result["objective"] == milp["objective"]
+
+    for shovel_or_unload, start, duration in (
+            ("shovel_id", "start_load", inst.T_load), ("unload_id", "start_unload", inst.T_unload)
+    ):
+        busy = sorted(
+            (trip[start], trip[start] + duration[trip["truck_id"], trip[shovel_or_unload]])
+            for trip in result["trips"]
+        )
+        assert all(prev_end <= next_start for (_, prev_end), (next_start, _) in zip(busy, busy[1:]))
+
+    for trip in result["trips"]:
+        i = trip["truck_id"]
+        assert trip["start_load"] >= inst.T_start[i, 10]
+        assert trip["start_unload"] + inst.T_unload[i, 20] + inst.T_end[i, 20] <= inst.D_work
+
+
+def test_solution_status():
+    model = LpProblem("status", LpMaximize)
+    # CBC/HiGHS по истечении time_limit: статус Optimal, решение - недоказанный рекорд
+    model.status, model.sol_status = LpStatusOptimal, LpSolutionIntegerFeasible
+    assert solution_status(model) == "Feasible"
+    model.sol_status = LpSolutionOptimal
+    assert solution_status(model) == "Optimal"
+    model.status, model.sol_status = LpStatusNotSolved, LpSolutionNoSolutionFound
+    assert solution_status(model) == "Not Solved"
+
+
+def test_warm_start_hint_feasible():
+    # три самосвала из одной точки: одинаковое время подъезда к экскаваторам
+    trucks = (1, 2, 3)
+    inst = InputPlanningData(
+        N=3, M=2, Z=1, D_work=120,
+        T_haul={key: value for i in trucks for key, value in (((i, 10, 20), 6), ((i, 11, 20), 9))},
+        T_return={key: value for i in trucks for key, value in (((i, 20, 10), 4), ((i, 20, 11), 7))},
+        T_load={key: value for i in trucks for key, value in (((i, 10), 4), ((i, 11), 3))},
+        T_unload={(i, 20): 2 for i in trucks},
+        T_start={key: 5 for i in trucks for key in ((i, 10), (i, 11))},
+        T_end={(i, 20): 5 for i in trucks},
+        m_tons={key: value for i in trucks for key, value in (((i, 10), 90), ((i, 11), 80))},
+    )
+    model, _ = CPSolver.build_cp_model(inst, warm_start=True)
+
+    # модель с переменными, зафиксированными на подсказках жадного расписания, допустима
+    solver = cp_model.CpSolver()
+    solver.parameters.fix_variables_to_their_hinted_value = True
+    solver.parameters.num_search_workers = 1
+    solver.parameters.max_time_in_seconds = 10.0
+    status = solver.Solve(model)
+
+    assert status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+    assert solver.ObjectiveValue() == greedy_plan(inst)["objective"] > 0
+
+
+def test_solver_portfolio():
+    inst = InputPlanningData(
+        N=2, M=2, Z=1, D_work=90,
+        T_haul={(1, 10, 20): 6, (1, 11, 20): 9, (2, 10, 20): 6, (2, 11, 20): 9},
+        T_return={(1, 20, 10): 4, (1, 20, 11): 7, (2, 20, 10): 4, (2, 20, 11): 7},
+        T_load={(1, 10): 3, (1, 11): 2, (2, 10): 4, (2, 11): 2},
+        T_unload={(1, 20): 2, (2, 20): 2},
+        T_start={(1, 10): 5, (1, 11): 6, (2, 10): 7, (2, 11): 3},
+        T_end={(1, 20): 5, (2, 20): 5},
+        m_tons={(1, 10): 90, (1, 11): 80, (2, 10): 90, (2, 11): 80},
+    )
+    solver = Planner(solver=SolverType.PORTFOLIO, msg=False, workers=2, time_limit=20)._init_solver()
+    result = solver.run(inst)
+
+    # жадное расписание - нижняя граница, победитель перевозит не меньше любого завершившегося участника
+    assert set(result["portfolio"]) == {SolverType.GREEDY.key()} | {member.solver_type.key() for member in solver.members}
+    assert result["trips"]
+    assert result["winner"] in result["portfolio"]
+    assert all(
+        (member["objective"] or 0) <= result["objective"]
+        for member in result["portfolio"].values()
+    )
+
+
+def test_trip_bounds():
+    # три самосвала на одном экскаваторе с долгой погрузкой
+    inst = InputPlanningData(
+        N=3, M=1, Z=1, D_work=120,
+        T_haul={(i, 10, 20): 5 for i in (1, 2, 3)},
+        T_return={(i, 20, 10): 5 for i in (1, 2, 3)},
+        T_load={(i, 10): 10 for i in (1, 2, 3)},
+        T_unload={(i, 20): 2 for i in (1, 2, 3)},
+        T_start={(i, 10): 2 for i in (1, 2, 3)},
+        T_end={(i, 20): 3 for i in (1, 2, 3)},
+        m_tons={(i, 10): 90 for i in (1, 2, 3)},
+    )
+    strict = compute_trip_bounds(inst, margin=None)
+
+    # кратчайший цикл 22 мин на 115 мин смены; экскаватор грузит с 2-й по 110-ю минуту
+    assert strict.naive == {1: 5, 2: 5, 3: 5}
+    assert strict.shovel_caps == {10: 10}
+    assert strict.unload_caps == {20: 50}
+    assert strict.global_cap == 10
+    assert strict.per_truck == strict.naive
+
+    # ожидание в очереди экскаватора (MVA) сокращает число рейсов каждого самосвала
+    bounds = compute_trip_bounds(inst, margin=1.0)
+    assert bounds.queue_wait > 0
+    assert bounds.per_truck == {1: 4, 2: 4, 3: 4}
+
+    report = bounds.report(inst)
+    assert report["before"]["trips"] == 15
+    assert report["after"]["trips"] == 12
+    assert report["reduction"]["milp_order_vars"] > report["reduction"]["trips"] > 0
+
+
+@pytest.mark.parametrize('solver_type', [SolverType.CBC, SolverType.CP])
+def test_trip_bounds_keep_optimum(solver_type):
+    # долгая разгрузка: пункт разгрузки вмещает 3 разгрузки, а MILP разрешает им пересекаться
+    def instance():
+        return InputPlanningData(
+            N=2, M=1, Z=1, D_work=40,
+            T_haul={(i, 10, 20): 3 for i in (1, 2)},
+            T_return={(i, 20, 10): 3 for i in (1, 2)},
+            T_load={(i, 10): 2 for i in (1, 2)},
+            T_unload={(i, 20): 10 for i in (1, 2)},
+            T_start={(1, 10): 1, (2, 10): 2},
+            T_end={(i, 20): 2 for i in (1, 2)},
+            m_tons={(i, 10): 90 for i in (1, 2)},
+        )
+
+    planner = Planner(solver=solver_type, msg=False, workers=2, time_limit=10)
+    solver = planner._init_solver()
+    unbounded = solver.run(instance())
+
+    bounded_data = instance()
+    report = planner.apply_trip_bounds(bounded_data)
+    bounded = solver.run(bounded_data)
+
+    assert report["global_cap"] == (3 if solver_type == SolverType.CP else 12)
+    assert unbounded["status"] == bounded["status"] == "Optimal"
+    assert bounded["objective"] == unbounded["objective"]
+
+
+def test_replanning_interrupts(input_data):
+    config = {"breakdown": True, "refuel": True, 'lunch': True, 'planned_idle': True, 'blasting': False,
+              'mode': 'auto'}
+    result = SimulationManager(raw_data=input_data, writer=DictSimpleWriter, options=config).run()
+    replanning = result['meta']['replanning']
+
+    assert set(replanning) == {'replans', 'interrupts', 'interrupts_avoided', 'plan_cache_hits', 'solver_wins'}
+    assert replanning['replans'] > 0
+    assert replanning['interrupts'] + replanning['interrupts_avoided'] > 0
+    assert result['summary']['trips'] > 0
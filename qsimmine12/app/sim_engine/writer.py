@@ -1,3 +1,4 @@
+import json
 from abc import ABC, abstractmethod
 
 from app.sim_engine.events import Event
@@ -21,6 +22,10 @@ class IWriter(ABC):
     def finalize(self):
         pass
 
+    def flush(self) -> dict:
+        """Отдаёт накопленные телеметрию и события и освобождает их (режим длинного горизонта)"""
+        return {}
+
 
 class DictSimpleWriter(IWriter):
     def __init__(self) -> None:
@@ -43,6 +48,14 @@ class DictSimpleWriter(IWriter):
     def finalize(self) -> dict:
         return self.data
 
+    def flush(self) -> dict:
+        flushed = {}
+        for key in ("telemetry", "events"):
+            if key in self.data:
+                flushed[key] = self.data[key]
+                self.data[key] = []
+        return flushed
+
 
 class DictReliabilityWriter(DictSimpleWriter):
     def __init__(self) -> None:
@@ -113,6 +126,16 @@ class BatchWriter(IWriter):
         if self.meta["end_timestamp"] is None or timestamp > self.meta["end_timestamp"]:
             self.meta["end_timestamp"] = timestamp
 
+    def flush(self) -> dict:
+        flushed = {
+            "batches": self.batches,
+            "events": self.events,
+        }
+        self.batches = {}
+        self.batch_time_map = {}
+        self.events = []
+        return flushed
+
     def finalize(self) -> dict:
         return {
             "meta": {
@@ -124,3 +147,40 @@ class BatchWriter(IWriter):
             "events": self.events,
             "summary": {},
         }
+
+
+class IShiftSink(ABC):
+    """Приёмник посменных результатов симуляции в режиме длинного горизонта"""
+
+    @abstractmethod
+    def write_shift(self, shift: dict) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class ListShiftSink(IShiftSink):
+    """Копит смены в памяти (для коротких прогонов и тестов)"""
+
+    def __init__(self) -> None:
+        self.shifts: list[dict] = []
+
+    def write_shift(self, shift: dict) -> None:
+        self.shifts.append(shift)
+
+
+class JsonLinesShiftSink(IShiftSink):
+    """Пишет каждую смену отдельной строкой JSON в файл"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write_shift(self, shift: dict) -> None:
+        self._file.write(json.dumps(shift, ensure_ascii=False, default=str))
+        self._file.write("\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
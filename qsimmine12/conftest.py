@@ -2,4 +2,8 @@ import os
 
 
 os.environ["TZ"] = "Europe/Moscow"
-os.environ["REDIS_URL"] = "redis://redis:6379/0"
\ No newline at end of file
+os.environ["REDIS_URL"] = "redis://redis:6379/0"
+# Постоянные кэши матрицы планирования и планов выключены: тесты не зависят от записей прошлых запусков,
+# тесты самого кэша задают бэкенд явно
+os.environ.setdefault("PLANNING_CACHE", "off")
+os.environ.setdefault("PLAN_CACHE", "off")